@@ -0,0 +1,511 @@
+"""
+Reproducible benchmarks of the GoVibes stages against local stand-ins of the external services.
+
+Every stage normally depends on a live service (Bedrock, Chroma, Google Maps), so its speed could not be measured
+in isolation or compared across commits. Here they run against:
+
+- `fake_bedrock.py`: Bedrock with configurable latency, jitter and throttling.
+- The in-process NumPy index (`vector_index.py`) or a local Chroma client persisted in the work directory
+  (`--chroma`), used by the ingest and by both query stages.
+- `fake_directions.py`: Directions API with canned responses and configurable latency.
+- A hashing text encoder instead of the sentence-transformers model, so the timings measure the code of this
+  repository (batching, caches, indexes, pandas) and not the inference of the model.
+
+The POIs, places and profiles are synthetic and generated from a fixed seed, from 10k to 1M POIs.
+
+Stages:
+-------
+- `augment`: `pois_augmentation.augment_rows` over synthetic places (`--augment-rows`), with the token bucket.
+- `ingest`: `ingest.ingest` of a synthetic augmented store of every size: embeddings, vector and lexical indexes.
+- `query`: `query.recommend` for single profiles against the index of every size (hybrid retrieval).
+- `query_bulk`: `query.recommend_many` for many profiles at once.
+- `route`, `route_cached`: `route_recommender.plan_route` with a cold and with a warm directions cache.
+
+Every stage runs in a fresh process, so its peak memory (maximum RSS) is its own. The synthetic store and the
+indexes a stage reads are built beforehand in another process, so they do not count in its memory. The results are
+written as JSON, one record per (stage, size) with the number of items, the wall time, the throughput, the latency
+percentiles in milliseconds, the peak RSS in MB and its increase over the RSS just before the timed section,
+together with the commit and the configuration.
+
+Example usage:
+--------------
+    python benchmark.py                                   # 10k POIs
+    python benchmark.py --sizes 10000 100000 1000000 --stages ingest query
+    python benchmark.py --compare ./data/output/benchmarks/bench-1a2b3c4.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+
+OUTPUT_DIR = "./data/output/benchmarks"
+STAGES = ["augment", "ingest", "query", "query_bulk", "route", "route_cached"]
+
+# Medellín, aproximadamente
+BOUNDS = {"lat": (6.17, 6.34), "lon": (-75.64, -75.53)}
+
+CATEGORIES = ["restaurante", "parque", "bar", "discoteca", "cine", "teatro", "jardin", "museo", "centro comercial",
+              "cafe", "panaderia", "hotel", "gimnasio", "biblioteca", "heladeria"]
+WORDS = ["ambiente", "familiar", "tranquilo", "musica", "vivo", "comida", "tipica", "vista", "ciudad", "naturaleza",
+         "arte", "historia", "noche", "ninos", "mascotas", "terraza", "economico", "exclusivo", "cocteles", "cultura",
+         "deporte", "compras", "postres", "cafe", "jardines", "senderos", "exposiciones", "peliculas", "baile",
+         "salsa", "rock", "parrilla", "vegetariano", "brunch", "mirador", "piscina", "juegos", "lectura", "fotos"]
+PRICES = ["$", "$$", "$$$", None]
+COMPANIONS = ["familia", "amigos", "pareja", "solo"]
+
+
+def comunas():
+    from query import PROBABILITIES
+    return list(PROBABILITIES)
+
+
+def synthetic_text(rng, n_words):
+    return " ".join(rng.choice(WORDS, size=n_words))
+
+
+def synthetic_pois(n, seed=0):
+    """
+    Returns `n` augmented POIs ({"description": ..., "data": {...}}) as written by `pois_augmentation.py`.
+    """
+    rng = np.random.default_rng(seed)
+    names = comunas()
+    comuna = rng.integers(0, len(names), size=n)
+    category = rng.integers(0, len(CATEGORIES), size=n)
+    lat = rng.uniform(*BOUNDS["lat"], size=n)
+    lon = rng.uniform(*BOUNDS["lon"], size=n)
+    rating = np.round(rng.uniform(3.0, 5.0, size=n), 2)
+    price = rng.integers(0, len(PRICES), size=n)
+
+    pois = []
+    for i in range(n):
+        data = {
+            "name": f"{CATEGORIES[category[i]].title()} {i}",
+            "comuna": names[comuna[i]],
+            "categories": CATEGORIES[category[i]],
+            "address": f"Cl. {i % 120} #{i % 97}-{i % 50}, Medellín, Antioquia",
+            "rating bayesian": float(rating[i]),
+            "latitude": float(lat[i]),
+            "longitude": float(lon[i]),
+        }
+        if PRICES[price[i]] is not None:
+            data["precio"] = PRICES[price[i]]
+        description = f"{CATEGORIES[category[i]]} con {synthetic_text(rng, 40)}"
+        pois.append({"description": description, "data": data})
+    return pois
+
+
+def synthetic_places(n, seed=0):
+    """
+    Returns `n` cleaned places with the columns of `final_places.csv`.
+    """
+    rng = np.random.default_rng(seed)
+    names = comunas()
+    score = np.round(rng.uniform(3.1, 5.0, size=n), 1)
+    c_score = rng.integers(11, 2000, size=n)
+    comuna = [names[i] for i in rng.integers(0, len(names), size=n)]
+    category = [CATEGORIES[i] for i in rng.integers(0, len(CATEGORIES), size=n)]
+    return pd.DataFrame({
+        "name": [f"Lugar {i}" for i in range(n)],
+        "desc": [synthetic_text(rng, 30) for _ in range(n)],
+        "score": score,
+        "c_score": c_score,
+        "price": [PRICES[i] for i in rng.integers(0, len(PRICES), size=n)],
+        "category": category,
+        "accessibility": "Entrada accesible para personas en silla de ruedas",
+        "schedule": "lunes: 8 a.m.–10 p.m.",
+        "web": None,
+        "search_parameters": [f"Comuna {c} {cat}" for c, cat in zip(comuna, category)],
+        "phone": "604 000 0000",
+        "address": [f"Cra. {i % 80} #{i % 60}-{i % 40}, Medellín" for i in range(n)],
+        "lat": rng.uniform(*BOUNDS["lat"], size=n),
+        "lon": rng.uniform(*BOUNDS["lon"], size=n),
+        "bayesian_mean": (score * c_score + 4 * 10) / (c_score + 10),
+        "Comuna": comuna,
+    })
+
+
+def synthetic_profiles(n, seed=0):
+    """
+    Returns `n` profiles in the format written by `user_context.py`.
+    """
+    rng = np.random.default_rng(seed)
+    return [
+        f"Soy un turista que viaja con ... {COMPANIONS[i % len(COMPANIONS)]}. "
+        f"{CATEGORIES[rng.integers(len(CATEGORIES))]} {synthetic_text(rng, 3)}. {synthetic_text(rng, 4)}. "
+        f"{CATEGORIES[rng.integers(len(CATEGORIES))]} {synthetic_text(rng, 3)}"
+        for i in range(n)
+    ]
+
+
+class HashingEncoder:
+    """
+    Deterministic stand-in for `SentenceTransformer.encode`: every token adds one to a hashed dimension.
+    """
+
+    def __init__(self, dim=384):
+        self.dim = dim
+        self._columns = {}
+
+    def encode(self, texts, normalize_embeddings=True, **kwargs):
+        rows, columns = [], []
+        for row, text in enumerate(texts):
+            for token in text.lower().split():
+                column = self._columns.get(token)
+                if column is None:
+                    column = self._columns[token] = zlib.crc32(token.encode("utf-8")) % self.dim
+                rows.append(row)
+                columns.append(column)
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(vectors, (rows, columns), 1.0)
+        if normalize_embeddings:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors /= np.where(norms == 0, 1, norms)
+        return vectors
+
+
+def use_hashing_encoder():
+    import embeddings
+
+    # Todos los Embedder del proceso usan el codificador de hashing en lugar del modelo
+    encoder = HashingEncoder()
+    embeddings.Embedder.model = property(lambda self: encoder)
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def summarize(stage, size, items, seconds, latencies=None, baseline=None, **extra):
+    """
+    Returns the record of a stage. `baseline` is the peak RSS taken just before the timed section.
+    """
+    peak = peak_rss_mb()
+    record = {
+        "stage": stage,
+        "size": size,
+        "items": items,
+        "seconds": round(seconds, 4),
+        "throughput": round(items / seconds, 2) if seconds > 0 else None,
+        "latency_ms": None,
+        "peak_rss_mb": peak,
+        "rss_increase_mb": round(peak - baseline, 1) if peak is not None and baseline is not None else None,
+        **extra,
+    }
+    if latencies:
+        latencies = np.asarray(latencies) * 1000
+        record["latency_ms"] = {
+            name: round(float(np.percentile(latencies, q)), 3)
+            for name, q in (("p50", 50), ("p95", 95), ("p99", 99), ("max", 100))
+        }
+    return record
+
+
+def set_paths(workdir):
+    """
+    Points every cache and index of the child process to `workdir`.
+    """
+    os.environ.update({
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embeddings.sqlite"),
+        "VECTOR_INDEX_PATH": os.path.join(workdir, "vector_index"),
+        "LEXICAL_INDEX_PATH": os.path.join(workdir, "lexical_index"),
+        "LLM_CACHE_PATH": os.path.join(workdir, "completions.sqlite"),
+        "LLM_CACHE_BYPASS": "1",
+        "DIRECTIONS_CACHE_PATH": os.path.join(workdir, "directions.sqlite"),
+        "AWS_ACCESS_KEY_ID": "benchmark",
+        "AWS_SECRET_ACCESS_KEY": "benchmark",
+    })
+
+
+def use_backend(workdir, config):
+    """
+    Selects the vector backend of `ingest.py` and `query.py`. Chroma is a local client persisted in `workdir`, so
+    the query stages read the collection written by the ingest stage.
+    """
+    if config["chroma"]:
+        import chromadb
+        path = os.path.join(workdir, "chroma")
+        chromadb.HttpClient = lambda **kwargs: chromadb.PersistentClient(path=path)
+        os.environ["VECTOR_BACKEND"] = "chroma"
+    else:
+        os.environ["VECTOR_BACKEND"] = "numpy"
+
+
+def prepare_store(workdir, size, config):
+    """
+    Writes the synthetic augmented store of `size` POIs, unless it already exists.
+    """
+    import poi_store
+
+    data = os.path.join(workdir, "augmented.store")
+    if not os.path.exists(os.path.join(data, "schema.json")):
+        poi_store.write_augmented_store(synthetic_pois(size, seed=config["seed"]), data)
+    return data
+
+
+def prepare_index(workdir, size, config):
+    """
+    Ingests the synthetic store into the selected backend, unless the ingest stage already did.
+    """
+    set_paths(workdir)
+    use_hashing_encoder()
+    use_backend(workdir, config)
+    vectors = os.path.join(workdir, "chroma") if config["chroma"] else os.path.join(workdir, "vector_index",
+                                                                                        "vectors.npy")
+    if os.path.exists(os.path.join(workdir, "lexical_index", "meta.json")) and os.path.exists(vectors):
+        return
+    import ingest
+    ingest.ingest(prepare_store(workdir, size, config))
+
+
+def bench_augment(workdir, config):
+    from fake_bedrock import FakeBedrock
+
+    set_paths(workdir)
+    server = FakeBedrock(latency=config["bedrock_latency"], jitter=config["bedrock_jitter"],
+                         throttle_rate=config["throttle_rate"], seed=config["seed"]).start()
+    os.environ["BEDROCK_ENDPOINT_URL"] = server.url
+    try:
+        import pois_augmentation
+        from rate_limiter import TokenBucket
+
+        latencies = []
+        invoke = pois_augmentation.invoke_claude
+
+        def timed_invoke(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return invoke(*args, **kwargs)
+            finally:
+                latencies.append(time.perf_counter() - start)
+
+        pois_augmentation.invoke_claude = timed_invoke
+        df = synthetic_places(config["augment_rows"], seed=config["seed"])
+        limiter = TokenBucket(rate=config["rate"], capacity=config["concurrency"])
+
+        baseline = peak_rss_mb()
+        start = time.perf_counter()
+        ok = sum(
+            response is not None
+            for _, response in pois_augmentation.augment_rows(df, concurrency=config["concurrency"], limiter=limiter,
+                                                              retry_delay=0)
+        )
+        seconds = time.perf_counter() - start
+    finally:
+        server.stop()
+    return summarize("augment", len(df), ok, seconds, latencies, baseline, requests=server.requests,
+                     throttled=server.throttled)
+
+
+def bench_ingest(workdir, size, config):
+    set_paths(workdir)
+    use_hashing_encoder()
+    use_backend(workdir, config)
+    # El almacén sintético se escribe antes, en otro proceso (ver `run`)
+    data = os.path.join(workdir, "augmented.store")
+    import ingest
+
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    ingest.ingest(data)
+    seconds = time.perf_counter() - start
+    return summarize("ingest", size, size, seconds, baseline=baseline, backend=os.environ["VECTOR_BACKEND"])
+
+
+def bench_query(workdir, size, config):
+    set_paths(workdir)
+    use_hashing_encoder()
+    use_backend(workdir, config)
+    import query
+
+    random.seed(config["seed"])
+    profiles = synthetic_profiles(config["profiles"], seed=config["seed"])
+    query.recommend(profiles[0])  # Carga de los índices, fuera de la medición
+
+    baseline = peak_rss_mb()
+    latencies = []
+    start = time.perf_counter()
+    for profile in profiles:
+        started = time.perf_counter()
+        query.recommend(profile)
+        latencies.append(time.perf_counter() - started)
+    seconds = time.perf_counter() - start
+    return summarize("query", size, len(profiles), seconds, latencies, baseline,
+                     backend=os.environ["VECTOR_BACKEND"])
+
+
+def bench_query_bulk(workdir, size, config):
+    set_paths(workdir)
+    use_hashing_encoder()
+    use_backend(workdir, config)
+    import query
+
+    profiles = dict(enumerate(synthetic_profiles(config["bulk_profiles"], seed=config["seed"])))
+    index = query.get_vector_index()
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    df = query.recommend_many(profiles, index, seed=config["seed"])
+    seconds = time.perf_counter() - start
+    return summarize("query_bulk", size, len(profiles), seconds, baseline=baseline, recommendations=len(df),
+                     backend=os.environ["VECTOR_BACKEND"])
+
+
+def bench_route(workdir, config):
+    from fake_directions import FakeDirections
+
+    set_paths(workdir)
+    server = FakeDirections(latency=config["directions_latency"]).start()
+    os.environ["DIRECTIONS_URL"] = f"{server.url}/maps/api/directions/json"
+    try:
+        import route_recommender
+
+        pois = pd.DataFrame([poi["data"] for poi in synthetic_pois(1000, seed=config["seed"])])
+        rng = np.random.default_rng(config["seed"])
+        routes = [pois.iloc[rng.choice(len(pois), size=config["stops"], replace=False)]
+                  for _ in range(config["routes"])]
+
+        records = []
+        for stage in ("route", "route_cached"):
+            latencies = []
+            baseline = peak_rss_mb()
+            start = time.perf_counter()
+            for df in routes:
+                started = time.perf_counter()
+                route_recommender.plan_route(df, "benchmark", stops=config["stops"])
+                latencies.append(time.perf_counter() - started)
+            records.append(summarize(stage, config["stops"], len(routes), time.perf_counter() - start, latencies,
+                                     baseline))
+    finally:
+        server.stop()
+    records[0]["requests"] = server.requests
+    return records
+
+
+def isolated(func, *args):
+    """
+    Runs `func` in a new process, so its peak memory and imports do not leak into other stages.
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+        return executor.submit(func, *args).result()
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(stages, sizes, config):
+    """
+    Runs the selected stages for every size and returns the report.
+    """
+    results = []
+    root = tempfile.mkdtemp(prefix="govibes-bench-")
+    try:
+        if "augment" in stages:
+            results.append(isolated(bench_augment, os.path.join(root, "augment"), config))
+            print(json.dumps(results[-1]))
+        for size in sizes:
+            workdir = os.path.join(root, str(size))
+            os.makedirs(workdir, exist_ok=True)
+            # Las entradas se construyen en otro proceso, para que no cuenten en la memoria de las etapas medidas
+            prepare = {"ingest": prepare_store, "query": prepare_index, "query_bulk": prepare_index}
+            for stage, func in (("ingest", bench_ingest), ("query", bench_query), ("query_bulk", bench_query_bulk)):
+                if stage in stages:
+                    isolated(prepare[stage], workdir, size, config)
+                    results.append(isolated(func, workdir, size, config))
+                    print(json.dumps(results[-1]))
+        if "route" in stages or "route_cached" in stages:
+            for record in isolated(bench_route, os.path.join(root, "route"), config):
+                if record["stage"] in stages:
+                    results.append(record)
+                    print(json.dumps(record))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": config,
+        "results": results,
+    }
+
+
+def compare(report, baseline):
+    """
+    Prints the throughput and p50 latency of every (stage, size) against a previous report.
+    """
+    previous = {(record["stage"], record["size"]): record for record in baseline["results"]}
+    print(f"{'stage':<14}{'size':>10}{'throughput':>14}{'vs ' + baseline['commit']:>14}{'p50 ms':>10}{'vs':>10}")
+    for record in report["results"]:
+        old = previous.get((record["stage"], record["size"]))
+        ratio = p50_ratio = ""
+        if old and old["throughput"] and record["throughput"]:
+            ratio = f"{record['throughput'] / old['throughput']:.2f}x"
+        if old and old["latency_ms"] and record["latency_ms"]:
+            p50_ratio = f"{record['latency_ms']['p50'] / old['latency_ms']['p50']:.2f}x"
+        p50 = record["latency_ms"]["p50"] if record["latency_ms"] else ""
+        print(f"{record['stage']:<14}{record['size']:>10}{record['throughput'] or '':>14}{ratio:>14}{p50:>10}"
+              f"{p50_ratio:>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mide el rendimiento de las etapas con servicios simulados.")
+    parser.add_argument("--stages", nargs="*", default=STAGES, choices=STAGES)
+    parser.add_argument("--sizes", nargs="*", type=int, default=[10_000], help="Número de POIs sintéticos")
+    parser.add_argument("--output", help="Archivo JSON del reporte (por defecto en ./data/output/benchmarks)")
+    parser.add_argument("--compare", help="Reporte anterior con el que comparar")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chroma", action="store_true",
+                        help="Ingesta y consultas en un Chroma local en lugar de NumPy")
+    parser.add_argument("--augment-rows", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8, help="Solicitudes simultáneas a Bedrock")
+    parser.add_argument("--rate", type=float, default=50.0, help="Solicitudes por segundo del limitador")
+    parser.add_argument("--bedrock-latency", type=float, default=0.05)
+    parser.add_argument("--bedrock-jitter", type=float, default=0.02)
+    parser.add_argument("--throttle-rate", type=float, default=0.02)
+    parser.add_argument("--profiles", type=int, default=200, help="Perfiles consultados uno a uno")
+    parser.add_argument("--bulk-profiles", type=int, default=1000, help="Perfiles de recommend_many")
+    parser.add_argument("--routes", type=int, default=50)
+    parser.add_argument("--stops", type=int, default=3)
+    parser.add_argument("--directions-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    config = {name: getattr(args, name) for name in (
+        "seed", "chroma", "augment_rows", "concurrency", "rate", "bedrock_latency", "bedrock_jitter",
+        "throttle_rate", "profiles", "bulk_profiles", "routes", "stops", "directions_latency",
+    )}
+    report = run(set(args.stages), args.sizes, config)
+
+    output = args.output or os.path.join(OUTPUT_DIR, f"bench-{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=1)
+    print(f"Report written to {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            compare(report, json.load(file))
@@ -0,0 +1,106 @@
+"""
+Append-only JSONL checkpoint for long-running batch jobs.
+
+Every finished unit of work is appended as one JSON line
+`{"key": ..., "status": "ok" | "failed", "value": ..., "fingerprint": ...}`,
+so saving progress costs the size of one record instead of rewriting everything produced so far. Results are
+identified by their key (e.g. the row index of `final_places.csv`), never by their position in the file, so a
+skipped or failed item cannot shift the results of the items after it.
+
+Crash safety:
+-------------
+A crash can only leave the last line half-written. When the checkpoint is loaded, a trailing line without its
+newline is truncated away before appending again, and lines that cannot be parsed are ignored. When a key
+appears several times, the last record wins.
+
+Example usage:
+--------------
+    checkpoint = JsonlCheckpoint("./data/output/augmented/checkpoint.jsonl")
+    records = checkpoint.load()
+    pending = [key for key in keys if key not in checkpoint.completed_keys()]
+    for key in pending:
+        checkpoint.append(key, "ok", result)
+"""
+
+import json
+import os
+
+
+class JsonlCheckpoint:
+    """
+    Key-based, append-only checkpoint stored as JSON lines.
+
+    Parameters:
+    -----------
+    path : str
+        File where the records are appended.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.records = {}
+        self._file = None
+
+    def load(self):
+        """
+        Reads the checkpoint, repairing a torn last line, and returns the last record of every key.
+        """
+        self.records = {}
+        if not os.path.exists(self.path):
+            return self.records
+
+        with open(self.path, "rb+") as file:
+            content = file.read()
+            if content and not content.endswith(b"\n"):
+                # La última línea quedó a medias por una interrupción: se descarta
+                file.truncate(content.rfind(b"\n") + 1)
+                content = content[:content.rfind(b"\n") + 1]
+
+        for line in content.decode("utf-8").splitlines():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            self.records[record["key"]] = record
+        return self.records
+
+    def completed_keys(self):
+        return {key for key, record in self.records.items() if record["status"] == "ok"}
+
+    def append(self, key, status, value=None, fingerprint=None):
+        """
+        Appends one record and flushes it to disk.
+
+        `fingerprint` is an optional hash of the inputs that produced `value`, used to detect stale results.
+        """
+        if self._file is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        record = {"key": key, "status": status, "value": value, "fingerprint": fingerprint}
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.records[key] = record
+
+    def discard(self, keys):
+        """
+        Forgets the records of `keys`. They disappear from the file on the next `compact()`.
+        """
+        for key in keys:
+            self.records.pop(key, None)
+
+    def compact(self):
+        """
+        Rewrites the checkpoint keeping only the last record of every key.
+        """
+        self.close()
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            for record in self.records.values():
+                file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
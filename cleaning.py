@@ -0,0 +1,251 @@
+"""
+Incremental cleaning pipeline for the scraper output, replacing `cleaning_data.ipynb`.
+
+The notebook loads every `places*.csv`, concatenates them, filters them with per-row `apply` lambdas and rewrites
+`final_places.csv` from scratch. This script only processes the scrape files it has not seen before, in chunks,
+with vectorized string operations, and appends the result as a new Parquet part, so adding one scraper batch costs
+time proportional to that batch.
+
+Filters and derived columns (same rules as the notebook):
+---------------------------------------------------------
+- `score > 3` and `c_score > 10`.
+- Names containing "infantil" (ignoring accents and case) are dropped.
+- Results of "Hoteles" searches are dropped.
+- `bayesian_mean = (score * c_score + 4 * 10) / (c_score + 10)`: a prior of 4 stars weighted as 10 reviews, so it
+  only depends on the row itself and is computed per batch.
+- `Comuna` is the second word of `search_parameters`.
+
+Deduplication:
+--------------
+The same place found by several scraper runs is identified by `place_key` (normalized name plus coordinates rounded
+to 4 decimals, about 11 m). Inside a batch the observation with more reviews wins; across batches the most recent
+part wins, which is resolved when the dataset is read with `load_final_places`.
+
+Every scrape file produces exactly one part. When a file already processed changes, its part is rewritten in place
+(same position, so it does not override the files processed after it): places removed from the file disappear, and
+places still in it keep their `place_id`.
+
+Files:
+------
+- `./data/output/places/places*.csv`: Scraper output.
+- `./data/output/places/final_places/part-*.parquet`: One cleaned part per processed scrape file.
+- `./data/output/places/final_places/_manifest.json`: Processed files (by content hash), parts in order, the file
+  that produced every part and the next `place_id`.
+- `./data/output/places/final_places.store`: The deduplicated places as a memory-mapped POI store (see
+  `poi_store.py`), read by `pois_augmentation.py`.
+
+Example usage:
+--------------
+    python cleaning.py                 # Process new places*.csv files
+    python cleaning.py --export-csv    # Also write final_places.csv for the notebooks
+"""
+
+import sys
+import glob
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from poi_store import PLACES_STORE_PATH, has_exact_places, write_places_store
+
+
+PLACES_DIR = "./data/output/places"
+DATASET_DIR = "./data/output/places/final_places"
+MANIFEST_NAME = "_manifest.json"
+
+OUTPUT_COLUMNS = [
+    "name", "desc", "score", "c_score", "price", "category", "accessibility", "schedule", "web",
+    "search_parameters", "phone", "address", "lat", "lon", "bayesian_mean", "Comuna", "place_key",
+]
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def normalize_text(series):
+    """
+    Lowercases and strips accents from a string Series without a Python-level loop.
+    """
+    return (
+        series.fillna("").astype(str).str.lower()
+        .str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii")
+    )
+
+
+def place_keys(df):
+    name = normalize_text(df["name"]).str.split().str.join(" ")
+    lat = pd.to_numeric(df["lat"], errors="coerce").round(4).astype(str)
+    lon = pd.to_numeric(df["lon"], errors="coerce").round(4).astype(str)
+    return name + "|" + lat + "|" + lon
+
+
+def clean_chunk(df):
+    """
+    Applies the filters of the notebook to a chunk of a scrape file and adds the derived columns.
+    """
+    df = df.drop(columns=[column for column in df.columns if column.startswith("Unnamed")])
+    score = pd.to_numeric(df["score"], errors="coerce")
+    c_score = pd.to_numeric(df["c_score"], errors="coerce")
+    search = df["search_parameters"].fillna("").astype(str).str.split()
+
+    keep = (
+        (score > 3)
+        & (c_score > 10)
+        & ~normalize_text(df["name"]).str.contains("infantil", regex=False)
+        & (search.str[2] != "Hoteles")
+    )
+    df = df[keep].copy()
+    score, c_score, search = score[keep], c_score[keep], search[keep]
+
+    df["score"] = score
+    df["c_score"] = c_score
+    df["bayesian_mean"] = (score * c_score + 4 * 10) / (c_score + 10)
+    df["Comuna"] = search.str[1]
+    df["place_key"] = place_keys(df)
+    return df.reindex(columns=OUTPUT_COLUMNS)
+
+
+def clean_file(path, chunksize=5000):
+    """
+    Cleans a scrape file chunk by chunk and removes duplicated places inside it.
+    """
+    chunks = [clean_chunk(chunk) for chunk in pd.read_csv(path, chunksize=chunksize)]
+    chunks = [chunk for chunk in chunks if len(chunk)]
+    if not chunks:
+        return pd.DataFrame(columns=OUTPUT_COLUMNS)
+    df = pd.concat(chunks, ignore_index=True)
+    return (
+        df.sort_values("c_score", kind="stable")
+        .drop_duplicates(subset="place_key", keep="last")
+        .sort_index()
+    )
+
+
+def load_manifest(dataset_dir=DATASET_DIR):
+    path = os.path.join(dataset_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {"files": {}, "parts": [], "sources": {}, "next_id": 0}
+    with open(path, "r", encoding="utf-8") as file:
+        manifest = json.load(file)
+    # Los manifiestos anteriores no guardaban el archivo de cada parte: sale del nombre de la parte
+    manifest.setdefault("sources", {
+        part: f"{os.path.splitext(part)[0].split('-', 2)[2]}.csv" for part in manifest["parts"]
+    })
+    return manifest
+
+
+def save_manifest(manifest, dataset_dir=DATASET_DIR):
+    path = os.path.join(dataset_dir, MANIFEST_NAME)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def update(places_dir=PLACES_DIR, dataset_dir=DATASET_DIR, chunksize=5000):
+    """
+    Processes the scrape files that are new or changed since the last run.
+
+    A new file is appended as a new part. A changed file replaces its previous part, and its places that were already
+    there keep their `place_id`.
+
+    Returns:
+    --------
+    list of str
+        Names of the parts written in this run.
+    """
+    os.makedirs(dataset_dir, exist_ok=True)
+    manifest = load_manifest(dataset_dir)
+    parts_by_file = {name: part for part, name in manifest["sources"].items()}
+
+    written = []
+    for path in sorted(glob.glob(os.path.join(places_dir, "places*.csv"))):
+        name = os.path.basename(path)
+        digest = file_hash(path)
+        if manifest["files"].get(name) == digest:
+            continue
+
+        df = clean_file(path, chunksize=chunksize)
+        part = parts_by_file.get(name)
+        previous = {}
+        if part is not None and os.path.exists(os.path.join(dataset_dir, part)):
+            old = pd.read_parquet(os.path.join(dataset_dir, part), columns=["place_key"])
+            previous = dict(zip(old["place_key"], old.index))
+        # Los lugares que ya estaban conservan su id; los nuevos toman los siguientes
+        ids = [previous.get(key) for key in df["place_key"]]
+        new = [row for row, place_id in enumerate(ids) if place_id is None]
+        for row, place_id in zip(new, range(manifest["next_id"], manifest["next_id"] + len(new))):
+            ids[row] = place_id
+        df.index = pd.Index(ids, dtype="int64", name="place_id")
+
+        # Los manifiestos anteriores podían tener varias partes de un mismo archivo: solo queda la última
+        for stale in [other for other, source in manifest["sources"].items() if source == name and other != part]:
+            manifest["parts"].remove(stale)
+            del manifest["sources"][stale]
+            if os.path.exists(os.path.join(dataset_dir, stale)):
+                os.remove(os.path.join(dataset_dir, stale))
+        if part is None:
+            part = f"part-{len(manifest['parts']):05d}-{os.path.splitext(name)[0]}.parquet"
+            manifest["parts"].append(part)
+            manifest["sources"][part] = name
+        tmp_path = os.path.join(dataset_dir, f"{part}.tmp")
+        df.to_parquet(tmp_path)
+        os.replace(tmp_path, os.path.join(dataset_dir, part))
+
+        manifest["files"][name] = digest
+        manifest["next_id"] += len(new)
+        save_manifest(manifest, dataset_dir)
+        written.append(part)
+        print(f"{name}: {len(df)} places -> {part}")
+
+    if not written:
+        print("No new scrape files")
+    return written
+
+
+def load_final_places(dataset_dir=DATASET_DIR):
+    """
+    Reads the cleaned dataset, keeping the most recent observation of every place.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Same columns as `final_places.csv`, indexed by a stable `place_id`.
+    """
+    manifest = load_manifest(dataset_dir)
+    if not manifest["parts"]:
+        return pd.DataFrame(columns=OUTPUT_COLUMNS[:-1])
+    df = pd.concat(
+        [pd.read_parquet(os.path.join(dataset_dir, part)) for part in manifest["parts"]]
+    )
+    df = df[~df["place_key"].duplicated(keep="last")]
+    return df.drop(columns="place_key")
+
+
+def main(chunksize=5000, export_csv=False):
+    # Process only the scrape files not seen before
+    written = update(chunksize=chunksize)
+
+    # Rewrite the POI store read by pois_augmentation.py when there are new rows. A store written with float32
+    # coordinates is rewritten as well, even without new rows
+    if written or not os.path.exists(PLACES_STORE_PATH) or not has_exact_places(PLACES_STORE_PATH):
+        count = write_places_store(load_final_places())
+        print(f"POI store: {count} places")
+
+    if export_csv:
+        df = load_final_places()
+        df.to_csv(os.path.join(PLACES_DIR, "final_places.csv"))
+        print(f"final_places.csv: {len(df)} places")
+
+
+if __name__ == "__main__":
+    # Las opciones se definen en cli.py, el punto de entrada común
+    import cli
+    cli.main(["clean", *sys.argv[1:]])
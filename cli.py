@@ -0,0 +1,184 @@
+"""
+Single command-line entry point of GoVibes: `python cli.py <command> [options]`.
+
+Every step of the flow is a subcommand. Only `argparse` is imported to parse the command line: the module that
+does the work (and with it pandas, chromadb, boto3, selenium...) is imported once the command is known, so
+`--help`, a mistyped option or `pipeline --dry-run` answer in a few tens of milliseconds. The scripts can still be
+run directly (`python query.py --near 6.2,-75.5`); they parse their options here too.
+
+Commands:
+---------
+- `scrape`: Google Maps scraper (`scraper.py`).
+- `clean`: Incremental cleaning of the scraper output (`cleaning.py`).
+- `augment`: Descriptions of the POIs with Claude (`pois_augmentation.py`).
+- `ingest`: Load of the augmented POIs into the vector database (`ingest.py`).
+- `profile`: Onboarding conversation, or the precomputed question tree with `--build-tree` (`user_context.py`).
+- `query`: Recommended POIs of the profile (`query.py`).
+- `route`: Directions between the recommended POIs (`route_recommender.py`).
+- `pipeline`: Runs the out-of-date stages of the data pipeline (`pipeline.py`).
+- `serve`: HTTP service (`service.py`).
+
+Example usage:
+--------------
+    python cli.py --help
+    python cli.py augment --concurrency 8 --rate 4
+    python cli.py query --near 6.2442,-75.5812 --radius-km 1.5
+"""
+
+import argparse
+import sys
+
+
+def run_scrape(args):
+    import scraper
+
+    def source_factory():
+        if args.fixtures:
+            return scraper.FixtureSource(args.fixtures)
+        source = scraper.SeleniumSource(headless=not args.show)
+        return scraper.RecordingSource(source, args.record) if args.record else source
+
+    comunas = args.comunas if args.comunas is not None else scraper.PLACES["Medellín"]["Comunidades"]
+    sites = args.sites if args.sites is not None else scraper.SITES
+    scraper.scrape([(comuna, site) for comuna in comunas for site in sites], source_factory, workers=args.workers)
+    print(f"{scraper.collect()} places written to {scraper.OUTPUT_DIR}/{scraper.OUTPUT_PREFIX}*.csv")
+
+
+def run_clean(args):
+    import cleaning
+
+    cleaning.main(chunksize=args.chunksize, export_csv=args.export_csv)
+
+
+def run_augment(args):
+    import pois_augmentation
+
+    failed = pois_augmentation.main(concurrency=args.concurrency, rate=args.rate, batch_size=args.batch_size)
+    # Un código de salida distinto de cero evita que pipeline.py dé la etapa por terminada con filas fallidas
+    if failed:
+        sys.exit(f"{failed} rows could not be augmented; they will be retried on the next run")
+
+
+def run_ingest(args):
+    import ingest
+
+    ingest.ingest(args.data or ingest.default_data(), batch_size=args.batch_size, dedup_pois=not args.no_dedup)
+
+
+def run_profile(args):
+    import user_context
+
+    if args.build_tree:
+        tree = user_context.build_question_tree(concurrency=args.concurrency)
+        print(f"Árbol guardado en {user_context.TREE_PATH} con {len(tree['nodes'])} preguntas")
+    else:
+        user_context.main(tree=None if args.no_tree else user_context.load_question_tree())
+
+
+def run_query(args):
+    import glob
+    import query
+
+    if args.profiles:
+        query.query_many(sorted(glob.glob(args.profiles)), args.output, seed=args.seed)
+    else:
+        with open("./data/output/user_profile/profile.txt", 'r') as f:
+            profile = f.read()
+        near = tuple(float(x) for x in args.near.split(",")) if args.near else None
+        query.query(profile, near=near, radius_km=args.radius_km)
+
+
+def run_route(args):
+    import route_recommender
+
+    route_recommender.main(stops=args.stops)
+
+
+def run_pipeline(args):
+    import time
+    import pipeline
+
+    start = time.perf_counter()
+    results = pipeline.run_pipeline(targets=args.targets, force=args.force, workers=args.workers, dry_run=args.dry_run)
+    print(f"Pipeline finished in {time.perf_counter() - start:.2f}s")
+    if any(result["status"] in ("failed", "blocked") for result in results.values()):
+        sys.exit(1)
+
+
+def run_serve(args):
+    import uvicorn
+    import service
+
+    uvicorn.run(service.app, host=args.host, port=args.port, access_log=False)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="govibes", description="GoVibes: del scraper de POIs a la ruta del turista.")
+    commands = parser.add_subparsers(dest="command", required=True, metavar="command")
+
+    scrape = commands.add_parser("scrape", help="Extrae lugares de Google Maps por comuna y tipo de sitio.")
+    scrape.add_argument("--workers", type=int, default=4, help="Navegadores en paralelo")
+    scrape.add_argument("--comunas", nargs="*", default=None, help="Comunas de Medellín (todas por defecto)")
+    scrape.add_argument("--sites", nargs="*", default=None, help="Tipos de sitio (todos por defecto)")
+    scrape.add_argument("--fixtures", help="Usa las páginas guardadas en este directorio en lugar del navegador")
+    scrape.add_argument("--record", help="Guarda las páginas descargadas en este directorio como fixtures")
+    scrape.add_argument("--show", action="store_true", help="Muestra la ventana del navegador")
+    scrape.set_defaults(func=run_scrape)
+
+    clean = commands.add_parser("clean", help="Limpia incrementalmente los resultados del scraper.")
+    clean.add_argument("--chunksize", type=int, default=5000, help="Filas leídas por bloque")
+    clean.add_argument("--export-csv", action="store_true", help="Escribe también final_places.csv")
+    clean.set_defaults(func=run_clean)
+
+    augment = commands.add_parser("augment", help="Aumenta los POIs de final_places.csv con Claude en Bedrock.")
+    augment.add_argument("--concurrency", type=int, default=4, help="Solicitudes simultáneas a Bedrock")
+    augment.add_argument("--rate", type=float, default=2.0, help="Solicitudes por segundo iniciales del limitador")
+    augment.add_argument("--batch-size", type=int, default=1, help="POIs por prompt (1 = un POI por solicitud)")
+    augment.set_defaults(func=run_augment)
+
+    ingest = commands.add_parser("ingest", help="Carga los POIs aumentados en la colección GoVibes de Chroma.")
+    ingest.add_argument("--batch-size", type=int, default=500, help="POIs por upsert")
+    ingest.add_argument("--data", help="augmented_pois.json o un almacén de POIs (por defecto el almacén, si existe)")
+    ingest.add_argument("--no-dedup", action="store_true", help="Ingresa también los POIs casi duplicados")
+    ingest.set_defaults(func=run_ingest)
+
+    profile = commands.add_parser("profile", help="Construye el perfil del turista con preguntas generadas por Claude.")
+    profile.add_argument("--build-tree", action="store_true", help="Precalcula todas las preguntas posibles y termina")
+    profile.add_argument("--concurrency", type=int, default=4, help="Solicitudes simultáneas al construir el árbol")
+    profile.add_argument("--no-tree", action="store_true", help="Pregunta siempre al modelo en vivo")
+    profile.set_defaults(func=run_profile)
+
+    query = commands.add_parser("query", help="Recomienda POIs a partir del perfil del turista.")
+    query.add_argument("--profiles", help="Patrón glob de perfiles para recomendar en bloque, p. ej. './perfiles/*.txt'")
+    query.add_argument("--output", default="./data/output/recomended_pois/bulk_recommendations.parquet")
+    query.add_argument("--seed", type=int, default=None)
+    query.add_argument("--near", help="Ubicación del turista como 'lat,lon' para recomendar POIs cercanos")
+    query.add_argument("--radius-km", type=float, default=2.0)
+    query.set_defaults(func=run_query)
+
+    route = commands.add_parser("route", help="Indicaciones en transporte público entre los POIs recomendados.")
+    route.add_argument("--stops", type=int, default=3, help="Número de POIs de top3_places.csv a visitar")
+    route.set_defaults(func=run_route)
+
+    pipeline = commands.add_parser("pipeline", help="Ejecuta las etapas desactualizadas del pipeline de datos.")
+    pipeline.add_argument("targets", nargs="*", help="Etapas a actualizar (con sus dependencias); todas por defecto")
+    pipeline.add_argument("--force", nargs="*", default=[], help="Etapas que se ejecutan aunque estén al día")
+    pipeline.add_argument("--workers", type=int, default=4, help="Etapas simultáneas")
+    pipeline.add_argument("--dry-run", action="store_true", help="Solo muestra qué etapas se ejecutarían")
+    pipeline.set_defaults(func=run_pipeline)
+
+    serve = commands.add_parser("serve", help="Servicio HTTP de GoVibes: perfil, recomendaciones y ruta.")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8000)
+    serve.set_defaults(func=run_serve)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Persistent, content-addressed cache for LLM completions.
+
+`pois_augmentation.py` and `user_context.py` send the same prompts to Claude again and again (re-runs after a
+template change elsewhere, repeated onboarding answers...). This module stores every completion on disk under a
+SHA-256 key of the model id, the sampling parameters and the prompt, so an identical request is answered from a
+local SQLite file in microseconds instead of waiting seconds for Bedrock.
+
+Features:
+---------
+- Content-addressed keys: any change in the model, the sampling parameters or the prompt is a different entry.
+- Size-bounded LRU eviction: when the stored completions exceed `max_bytes`, the least recently used ones are
+  deleted.
+- Hit/miss counters available through `stats()`.
+- Bypass flag (`bypass=True` or the `LLM_CACHE_BYPASS=1` environment variable) to always call the model.
+- Safe to share between the worker threads of the augmentation pool.
+
+Environment variables:
+----------------------
+- `LLM_CACHE_PATH`: SQLite file of the cache (default `./data/cache/completions.sqlite`).
+- `LLM_CACHE_MAX_BYTES`: Maximum size of the stored completions (default 512 MB).
+- `LLM_CACHE_BYPASS`: Set to `1` to skip the cache.
+
+Example usage:
+--------------
+    cache = CompletionCache()
+    key = cache.make_key("anthropic.claude-v2", {"temperature": 1}, prompt)
+    completion = cache.get(key)
+    if completion is None:
+        completion = call_the_model(prompt)
+        cache.put(key, completion)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+DEFAULT_PATH = "./data/cache/completions.sqlite"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class CompletionCache:
+    """
+    On-disk LRU cache of model completions.
+
+    Parameters:
+    -----------
+    path : str, optional
+        SQLite file where the completions are stored.
+    max_bytes : int, optional
+        Maximum total size of the stored completions before evicting the least recently used ones.
+    bypass : bool, optional
+        When True, `get` always misses and `put` does nothing.
+    """
+
+    def __init__(self, path=None, max_bytes=None, bypass=None):
+        self.path = path or os.getenv("LLM_CACHE_PATH", DEFAULT_PATH)
+        self.max_bytes = int(max_bytes or os.getenv("LLM_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        if bypass is None:
+            bypass = os.getenv("LLM_CACHE_BYPASS", "0").lower() in ("1", "true", "yes")
+        self.bypass = bypass
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        # La conexión se abre al primer uso para que importar el módulo no toque el disco
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS completions (
+                       key TEXT PRIMARY KEY,
+                       completion TEXT NOT NULL,
+                       size INTEGER NOT NULL,
+                       last_access REAL NOT NULL
+                   )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON completions (last_access)")
+        return self._conn
+
+    @staticmethod
+    def make_key(model_id, params, prompt):
+        """
+        Returns the content hash identifying a request.
+        """
+        payload = json.dumps({"model": model_id, "params": params, "prompt": prompt},
+                             sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        Returns the cached completion for `key`, or None on a miss.
+        """
+        if self.bypass:
+            return None
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT completion FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE completions SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, completion):
+        """
+        Stores a completion and evicts the least recently used entries if the cache is over its size limit.
+        """
+        if self.bypass:
+            return
+        size = len(completion.encode("utf-8"))
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO completions (key, completion, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, completion, size, time.time()),
+            )
+            self._evict(conn)
+
+    def discard(self, key):
+        """
+        Removes an entry, e.g. a completion that turned out not to be parseable.
+        """
+        if self.bypass:
+            return
+        with self._lock:
+            self._connect().execute("DELETE FROM completions WHERE key = ?", (key,))
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM completions ORDER BY last_access"):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM completions WHERE key = ?", victims)
+
+    def stats(self):
+        """
+        Returns the hit/miss counters and the current size of the cache.
+        """
+        with self._lock:
+            entries, size = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
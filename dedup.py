@@ -0,0 +1,323 @@
+"""
+Near-duplicate pruning of the augmented POIs before they are ingested, with MinHash and LSH banding.
+
+The scraper runs overlap (`places1..7.csv` search the same sites from every comuna) and Google Maps lists the same
+place with slightly different coordinates, so `augmented_pois.json` holds several entries per place, each with its
+own paraphrase of the same description. They get different ids, and each clone takes one of the `n_results` slots
+of `query.py` and a node of the HNSW index. This stage keeps one representative per place:
+
+1. Every description is normalized like `lexical_index.tokenize` does and cut into character shingles.
+2. A MinHash signature of `num_perm` values summarizes the shingles of each POI; the fraction of equal values of
+   two signatures estimates the Jaccard similarity of their shingles.
+3. The signatures are split into bands (LSH); POIs sharing a band and a cell of `2 * radius_km` (see `grid_cells`)
+   fall into the same bucket. The number of bands is chosen so pairs above `threshold` almost always share one, so
+   only POIs in a common bucket are compared and the whole stage runs in roughly linear time.
+4. A candidate pair is merged when its estimated similarity is at least `threshold`, its names share most of their
+   tokens and it is less than `radius_km` apart. Chain locations with the same text stay apart, since they are
+   different places to visit.
+5. Every group of merged POIs keeps the one with the best Bayesian rating (the longest description on ties).
+
+The description of a place is paraphrased by the model on every run, so the similarity of two clones is far from
+1: the shingles only decide which pairs are compared and discard unrelated texts, while name and distance decide
+the merge.
+
+Example usage:
+--------------
+    duplicates = find_duplicates(iter_pois("./data/output/augmented/augmented_pois.json"))
+    representatives = [(id, poi) for id, poi in iter_pois(data) if id not in duplicates]
+"""
+
+import re
+import time
+import unicodedata
+
+import numpy as np
+
+from lexical_index import STOPWORDS, normalize
+
+
+EARTH_RADIUS_KM = 6371.0
+
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_RADIUS_KM = 0.25
+DEFAULT_NAME_THRESHOLD = 0.65
+SIGNATURE_BATCH = 256
+
+
+def normalize_description(text):
+    """
+    Returns the tokens of `lexical_index.tokenize` joined by spaces.
+
+    The accents are removed in a single pass over the whole text instead of character by character, which is most
+    of the cost of a signature.
+    """
+    text = unicodedata.normalize("NFKD", str(text or "").lower()).encode("ascii", "ignore").decode("ascii")
+    return " ".join(token for token in re.findall(r"[a-z0-9]+", text) if len(token) > 2 and token not in STOPWORDS)
+
+
+def shingle_hashes(text, size=3):
+    """
+    Returns the 32-bit hashes of the character shingles of the normalized text (repeated shingles included).
+    """
+    data = np.frombuffer(normalize_description(text).encode("ascii"), dtype=np.uint8).astype(np.uint64)
+    if len(data) < size:
+        data = np.concatenate([data, np.zeros(size - len(data), dtype=np.uint64)])
+    # Hash polinómico de cada ventana de `size` bytes, plegado a 32 bits
+    windows = np.lib.stride_tricks.sliding_window_view(data, size)
+    hashes = windows @ (np.uint64(257) ** np.arange(size - 1, -1, -1, dtype=np.uint64))
+    return (hashes ^ (hashes >> np.uint64(32))) & np.uint64(0xFFFFFFFF)
+
+
+class MinHasher:
+    """
+    MinHash signatures with `num_perm` multiply-shift hash functions `(a * x + b) >> 32` (mod 2^64).
+
+    Parameters:
+    -----------
+    num_perm : int
+        Values of every signature.
+    shingle_size : int
+        Characters of every shingle.
+    seed : int
+        Seed of the hash functions; signatures are only comparable with the same seed.
+    """
+
+    def __init__(self, num_perm=128, shingle_size=3, seed=0):
+        random = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        # `a` impar: la multiplicación módulo 2^64 es una biyección
+        self.a = random.integers(0, 2 ** 63, size=(num_perm, 1), dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.b = random.integers(0, 2 ** 63, size=(num_perm, 1), dtype=np.uint64)
+
+    def signatures(self, texts):
+        """
+        Returns the (len(texts), num_perm) uint32 signatures of `texts`, hashing all their shingles at once.
+        """
+        hashes = [shingle_hashes(text, self.shingle_size) for text in texts]
+        if not hashes:
+            return np.zeros((0, self.num_perm), dtype=np.uint32)
+        starts = np.cumsum([0] + [len(values) for values in hashes[:-1]])
+        values = (self.a * np.concatenate(hashes) + self.b) >> np.uint64(32)
+        return np.minimum.reduceat(values, starts, axis=1).T.astype(np.uint32)
+
+
+def lsh_bands(num_perm, threshold):
+    """
+    Returns the `(bands, rows)` whose S-curve `(1 / bands) ** (1 / rows)` is the highest one below `threshold`, so
+    pairs above the threshold share a bucket with high probability.
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        if (1 / bands) ** (1 / rows) <= threshold:
+            best = (bands, rows)
+    return best
+
+
+def grid_cells(coords, radius_km):
+    """
+    Returns the cells of every POI in 4 grids of side `2 * radius_km`, shifted by half a cell in each direction.
+
+    Two POIs less than `radius_km` apart share a cell in at least one of the grids, so comparing only the POIs of
+    a common cell finds every pair within the radius.
+
+    Parameters:
+    -----------
+    coords : numpy.ndarray
+        (N, 2) latitudes and longitudes in radians.
+
+    Returns:
+    --------
+    list of numpy.ndarray
+        One (N, 2) int64 array of cell coordinates per grid.
+    """
+    side = 2 * radius_km / EARTH_RADIUS_KM
+    # Los meridianos se acercan con la latitud: la celda se ensancha en longitud para seguir midiendo 2 * radio
+    scale = np.array([side, side / max(np.cos(np.nanmax(np.abs(coords[:, 0]))), 1e-6)])
+    return [
+        np.floor(coords / scale + np.array(shift)).astype(np.int64)
+        for shift in [(0, 0), (0.5, 0), (0, 0.5), (0.5, 0.5)]
+    ]
+
+
+def lsh_pairs(signatures, bands, rows, cells=None):
+    """
+    Returns the distinct pairs of rows `(i, j)`, `i < j`, that fall into the same LSH bucket in some band.
+
+    With `cells` (see `grid_cells`) a bucket holds the POIs that share a band and a cell of one of the grids.
+    """
+    n = len(signatures)
+    found = np.zeros(0, dtype=np.int64)
+    for band in range(bands):
+        pairs = []
+        values = signatures[:, band * rows:(band + 1) * rows].astype(np.int64)
+        for grid in cells if cells is not None else [np.zeros((len(signatures), 0), dtype=np.int64)]:
+            keys = np.hstack([values, grid])
+            order = np.lexsort(keys.T)
+            keys = keys[order]
+            buckets = np.cumsum(np.concatenate([[True], (keys[1:] != keys[:-1]).any(axis=1)]))
+            # Los POIs de un bucket quedan contiguos: cada desplazamiento k empareja los que están a k posiciones
+            for k in range(1, len(order)):
+                same = buckets[:-k] == buckets[k:]
+                if not same.any():
+                    break
+                first, second = order[:-k][same], order[k:][same]
+                pairs.append(np.minimum(first, second) * n + np.maximum(first, second))
+        # Cada par se codifica como i * n + j; quitar los repetidos en cada banda acota la memoria
+        found = np.sort(np.concatenate([found, *pairs]))
+        found = found[np.concatenate([[True], found[1:] != found[:-1]])]
+    return np.column_stack(np.divmod(found, n)) if len(found) else np.zeros((0, 2), dtype=np.int64)
+
+
+def haversine_km(a, b):
+    """
+    Great-circle distance in kilometres between the (lat, lon) rows, in radians, of `a` and `b`.
+    """
+    h = (np.sin((b[:, 0] - a[:, 0]) / 2) ** 2
+         + np.cos(a[:, 0]) * np.cos(b[:, 0]) * np.sin((b[:, 1] - a[:, 1]) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0, 1)))
+
+
+def name_tokens(name):
+    """
+    Returns the normalized tokens of a name without stopwords, and without the final "s" of the longer ones so
+    plurals match.
+
+    Unlike `lexical_index.tokenize`, numbers and short words are kept: they are often what tells two places of the
+    same kind apart ("Bar 70" and "Bar 80").
+    """
+    return frozenset(
+        token[:-1] if len(token) > 3 and token.endswith("s") else token
+        for token in re.findall(r"[a-z0-9]+", normalize(name)) if token not in STOPWORDS
+    )
+
+
+def name_similarity(a, b):
+    """
+    Jaccard similarity of the `name_tokens` of two names (or of two sets of them).
+
+    "Parque Lineal La Presidenta" and "Parque De La Presidenta" score 2/3, while "Parque De La Cruz" and "Parque de
+    la Madre" only share the generic word and score 1/3. A name without tokens matches no other name.
+    """
+    a, b = (name if isinstance(name, frozenset) else name_tokens(name) for name in (a, b))
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _find(parent, row):
+    while parent[row] != row:
+        parent[row] = parent[parent[row]]
+        row = parent[row]
+    return row
+
+
+def find_duplicates(pois, threshold=DEFAULT_THRESHOLD, radius_km=DEFAULT_RADIUS_KM,
+                    name_threshold=DEFAULT_NAME_THRESHOLD, num_perm=128, shingle_size=3, seed=0):
+    """
+    Finds the POIs that are near-duplicates of another one.
+
+    Only the signature and a few fields of every POI are kept in memory (about `4 * num_perm` bytes per POI), so
+    `pois` can be a stream.
+
+    Parameters:
+    -----------
+    pois : iterable of (str, dict)
+        `(id, poi)` pairs, with `poi` in the format of `augmented_pois.json`.
+    threshold : float
+        Minimum estimated Jaccard similarity of the description shingles of two POIs to merge them.
+    radius_km : float
+        Maximum distance between two POIs to merge them. POIs without coordinates are never merged.
+    name_threshold : float
+        Minimum similarity of the names of two POIs to merge them (see `name_similarity`).
+    num_perm : int
+        Values of every MinHash signature.
+    shingle_size : int
+        Characters of every shingle.
+
+    Returns:
+    --------
+    dict
+        `{duplicate id: representative id}`, with an entry for every POI that should not be ingested.
+    """
+    start = time.perf_counter()
+    hasher = MinHasher(num_perm, shingle_size, seed)
+    ids, names, coords, ranks, signatures = [], [], [], [], []
+    rows_by_id = {}
+    pending = []
+
+    def flush():
+        # Las firmas se calculan por bloques: una sola multiplicación por todas las tejas del bloque
+        for (row, _), signature in zip(pending, hasher.signatures([text for _, text in pending])):
+            signatures[row] = signature
+        pending.clear()
+
+    for poi_id, poi in pois:
+        data = poi["data"]
+        latitude, longitude = data.get("latitude"), data.get("longitude")
+        rating = data.get("rating bayesian")
+        fields = (
+            name_tokens(str(data.get("name", ""))),
+            (
+                np.nan if latitude in (None, "") else float(latitude),
+                np.nan if longitude in (None, "") else float(longitude),
+            ),
+            (float(rating) if rating not in (None, "") else 0.0, len(poi["description"] or "")),
+            None,
+        )
+        # Un id repetido es el mismo POI: como en la ingesta, gana la última aparición
+        row = rows_by_id.setdefault(poi_id, len(ids))
+        if row == len(ids):
+            ids.append(poi_id)
+            for values, value in zip((names, coords, ranks, signatures), fields):
+                values.append(value)
+        else:
+            for values, value in zip((names, coords, ranks, signatures), fields):
+                values[row] = value
+        pending.append((row, poi["description"]))
+        if len(pending) >= SIGNATURE_BATCH:
+            flush()
+    flush()
+
+    coords = np.radians(np.asarray(coords, dtype=np.float64).reshape(-1, 2))
+    # Los POIs sin coordenadas no pueden estar cerca de otro: no entran en ningún bucket
+    located = np.nonzero(np.isfinite(coords).all(axis=1))[0]
+    if len(located) < 2:
+        return {}
+    signatures = np.vstack(signatures)
+    bands, rows = lsh_bands(num_perm, threshold)
+
+    # Cada bucket comparte una banda de la firma y una celda de unos cientos de metros
+    pairs = located[lsh_pairs(signatures[located], bands, rows, grid_cells(coords[located], radius_km))]
+
+    # Distancia y similitud estimada de todos los pares a la vez; el nombre solo de los que pasan ambas
+    close = pairs[haversine_km(coords[pairs[:, 0]], coords[pairs[:, 1]]) <= radius_km]
+    similar = np.concatenate([
+        (signatures[chunk[:, 0]] == signatures[chunk[:, 1]]).mean(axis=1) >= threshold
+        for chunk in np.array_split(close, max(1, len(close) // 100_000))
+    ]) if len(close) else np.zeros(0, dtype=bool)
+
+    parent = list(range(len(ids)))
+    for row, other in close[similar].tolist():
+        if name_similarity(names[row], names[other]) >= name_threshold:
+            root, other_root = _find(parent, row), _find(parent, other)
+            parent[max(root, other_root)] = min(root, other_root)
+
+    groups = {}
+    for row in range(len(ids)):
+        groups.setdefault(_find(parent, row), []).append(row)
+    duplicates = {}
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        # Gana el de mejor calificación y, a igualdad, el de la descripción más completa
+        representative = max(members, key=lambda row: (ranks[row], -row))
+        duplicates.update({ids[row]: ids[representative] for row in members if row != representative})
+
+    print(
+        f"Near-duplicates: {len(duplicates)} of {len(ids)} POIs merged into "
+        f"{len({representative for representative in duplicates.values()})} places "
+        f"({len(pairs)} candidate pairs, {bands} bands of {rows}) in {time.perf_counter() - start:.2f}s"
+    )
+    return duplicates
@@ -0,0 +1,115 @@
+"""
+Persistent cache of Google Maps Directions responses.
+
+The POI set is fixed, so the same pairs of places are routed again and again for different users. Responses are
+stored in a SQLite file keyed by the origin and destination rounded to `precision` decimals (5 decimals is about
+one metre), the travel mode and the language. Entries expire after `ttl` seconds, because transit schedules
+change, and the least recently used ones are evicted when the cache holds more than `max_entries`.
+
+Environment variables:
+----------------------
+- `DIRECTIONS_CACHE_PATH`: SQLite file of the cache (default `./data/cache/directions.sqlite`).
+- `DIRECTIONS_CACHE_TTL`: Lifetime of an entry in seconds (default one week).
+
+Example usage:
+--------------
+    cache = DirectionsCache()
+    key = cache.make_key(origin, destination, "transit", "es")
+    result = cache.get(key)
+    if result is None:
+        result = fetch(...)
+        cache.put(key, result)
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+DEFAULT_PATH = "./data/cache/directions.sqlite"
+DEFAULT_TTL = 7 * 24 * 3600
+
+
+class DirectionsCache:
+    """
+    On-disk TTL + LRU cache of Directions API responses.
+
+    Parameters:
+    -----------
+    path : str, optional
+        SQLite file where the responses are stored.
+    ttl : float, optional
+        Seconds after which an entry is considered stale.
+    max_entries : int
+        Maximum number of stored responses.
+    precision : int
+        Decimals kept from the coordinates when building the key.
+    """
+
+    def __init__(self, path=None, ttl=None, max_entries=100_000, precision=5):
+        self.path = path or os.getenv("DIRECTIONS_CACHE_PATH", DEFAULT_PATH)
+        self.ttl = float(ttl if ttl is not None else os.getenv("DIRECTIONS_CACHE_TTL", DEFAULT_TTL))
+        self.max_entries = max_entries
+        self.precision = precision
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS directions (
+                       key TEXT PRIMARY KEY,
+                       response TEXT NOT NULL,
+                       created REAL NOT NULL,
+                       last_access REAL NOT NULL
+                   )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_directions_access ON directions (last_access)")
+        return self._conn
+
+    def make_key(self, origin, destination, mode, language):
+        origin = ",".join(f"{float(x):.{self.precision}f}" for x in origin)
+        destination = ",".join(f"{float(x):.{self.precision}f}" for x in destination)
+        return f"{origin}|{destination}|{mode}|{language}"
+
+    def get(self, key):
+        """
+        Returns the cached response for `key`, or None when it is missing or expired.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT response, created FROM directions WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    conn.execute("DELETE FROM directions WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            conn.execute("UPDATE directions SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(self, key, response):
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO directions (key, response, created, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(response, ensure_ascii=False), now, now),
+            )
+            count = conn.execute("SELECT COUNT(*) FROM directions").fetchone()[0]
+            if count > self.max_entries:
+                conn.execute(
+                    "DELETE FROM directions WHERE key IN "
+                    "(SELECT key FROM directions ORDER BY last_access LIMIT ?)",
+                    (count - self.max_entries,),
+                )
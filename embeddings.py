@@ -0,0 +1,156 @@
+"""
+Local embedding stage with a persistent embedding cache.
+
+Instead of sending raw text to Chroma and letting the server embed every document on every ingest (and every
+profile on every query), texts are embedded locally with `sentence-transformers` in large CPU batches. Each vector
+is stored in a SQLite cache under a SHA-256 key of the model name and the text, so unchanged descriptions and
+repeated profiles are never embedded twice.
+
+The default model is `all-MiniLM-L6-v2`, the same model Chroma uses by default, so vectors computed here are
+compatible with collections that were populated by the server.
+
+Environment variables:
+----------------------
+- `EMBEDDING_MODEL`: sentence-transformers model name (default `all-MiniLM-L6-v2`).
+- `EMBEDDING_CACHE_PATH`: SQLite file of the cache (default `./data/cache/embeddings.sqlite`).
+
+Example usage:
+--------------
+    embedder = Embedder()
+    vectors = embedder.embed(["Museo de arte moderno...", "Bar con música en vivo..."])
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+import telemetry
+
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+DEFAULT_CACHE_PATH = "./data/cache/embeddings.sqlite"
+
+
+class EmbeddingCache:
+    """
+    On-disk store of float32 vectors keyed by content hash.
+
+    Parameters:
+    -----------
+    path : str, optional
+        SQLite file where the vectors are stored.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv("EMBEDDING_CACHE_PATH", DEFAULT_CACHE_PATH)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        return self._conn
+
+    @staticmethod
+    def make_key(model_name, text):
+        return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys):
+        """
+        Returns a dict with the vectors found for `keys`.
+        """
+        found = {}
+        with self._lock:
+            conn = self._connect()
+            # SQLite limita el número de parámetros por consulta
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for key, blob in conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ):
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        self.hits += len(found)
+        self.misses += len(set(keys)) - len(found)
+        return found
+
+    def put_many(self, items):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items],
+            )
+            conn.execute("COMMIT")
+
+
+class Embedder:
+    """
+    Batched local embedder backed by an `EmbeddingCache`.
+
+    Parameters:
+    -----------
+    model_name : str, optional
+        sentence-transformers model used to embed the texts.
+    cache : EmbeddingCache, optional
+        Cache of computed vectors. A new one with the default path is created if not given.
+    batch_size : int
+        Number of texts encoded at once on the CPU.
+    """
+
+    def __init__(self, model_name=None, cache=None, batch_size=256):
+        self.model_name = model_name or os.getenv("EMBEDDING_MODEL", DEFAULT_MODEL)
+        self.cache = cache or EmbeddingCache()
+        self.batch_size = batch_size
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        # El modelo se carga solo cuando hay algo que embeber: con la caché caliente no se importa torch
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import SentenceTransformer
+                self._model = SentenceTransformer(self.model_name, device="cpu")
+        return self._model
+
+    def embed(self, texts):
+        """
+        Returns a float32 matrix with one normalized embedding per text, computing only the ones not cached.
+        """
+        texts = list(texts)
+        keys = [self.cache.make_key(self.model_name, text) for text in texts]
+        vectors = self.cache.get_many(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing[key] = text
+
+        telemetry.count("govibes.cache.hits", len(texts) - len(missing), cache="embedding")
+        if missing:
+            telemetry.count("govibes.cache.misses", len(missing), cache="embedding")
+            with telemetry.span("embedder.encode", histogram="govibes.embedding.duration", texts=len(missing)):
+                computed = self.model.encode(
+                    list(missing.values()),
+                    batch_size=self.batch_size,
+                    normalize_embeddings=True,
+                    convert_to_numpy=True,
+                ).astype(np.float32)
+            new_vectors = list(zip(missing.keys(), computed))
+            self.cache.put_many(new_vectors)
+            vectors.update(new_vectors)
+
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.vstack([vectors[key] for key in keys])
@@ -0,0 +1,244 @@
+"""
+Local stand-in for the Amazon Bedrock runtime `InvokeModel` endpoint.
+
+It speaks just enough of the Bedrock REST protocol for `boto3.client("bedrock-runtime", endpoint_url=...)`
+to work against it, so the augmentation and user-context scripts can be exercised without AWS credentials,
+cost or network access. Latency and throttling are injected on purpose to reproduce the conditions of the
+real service.
+
+Behaviour:
+----------
+- `POST /model/{modelId}/invoke` answers with `{"completion": ...}` after `latency` seconds (plus `jitter`).
+- A request is rejected with a `ThrottlingException` (HTTP 429) when more than `max_in_flight` requests are
+  being served at once, or at random with probability `throttle_rate`.
+- The completion text is produced by `responder(prompt)`. The default responder returns what
+  `pois_augmentation.py` expects to parse: a JSON object with a description derived from the prompt and the
+  `data` of the place (name, comuna, coordinates...) taken from its input, or a JSON array with one such element
+  per place for a batched prompt.
+
+Example usage:
+--------------
+    server = FakeBedrock(latency=0.2, max_in_flight=8).start()
+    os.environ["BEDROCK_ENDPOINT_URL"] = server.url
+    ...
+    server.stop()
+
+It can also be run standalone:
+
+    python fake_bedrock.py --port 8765 --latency 0.5 --max-in-flight 4
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Columnas del CSV que pueden tener comas dentro de su valor
+FREE_TEXT_COLUMNS = {"desc", "accessibility", "schedule", "address"}
+
+
+def place_data(fields):
+    """
+    Builds the `data` object of a place from its input fields, as the model is asked to.
+    """
+    def number(name):
+        try:
+            return float(fields.get(name))
+        except (TypeError, ValueError):
+            return None
+
+    data = {
+        "name": fields.get("name"),
+        "comuna": fields.get("comuna") or fields.get("Comuna"),
+        "categories": str(fields.get("category") or "").lower(),
+        "address": fields.get("address"),
+        "rating bayesian": number("rating") if "rating" in fields else number("bayesian_mean"),
+        "latitude": number("lat"),
+        "longitude": number("lon"),
+    }
+    return {key: value for key, value in data.items() if value not in (None, "", "nan")}
+
+
+def row_fields(prompt):
+    """
+    Returns the fields of the place of a single-row prompt (`pois_augmentation.build_prompt`).
+
+    The values are joined with ", " and free text can contain it too, so only the columns before the first free
+    text column (read from the start) and after the last one (read from the end) are recovered.
+    """
+    columns = re.search(r'columnas son los siguientes:\s*"(.*?)"', prompt, flags=re.DOTALL)
+    values = re.search(r'input : "\n(.*)\n"\s*$', prompt, flags=re.DOTALL)
+    if not columns or not values:
+        return {}
+    columns, values = columns.group(1).split(", "), values.group(1).split(", ")
+    if len(values) == len(columns):
+        return dict(zip(columns, values))
+    text = [i for i, column in enumerate(columns) if column in FREE_TEXT_COLUMNS] or [len(columns)]
+    fields = {column: values[i] for i, column in enumerate(columns[:text[0]])}
+    fields.update({column: values[i - len(columns)] for i, column in enumerate(columns) if i > text[-1]})
+    return fields
+
+
+def batch_rows(prompt):
+    """
+    Returns the places of a batched prompt (`pois_augmentation.build_batch_prompt`): the JSON lines at its end.
+    """
+    rows = []
+    for line in reversed(prompt.rstrip().splitlines()):
+        try:
+            row = json.loads(line)
+        except ValueError:
+            break
+        if not isinstance(row, dict) or "id" not in row:
+            break
+        rows.append(row)
+    return rows[::-1]
+
+
+def default_responder(prompt):
+    """
+    Builds a deterministic, parseable completion for a prompt.
+    """
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+    rows = batch_rows(prompt)
+    if rows:
+        completion = [
+            {"id": row["id"], "description": f"Descripción generada localmente ({digest}).", "data": place_data(row)}
+            for row in rows
+        ]
+    else:
+        completion = {
+            "description": f"Descripción generada localmente ({digest}).",
+            "data": place_data(row_fields(prompt)),
+        }
+    return " Aquí está el resultado:\n" + json.dumps(completion, ensure_ascii=False)
+
+
+class FakeBedrock:
+    """
+    Threaded HTTP server emulating Bedrock `InvokeModel` with configurable latency and throttling.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0,
+                 throttle_rate=0.0, max_in_flight=None, responder=default_responder, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.max_in_flight = max_in_flight
+        self.responder = responder
+
+        self.requests = 0
+        self.throttled = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _admit(self):
+        with self._lock:
+            self.requests += 1
+            over_limit = self.max_in_flight is not None and self.in_flight >= self.max_in_flight
+            if over_limit or self._random.random() < self.throttle_rate:
+                self.throttled += 1
+                return False
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            return True
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, payload, headers=None):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+
+                if not self.path.startswith("/model/") or not self.path.endswith("/invoke"):
+                    self._send(404, {"message": "Unknown operation"},
+                               {"x-amzn-ErrorType": "ResourceNotFoundException"})
+                    return
+
+                if not fake._admit():
+                    self._send(429, {"message": "Too many requests, please wait before trying again."},
+                               {"x-amzn-ErrorType": "ThrottlingException"})
+                    return
+
+                try:
+                    time.sleep(fake.latency + fake._random.uniform(0, fake.jitter))
+                    prompt = request.get("prompt", "")
+                    prompt = prompt.removeprefix("\n\nHuman: ").removesuffix("\n\nAssistant:")
+                    completion = fake.responder(prompt)
+                    # Conteo aproximado de tokens, en las mismas cabeceras que Bedrock
+                    self._send(200, {"completion": completion, "stop_reason": "stop_sequence"}, {
+                        "x-amzn-bedrock-input-token-count": str(len(prompt) // 4 + 1),
+                        "x-amzn-bedrock-output-token-count": str(len(completion) // 4 + 1),
+                    })
+                finally:
+                    fake._release()
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor local que emula Bedrock InvokeModel.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--max-in-flight", type=int, default=None)
+    args = parser.parse_args()
+
+    server = FakeBedrock(args.host, args.port, args.latency, args.jitter,
+                         args.throttle_rate, args.max_in_flight)
+    print(f"Fake Bedrock escuchando en {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
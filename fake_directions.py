@@ -0,0 +1,139 @@
+"""
+Local stand-in for the Google Maps Directions API.
+
+Serves `GET /maps/api/directions/json` with a canned transit route between the requested origin and destination,
+after an optional `latency`. Distance and duration are estimated from the straight-line distance, so different
+legs get different, deterministic answers. It lets `route_recommender.py` be exercised without an API key, cost
+or network access.
+
+Example usage:
+--------------
+    server = FakeDirections(latency=0.3).start()
+    os.environ["DIRECTIONS_URL"] = f"{server.url}/maps/api/directions/json"
+    ...
+    server.stop()
+
+It can also be run standalone:
+
+    python fake_directions.py --port 8766 --latency 0.3
+"""
+
+import argparse
+import json
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def haversine_km(origin, destination):
+    lat1, lon1, lat2, lon2 = map(math.radians, (*origin, *destination))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 6371.0 * 2 * math.asin(math.sqrt(a))
+
+
+def canned_route(origin, destination, mode):
+    """
+    Builds a Directions-like response for a single leg.
+    """
+    km = haversine_km(origin, destination) * 1.3  # Las calles no van en línea recta
+    minutes = max(1, round(km / 18 * 60 + 5))  # Velocidad media de transporte público más espera
+    leg = {
+        "distance": {"text": f"{km:.1f} km", "value": round(km * 1000)},
+        "duration": {"text": f"{minutes} min", "value": minutes * 60},
+        "start_location": {"lat": origin[0], "lng": origin[1]},
+        "end_location": {"lat": destination[0], "lng": destination[1]},
+        "steps": [
+            {"html_instructions": "Camina hasta la estación", "travel_mode": "WALKING"},
+            {
+                "html_instructions": "Metro hacia el destino",
+                "travel_mode": mode.upper(),
+                "transit_details": {
+                    "line": {"short_name": "A", "name": "Línea A"},
+                    "departure_stop": {"name": "Estación de origen"},
+                    "arrival_stop": {"name": "Estación de destino"},
+                },
+            },
+        ],
+    }
+    return {"status": "OK", "routes": [{"legs": [leg]}]}
+
+
+class FakeDirections:
+    """
+    Threaded HTTP server emulating the Directions API with configurable latency.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0):
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                with fake._lock:
+                    fake.requests += 1
+                time.sleep(fake.latency)
+
+                try:
+                    origin = tuple(float(x) for x in params["origin"].split(","))
+                    destination = tuple(float(x) for x in params["destination"].split(","))
+                    payload = canned_route(origin, destination, params.get("mode", "driving"))
+                except (KeyError, ValueError):
+                    payload = {"status": "INVALID_REQUEST", "routes": []}
+
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json; charset=UTF-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor local que emula la API de Directions de Google Maps.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    server = FakeDirections(args.host, args.port, args.latency)
+    print(f"Fake Directions escuchando en {server.url}/maps/api/directions/json")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
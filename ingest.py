@@ -1,34 +1,189 @@
-import chromadb as db
+import sys
+import hashlib
 import json
-from uuid import uuid4
+import time
 from dotenv import load_dotenv
 import os
 
-def ingest(data):
+import dedup
+from embeddings import Embedder
+from lexical_index import LexicalIndexBuilder
+from poi_store import AUGMENTED_STORE_PATH, PoiStore, iter_augmented
+from vector_index import build_index
+
+JSON_PATH = "./data/output/augmented/augmented_pois.json"
+
+
+def iter_json_array(path, chunk_size=1 << 16):
+    """
+    Yields the elements of a top-level JSON array one by one, reading the file in chunks.
+
+    Only one chunk plus the element being decoded are held in memory, so the size of the file does not matter.
+
+    Parameters:
+    -----------
+    path : str
+        The file path of a JSON file whose root is an array.
+    chunk_size : int
+        Number of characters read from the file at a time.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as file:
+        # Con bloques pequeños el primero puede ser solo espacios
+        chunk = file.read(chunk_size)
+        buffer = chunk.lstrip()
+        while chunk and not buffer:
+            chunk = file.read(chunk_size)
+            buffer = chunk.lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"{path} does not contain a JSON array")
+        buffer = buffer[1:]
+        eof = False
+
+        while True:
+            buffer = buffer.lstrip().lstrip(",").lstrip()
+            if buffer.startswith("]"):
+                return
+            try:
+                element, end = decoder.raw_decode(buffer)
+                # Un número cortado por el bloque también se decodifica ("12" de "123", "1" de "1.5"): el elemento
+                # solo se acepta cuando lo sigue la coma o el cierre del arreglo, o cuando se terminó el archivo
+                complete = eof or buffer[end:].lstrip()[:1] in (",", "]")
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                complete = False
+            if not complete:
+                chunk = file.read(chunk_size)
+                eof = not chunk
+                buffer += chunk
+                continue
+            yield element
+            buffer = buffer[end:]
+            if len(buffer) < chunk_size and not eof:
+                chunk = file.read(chunk_size)
+                eof = not chunk
+                buffer += chunk
+
+
+def poi_id(metadata):
+    """
+    Returns a deterministic id for a POI, derived from its name and coordinates.
+
+    The same place always gets the same id, so ingesting it again updates the existing entry instead of
+    duplicating it.
+    """
+    key = "|".join([
+        str(metadata.get("name", "")).strip().lower(),
+        f"{float(metadata.get('latitude') or 0):.6f}",
+        f"{float(metadata.get('longitude') or 0):.6f}",
+    ])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+
+def iter_pois(data):
+    """
+    Yields `(id, poi)` pairs from `augmented_pois.json` or from the POI store written by `pois_augmentation.py`.
+
+    The store keeps the id computed from the full-precision coordinates, so both sources give the same ids.
+    """
+    if os.path.isdir(data):
+        yield from iter_augmented(PoiStore.load(data))
+    else:
+        for poi in iter_json_array(data):
+            yield poi_id(poi["data"]), poi
+
+
+def default_data():
+    """
+    Returns the POI store when `pois_augmentation.py` wrote one, and `augmented_pois.json` otherwise.
+    """
+    if os.path.exists(os.path.join(AUGMENTED_STORE_PATH, "schema.json")):
+        return AUGMENTED_STORE_PATH
+    return JSON_PATH
+
+
+def iter_batches(items, batch_size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def add_to_lexical_index(builder, pois):
+    """
+    Adds the `{id: poi}` POIs of a batch to the `LexicalIndexBuilder` of the lexical index of `query.py`.
+    """
+    builder.add(list(pois), [poi["description"] for poi in pois.values()], [poi["data"] for poi in pois.values()])
+
+
+def build_lexical_index(builder):
+    """
+    Builds and saves the lexical index of `query.py` over the ingested POIs (see `lexical_index.py`).
+    """
+    start = time.perf_counter()
+    index = builder.build()
+    index.save()
+    print(f"Built lexical index with {len(index.vocab)} tokens in {time.perf_counter() - start:.2f}s")
+
+
+def iter_unique_pois(data, dedup_pois=True):
+    """
+    Returns the `(id, poi)` pairs of `iter_pois` without the near-duplicates found by `dedup.find_duplicates`.
+
+    The source is read twice, once to find the duplicates and once to yield the POIs, so it is never held in memory.
+
+    Returns:
+    --------
+    tuple
+        The generator of `(id, poi)` pairs and the `{duplicate id: representative id}` mapping.
+    """
+    duplicates = dedup.find_duplicates(iter_pois(data)) if dedup_pois else {}
+    return ((key, poi) for key, poi in iter_pois(data) if key not in duplicates), duplicates
+
+
+def ingest(data, batch_size=500, dedup_pois=True):
     """
     Ingests data from a specified JSON file into a Chroma database collection named "GoVibes".
 
-    The function loads environment variables to connect to the Chroma database, processes the input JSON data, 
-    and adds the documents and metadata into the database with unique identifiers.
+    The function loads environment variables to connect to the Chroma database, streams the input JSON data,
+    and upserts the documents and metadata into the database in batches with deterministic identifiers.
 
     Parameters:
     -----------
     data : str
-        The file path of a JSON file containing the data to be ingested into the database.
-        The JSON file should be structured such that each item contains a "description" and "data" field.
+        The file path of a JSON file containing the data to be ingested into the database, or the directory of a
+        POI store (see `poi_store.py`). Each item contains a "description" and "data" field.
+    batch_size : int
+        Number of POIs sent to Chroma in every upsert. It is capped by the maximum batch size of the server.
+    dedup_pois : bool
+        Whether to drop the near-duplicate POIs (see `dedup.py`) and keep only the representative of each place.
 
     Returns:
     --------
     None
-        The function does not return any value. It adds the processed data to the Chroma database collection.
+        The function does not return any value. It upserts the processed data into the Chroma database collection.
+
+    With `VECTOR_BACKEND=numpy` the POIs are written to the in-process NumPy index of `vector_index.py` instead.
 
     Process:
     --------
     1. Loads environment variables for database connection (e.g., DB_HOST, DB_PORT).
     2. Connects to the Chroma database and creates or retrieves the "GoVibes" collection.
-    3. Reads the provided JSON file and extracts the "description" and "data" fields.
-    4. Adds the extracted documents and metadata into the Chroma collection with unique UUIDs as identifiers.
-    5. Prints the current count of items in the collection after the data has been added.
+    3. Parses the provided JSON file incrementally, one POI at a time, so memory stays flat, or reads the
+       memory-mapped POI store without parsing any text.
+    4. Drops the near-duplicates of the scraper (the same place found more than once, described with different
+       words) and deletes them from the collection if an earlier ingest stored them.
+    5. Embeds the descriptions locally in batches (see `embeddings.py`); descriptions already in the embedding
+       cache are not embedded again.
+    6. Upserts the "description" and "data" fields with their embeddings in batches, with ids derived from the
+       name and coordinates of each POI, so re-running the ingest updates the collection instead of duplicating it.
+    7. Prints the throughput of every batch and the current count of items in the collection.
+    8. Builds the lexical index of the categories and descriptions used by the hybrid retrieval of `query.py`.
 
     Example usage:
     --------------
@@ -36,23 +191,62 @@ def ingest(data):
     """
     load_dotenv()
 
+    if os.getenv("VECTOR_BACKEND", "chroma") == "numpy":
+        start = time.perf_counter()
+        pois = dict(iter_unique_pois(data, dedup_pois)[0])
+        count = build_index(pois.items())
+        print(f"Built NumPy index with {count} POIs in {time.perf_counter() - start:.2f}s")
+        lexical = LexicalIndexBuilder()
+        add_to_lexical_index(lexical, pois)
+        build_lexical_index(lexical)
+        return
+
+    # chromadb tarda casi un segundo en importarse: con el backend NumPy no se carga
+    import chromadb as db
     client = db.HttpClient(host=os.getenv("DB_HOST"), port=os.getenv("DB_PORT"))
 
     collection = client.get_or_create_collection(
         "GoVibes", metadata={"hnsw:space": "cosine"}
     )
 
-    with open(data, "r", encoding="utf-8") as file:
-        data = json.load(file)
+    batch_size = min(batch_size, client.get_max_batch_size())
+    embedder = Embedder()
 
-    collection.add(
-        documents=list(map(lambda x: x["description"], data)),
-        metadatas=list(map(lambda x: x["data"], data)),
-        ids=[str(uuid4()) for _ in range(len(data))],
-    )
+    unique_pois, duplicates = iter_unique_pois(data, dedup_pois)
+    # Los duplicados que dejó una ingesta anterior se borran: de lo contrario seguirían saliendo en las consultas
+    for ids in iter_batches(duplicates, batch_size):
+        collection.delete(ids=ids)
+
+    total = 0
+    # Solo se guardan los tokens de cada lote para el índice léxico, no los POIs completos
+    lexical = LexicalIndexBuilder()
+    start = time.perf_counter()
+    for number, batch in enumerate(iter_batches(unique_pois, batch_size), start=1):
+        batch_start = time.perf_counter()
 
+        # Un mismo POI repetido dentro del lote se envía una sola vez (gana el último)
+        pois = dict(batch)
+        add_to_lexical_index(lexical, pois)
+        documents = [poi["description"] for poi in pois.values()]
+        collection.upsert(
+            documents=documents,
+            embeddings=embedder.embed(documents).tolist(),
+            metadatas=[poi["data"] for poi in pois.values()],
+            ids=list(pois.keys()),
+        )
+
+        elapsed = time.perf_counter() - batch_start
+        total += len(pois)
+        print(f"Batch {number}: {len(pois)} POIs in {elapsed:.2f}s ({len(pois) / elapsed:.1f} POIs/s)")
+
+    elapsed = time.perf_counter() - start
+    print(f"Upserted {total} POIs in {elapsed:.2f}s")
     print("Data lenght:", collection.count())
+    print(f"Embedding cache: {embedder.cache.hits} hits, {embedder.cache.misses} misses")
+    build_lexical_index(lexical)
 
 
 if __name__ == "__main__":
-    ingest("./data/output/augmented/augmented_pois.json")
+    # Las opciones se definen en cli.py, el punto de entrada común
+    import cli
+    cli.main(["ingest", *sys.argv[1:]])
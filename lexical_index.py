@@ -0,0 +1,251 @@
+"""
+Inverted index over the categories and descriptions of the POIs, for hybrid (lexical + vector) retrieval.
+
+`query.py` used to fetch the 10 nearest POIs of every comuna and only then derive their `final_category`, keeping
+one POI per category: most hits were thrown away and whole categories could be missing. This index is built at
+ingest time and knows, for every comuna, which POIs belong to each category. The retrieval then pre-selects the
+few best candidates of every (comuna, category) by BM25 against the profile text, scores only those with the
+vectors and fuses both scores, so the top 3 are category-diverse by construction.
+
+Text is normalized (lowercase, without accents, stopwords removed), so "Jardín" and "jardin" are the same token.
+Category tokens count twice, since they describe the POI better than free text.
+
+Files (inside `LEXICAL_INDEX_PATH`, default `./data/output/lexical_index`):
+----------------------------------------------------------------------------
+- `indptr.npy`, `rows.npy`, `tfs.npy`: Postings of every token in CSR form (rows and term frequencies).
+- `lengths.npy`: Number of tokens of every POI.
+- `meta.json`: Ids, vocabulary, ratings and the rows of every (comuna, category).
+
+Example usage:
+--------------
+    index = LexicalIndex.build(ids, documents, metadatas)
+    index.save()
+    builder = LexicalIndexBuilder()
+    for ids, documents, metadatas in batches:
+        builder.add(ids, documents, metadatas)
+    index = builder.build()
+    index = LexicalIndex.load()
+    scores = index.scores("Viajo en familia y me gustan los museos")
+    candidates = index.candidates("Aranjuez", scores, per_category=5)
+"""
+
+import json
+import os
+import re
+import unicodedata
+
+import numpy as np
+
+
+DEFAULT_PATH = "./data/output/lexical_index"
+
+CATEGORIES = ["restaurante", "parque", "bar", "discoteca", "cine", "teatro", "jardin",
+    "museo", "centro comercial"]
+
+STOPWORDS = {
+    "al", "como", "con", "de", "del", "el", "en", "es", "esta", "este", "la", "las", "lo", "los", "mas", "me",
+    "mi", "muy", "para", "pero", "por", "que", "se", "sin", "son", "su", "sus", "un", "una", "uno", "y", "ya",
+    "soy", "turista", "viaja", "viajo", "ofrece", "ideal", "perfecto", "perfecta", "lugar", "opcion",
+}
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", str(text or "").lower())
+    return "".join(char for char in text if not unicodedata.combining(char))
+
+
+def tokenize(text):
+    return [token for token in re.findall(r"[a-z0-9]+", normalize(text)) if len(token) > 2 and token not in STOPWORDS]
+
+
+def extract_category(text, categories):
+    for category in categories:
+        if category in text.lower():
+            return category
+    return None
+
+
+class LexicalIndex:
+    """
+    BM25 index of the POIs, with the rows of every (comuna, category).
+
+    Parameters:
+    -----------
+    ids : list of str
+        Id of every POI (the same ids as in the vector store).
+    vocab : list of str
+        Tokens, in the order of the postings.
+    indptr, rows, tfs : numpy.ndarray
+        Postings in CSR form: the rows containing token `t` are `rows[indptr[t]:indptr[t + 1]]`.
+    lengths : numpy.ndarray
+        Number of tokens of every POI.
+    groups : dict
+        `{comuna: {category: [rows]}}`. POIs without a known category are under "".
+    ratings : list of float
+        Bayesian rating of every POI, used to order candidates without lexical matches.
+    """
+
+    def __init__(self, ids, vocab, indptr, rows, tfs, lengths, groups, ratings, k1=1.2, b=0.75):
+        self.ids = ids
+        self.vocab = {token: position for position, token in enumerate(vocab)}
+        self.indptr = indptr
+        self.rows = rows
+        self.tfs = tfs
+        self.lengths = np.asarray(lengths, dtype=np.float32)
+        self.groups = groups
+        self.ratings = np.asarray(ratings, dtype=np.float32)
+        self.k1 = k1
+        self.b = b
+        self._average = float(self.lengths.mean()) if len(self.lengths) else 1.0
+
+    @classmethod
+    def build(cls, ids, documents, metadatas, categories=CATEGORIES):
+        """
+        Builds the index from the documents and metadata ingested into the vector store.
+        """
+        builder = LexicalIndexBuilder(categories)
+        builder.add(ids, documents, metadatas)
+        return builder.build()
+
+    def save(self, path=None):
+        path = path or os.getenv("LEXICAL_INDEX_PATH", DEFAULT_PATH)
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "indptr.npy"), self.indptr)
+        np.save(os.path.join(path, "rows.npy"), self.rows)
+        np.save(os.path.join(path, "tfs.npy"), self.tfs)
+        np.save(os.path.join(path, "lengths.npy"), self.lengths.astype(np.int32))
+        vocab = sorted(self.vocab, key=self.vocab.get)
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as file:
+            json.dump(
+                {"ids": self.ids, "vocab": vocab, "groups": self.groups, "ratings": self.ratings.tolist(),
+                 "k1": self.k1, "b": self.b},
+                file,
+                ensure_ascii=False,
+            )
+
+    @classmethod
+    def load(cls, path=None):
+        path = path or os.getenv("LEXICAL_INDEX_PATH", DEFAULT_PATH)
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as file:
+            meta = json.load(file)
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            for name in ("indptr", "rows", "tfs", "lengths")
+        }
+        return cls(meta["ids"], meta["vocab"], arrays["indptr"], arrays["rows"], arrays["tfs"], arrays["lengths"],
+                   meta["groups"], meta["ratings"], k1=meta["k1"], b=meta["b"])
+
+    def scores(self, text):
+        """
+        Returns the BM25 score of every POI for the tokens of `text`.
+        """
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        n = len(self.ids)
+        tokens = tokenize(text)
+        for token in set(tokens):
+            position = self.vocab.get(token)
+            if position is None:
+                continue
+            start, end = self.indptr[position], self.indptr[position + 1]
+            rows = np.asarray(self.rows[start:end])
+            tfs = np.asarray(self.tfs[start:end], dtype=np.float32)
+            idf = np.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[rows] / self._average)
+            scores[rows] += tokens.count(token) * idf * tfs * (self.k1 + 1) / (tfs + norm)
+        return scores
+
+    def candidates(self, comuna, scores, per_category=5, allowed=None):
+        """
+        Returns the best `per_category` rows of every category of a comuna, by lexical score and then by rating.
+
+        Parameters:
+        -----------
+        comuna : str
+            Comuna of the candidates.
+        scores : numpy.ndarray
+            Lexical scores of every POI, from `scores`.
+        allowed : set of int, optional
+            Rows that can be returned (e.g. the POIs near the tourist).
+
+        Returns:
+        --------
+        dict
+            `{category: [rows]}`, with None as the category of POIs without a known one.
+        """
+        selected = {}
+        for category, rows in self.groups.get(comuna, {}).items():
+            if allowed is not None:
+                rows = [row for row in rows if row in allowed]
+            if not rows:
+                continue
+            rows = np.asarray(rows)
+            order = np.lexsort((-self.ratings[rows], -scores[rows]))[:per_category]
+            selected[category or None] = rows[order].tolist()
+        return selected
+
+
+class LexicalIndexBuilder:
+    """
+    Builds a `LexicalIndex` batch by batch, keeping only the postings of the POIs and not their documents.
+
+    A POI added again (same id) replaces the previous one, as an upsert does in the vector store.
+    """
+
+    def __init__(self, categories=CATEGORIES):
+        self.categories = categories
+        self.ids = []
+        self.postings = {}
+        self.lengths = []
+        self.groups = []
+        self.ratings = []
+        self.row_of = {}
+
+    def add(self, ids, documents, metadatas):
+        """
+        Adds a batch of POIs with the documents and metadata ingested into the vector store.
+        """
+        for poi, document, metadata in zip(ids, documents, metadatas):
+            row = len(self.ids)
+            # Un id repetido deja huérfana su fila anterior, que se descarta al construir el índice
+            self.row_of[poi] = row
+            self.ids.append(poi)
+            tokens = 2 * tokenize(metadata.get("categories")) + tokenize(document)
+            self.lengths.append(len(tokens))
+            for token in set(tokens):
+                self.postings.setdefault(token, []).append((row, tokens.count(token)))
+
+            category = extract_category(normalize(metadata.get("categories")), self.categories) or ""
+            self.groups.append((str(metadata.get("comuna", "")), category))
+            rating = metadata.get("rating bayesian")
+            self.ratings.append(float(rating) if rating is not None else 0.0)
+
+    def build(self):
+        """
+        Returns the `LexicalIndex` of the POIs added so far.
+        """
+        alive = np.zeros(len(self.ids), dtype=bool)
+        alive[list(self.row_of.values())] = True
+        # Posición de cada fila viva una vez descartadas las reemplazadas
+        renumber = np.cumsum(alive) - 1
+
+        groups = {}
+        for row in np.flatnonzero(alive):
+            comuna, category = self.groups[row]
+            groups.setdefault(comuna, {}).setdefault(category, []).append(int(renumber[row]))
+
+        vocab, counts, rows, tfs = [], [], [], []
+        for token in sorted(self.postings):
+            pairs = [(renumber[row], tf) for row, tf in self.postings[token] if alive[row]]
+            if pairs:
+                vocab.append(token)
+                counts.append(len(pairs))
+                rows.extend(row for row, _ in pairs)
+                tfs.extend(tf for _, tf in pairs)
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        return LexicalIndex(
+            [poi for poi, keep in zip(self.ids, alive) if keep], vocab, indptr,
+            np.array(rows, dtype=np.int32), np.array(tfs, dtype=np.uint16),
+            np.array(self.lengths, dtype=np.int32)[alive], groups,
+            [rating for rating, keep in zip(self.ratings, alive) if keep],
+        )
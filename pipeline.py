@@ -0,0 +1,315 @@
+"""
+Runner of the end-to-end data pipeline as a DAG of content-hashed stages.
+
+The stages used to be run by hand and in full on every refresh: scraper -> cleaning -> augmentation -> ingest. Here
+every stage declares the command that runs it, the files it reads (its own code included) and the files it writes.
+Before running a stage its inputs are hashed; when the fingerprint is the one recorded after its last successful
+run and its outputs are still there, the stage is skipped. A stage only changes its dependents when the content of
+its outputs changes, so touching a file without changing it does not cascade.
+
+Stages whose dependencies are done run in parallel (e.g. the question tree of `user_context.py` is built while the
+places are cleaned and augmented). Every stage runs in its own Python process, with its output in a log file. The
+scraper is a manual stage: it only runs when asked for (`python pipeline.py scrape`), and otherwise the cleaning
+uses the scrape files already there.
+
+Hashes are cached by path, size and modification time, so a run where nothing changed only stats the inputs and
+finishes in well under a second.
+
+Files (inside `./data/output/pipeline`):
+----------------------------------------
+- `state.json`: Fingerprint, status and runtime of the last run of every stage, and the hash cache of the inputs.
+- `runs.jsonl`: One line per executed or skipped stage, with its runtime.
+- `logs/<stage>.log`: Output of the last run of every stage.
+
+Example usage:
+--------------
+    python pipeline.py                    # Runs every stage that is out of date
+    python pipeline.py ingest             # Only `ingest` and the stages it depends on
+    python pipeline.py --force augment    # Runs `augment` (and whatever changes downstream) even if up to date
+    python pipeline.py --dry-run          # Shows which stages would run
+"""
+
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+STATE_DIR = "./data/output/pipeline"
+
+# inputs/outputs admiten patrones glob; los directorios se recorren completos. Las etapas `manual` solo se
+# ejecutan cuando se piden explícitamente: si no, sus dependientes usan las salidas que ya existan.
+# `env_outputs` son salidas que solo se escriben con una variable de entorno: tuplas (variable, valor, patrón)
+Stage = namedtuple("Stage", ["name", "command", "inputs", "outputs", "deps", "env", "manual", "env_outputs"],
+                   defaults=[False, ()])
+
+STAGES = [
+    Stage(
+        name="scrape",
+        command=["cli.py", "scrape"],
+        inputs=["cli.py", "scraper.py", "checkpoint.py"],
+        outputs=["./data/output/places/places_scraper_*.csv"],
+        deps=[],
+        env=[],
+        manual=True,
+    ),
+    Stage(
+        name="clean",
+        command=["cli.py", "clean"],
+        inputs=["cli.py", "cleaning.py", "poi_store.py", "./data/output/places/places*.csv"],
+        outputs=["./data/output/places/final_places", "./data/output/places/final_places.store"],
+        deps=["scrape"],
+        env=[],
+    ),
+    Stage(
+        name="augment",
+        command=["cli.py", "augment"],
+        inputs=[
+            "cli.py", "pois_augmentation.py", "poi_store.py", "checkpoint.py", "completion_cache.py",
+            "rate_limiter.py", "templates.py",
+            "./data/input/templates/pois_augmentation", "./data/output/places/final_places.store",
+            "./data/output/places/final_places.csv",
+        ],
+        outputs=["./data/output/augmented/augmented_pois.json", "./data/output/augmented/augmented_pois.store"],
+        deps=["clean"],
+        env=[],
+    ),
+    Stage(
+        name="ingest",
+        command=["cli.py", "ingest"],
+        inputs=[
+            "cli.py", "ingest.py", "dedup.py", "embeddings.py", "vector_index.py", "lexical_index.py",
+            "poi_store.py",
+            "./data/output/augmented/augmented_pois.store",
+        ],
+        outputs=["./data/output/lexical_index"],
+        deps=["augment"],
+        env=["VECTOR_BACKEND", "EMBEDDING_MODEL", "DB_HOST", "DB_PORT"],
+        env_outputs=[("VECTOR_BACKEND", "numpy", "./data/output/vector_index")],
+    ),
+    Stage(
+        name="questions",
+        command=["cli.py", "profile", "--build-tree"],
+        inputs=[
+            "cli.py", "user_context.py", "completion_cache.py", "templates.py", "./data/input/templates/user_context",
+        ],
+        outputs=["./data/output/user_profile/question_tree.json"],
+        deps=[],
+        env=[],
+    ),
+]
+
+
+def expand(patterns):
+    """
+    Returns the files matched by `patterns`, with the files of every directory, sorted.
+    """
+    paths = set()
+    for pattern in patterns:
+        for path in glob.glob(pattern):
+            if os.path.isdir(path):
+                for root, _, files in os.walk(path):
+                    paths.update(os.path.join(root, name) for name in files)
+            else:
+                paths.add(path)
+    return sorted(os.path.normpath(path) for path in paths)
+
+
+class FileHashes:
+    """
+    SHA-256 of files, recomputed only when their size or modification time changed.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache or {}
+        self._lock = threading.Lock()
+
+    def __call__(self, path):
+        stat = os.stat(path)
+        with self._lock:
+            cached = self.cache.get(path)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                digest.update(block)
+        with self._lock:
+            self.cache[path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return digest.hexdigest()
+
+
+def fingerprint(stage, hashes):
+    """
+    Hashes the command, the selected environment variables and the content of every input of a stage.
+    """
+    digest = hashlib.sha256(json.dumps(
+        {"command": stage.command, "env": {name: os.getenv(name) for name in stage.env}}, sort_keys=True
+    ).encode("utf-8"))
+    for path in expand(stage.inputs):
+        digest.update(f"{path}\0{hashes(path)}\0".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def stage_outputs(stage):
+    """
+    Returns the output patterns of a stage, with those of `env_outputs` that apply to the current environment.
+    """
+    return [*stage.outputs, *(pattern for name, value, pattern in stage.env_outputs if os.getenv(name) == value)]
+
+
+def outputs_exist(stage):
+    return all(glob.glob(pattern) for pattern in stage_outputs(stage))
+
+
+def load_state(state_dir=STATE_DIR):
+    path = os.path.join(state_dir, "state.json")
+    if not os.path.exists(path):
+        return {"stages": {}, "files": {}}
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_state(state, state_dir=STATE_DIR):
+    path = os.path.join(state_dir, "state.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(state, file, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def with_dependencies(stages, targets):
+    """
+    Returns the names of `targets` and of every stage they depend on.
+    """
+    by_name = {stage.name: stage for stage in stages}
+    selected, pending = set(), list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in by_name:
+            raise ValueError(f"Unknown stage: {name}")
+        if name not in selected:
+            selected.add(name)
+            pending.extend(by_name[name].deps)
+    return selected
+
+
+def run_stage(stage, state_dir=STATE_DIR):
+    """
+    Runs the command of a stage in a new Python process, writing its output to `logs/<stage>.log`.
+
+    Returns:
+    --------
+    int
+        Exit code of the process.
+    """
+    os.makedirs(os.path.join(state_dir, "logs"), exist_ok=True)
+    with open(os.path.join(state_dir, "logs", f"{stage.name}.log"), "w", encoding="utf-8") as log:
+        return subprocess.run(
+            [sys.executable, *stage.command], stdout=log, stderr=subprocess.STDOUT
+        ).returncode
+
+
+def run_pipeline(stages=STAGES, targets=None, force=(), workers=4, dry_run=False, state_dir=STATE_DIR):
+    """
+    Runs the out-of-date stages of the pipeline, in parallel when their dependencies allow it.
+
+    A stage is out of date when the fingerprint of its inputs changed since its last successful run, when one of
+    its outputs is missing, or when it is in `force`. Manual stages (the scraper, which browses Google Maps for
+    hours) only run when they are in `targets` or `force`. The fingerprint of a stage is computed once its
+    dependencies finished, since their outputs are its inputs. A stage that fails (exits with a nonzero code) is
+    never recorded as done, and the stages that depend on it are not run.
+
+    Parameters:
+    -----------
+    stages : list of Stage
+        The DAG.
+    targets : list of str, optional
+        Stages to bring up to date, with their dependencies. Every stage by default.
+    force : iterable of str
+        Stages that run even if they are up to date.
+    workers : int
+        Maximum number of stages running at the same time.
+    dry_run : bool
+        Only report which stages would run; with it, stages after an out-of-date one are fingerprinted with the
+        current (stale) outputs.
+
+    Returns:
+    --------
+    dict
+        `{stage: {"status": "ran" | "skipped" | "failed" | "blocked" | "stale", "seconds": float}}`.
+    """
+    selected = with_dependencies(stages, targets) if targets else {stage.name for stage in stages}
+    stages = [stage for stage in stages if stage.name in selected]
+    os.makedirs(state_dir, exist_ok=True)
+    state = load_state(state_dir)
+    hashes = FileHashes(state["files"])
+    force = set(force)
+    explicit = set(targets or ()) | force
+    results = {}
+    run_id = time.strftime("%Y-%m-%dT%H:%M:%S")
+
+    def process(stage):
+        start = time.perf_counter()
+        if stage.manual and stage.name not in explicit:
+            return {"status": "skipped", "seconds": 0.0}
+        key = fingerprint(stage, hashes)
+        previous = state["stages"].get(stage.name, {})
+        if stage.name not in force and previous.get("fingerprint") == key and outputs_exist(stage):
+            return {"status": "skipped", "seconds": time.perf_counter() - start}
+        if dry_run:
+            return {"status": "stale", "seconds": time.perf_counter() - start}
+
+        print(f"[{stage.name}] running {' '.join(stage.command)}")
+        code = run_stage(stage, state_dir)
+        seconds = time.perf_counter() - start
+        if code != 0:
+            return {"status": "failed", "seconds": seconds, "exit_code": code}
+        state["stages"][stage.name] = {"fingerprint": key, "seconds": seconds, "finished": time.time()}
+        return {"status": "ran", "seconds": seconds}
+
+    pending = {stage.name: stage for stage in stages}
+    running = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                deps = [results.get(dep, {}).get("status") for dep in stage.deps if dep in selected]
+                if any(status in ("failed", "blocked") for status in deps):
+                    results[name] = {"status": "blocked", "seconds": 0.0}
+                    del pending[name]
+                elif all(status is not None for status in deps):
+                    running[executor.submit(process, stage)] = name
+                    del pending[name]
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    results[name] = {"status": "failed", "seconds": 0.0, "error": str(e)}
+                print(f"[{name}] {results[name]['status']} in {results[name]['seconds']:.2f}s")
+
+    if not dry_run:
+        # Los archivos que ya no existen no se vuelven a consultar en la caché de hashes
+        state["files"] = {path: entry for path, entry in hashes.cache.items() if os.path.exists(path)}
+        save_state(state, state_dir)
+        with open(os.path.join(state_dir, "runs.jsonl"), "a", encoding="utf-8") as file:
+            for name, result in results.items():
+                file.write(json.dumps({"run": run_id, "stage": name, **result}) + "\n")
+    return results
+
+
+if __name__ == "__main__":
+    # Las opciones se definen en cli.py, el punto de entrada común
+    import cli
+    cli.main(["pipeline", *sys.argv[1:]])
@@ -0,0 +1,425 @@
+"""
+Compact columnar store of POIs, loaded with memory maps instead of parsing CSV or JSON text.
+
+Every stage used to parse text with pandas: `final_places.csv` (with long multi-line descriptions),
+`augmented_pois.json` and the metadata of the vector index. A store is a directory with one binary file per column:
+
+- Numeric columns are float32 arrays (review counts, scores), or float64 for the columns that must come back exactly
+  as they were written (coordinates and ratings).
+- Low-cardinality columns (comuna, category, price) are int16 codes plus the list of categories.
+- Text columns are concatenated into a single UTF-8 blob with an int64 offset array, so a value is decoded only
+  when it is read.
+- The row keys (e.g. the index of `final_places.csv`) are an int64 array.
+
+All the arrays are opened with `np.load(mmap_mode="r")`, so loading a store only reads `schema.json` and the
+operating system pages in the columns that are actually used.
+
+Float32 keeps about 7 significant digits, so single values are returned with their shortest float32 representation,
+e.g. `-75.5485003` would be read back as `-75.5485`. Coordinates and ratings are part of the augmentation prompts,
+of `pois_augmentation.row_fingerprint` and of the POI ids: rounding them would change every fingerprint (and
+re-augment the whole dataset) and send truncated values to Chroma, so they are stored as float64.
+
+Files (inside the store directory):
+-----------------------------------
+- `schema.json`: Number of rows, kind of every column, categories and any extra information of the writer.
+- `index.npy`: Row keys.
+- `col<N>.npy`: Values (numeric) or codes (categorical) of the N-th column.
+- `col<N>.bin` and `col<N>.offsets.npy`: UTF-8 blob and offsets of the N-th column when it is text.
+- `col<N>.null.npy`: Missing values of a text column, only when it has any.
+
+Example usage:
+--------------
+    write_store("./data/output/places/final_places.store", df,
+                numeric=["lat", "lon"], categorical=["Comuna"], text=["name", "desc"])
+    store = PoiStore.load("./data/output/places/final_places.store")
+    df = store.to_frame(["name", "lat", "lon"])
+    store.value("desc", 10)
+"""
+
+import json
+import os
+import shutil
+
+import numpy as np
+
+# pandas y pyarrow tardan casi medio segundo en importarse y la ingesta solo lee columnas y registros: se importan
+# dentro de las funciones que reciben o devuelven DataFrames
+
+
+PLACES_STORE_PATH = "./data/output/places/final_places.store"
+AUGMENTED_STORE_PATH = "./data/output/augmented/augmented_pois.store"
+
+# Campos de "data" en augmented_pois.json y cómo se guardan
+AUGMENTED_COLUMNS = {
+    "id": "text",
+    "description": "text",
+    "name": "text",
+    "comuna": "categorical",
+    "categories": "categorical",
+    "address": "text",
+    "rating bayesian": "numeric",
+    "latitude": "numeric",
+    "longitude": "numeric",
+    "precio": "categorical",
+}
+METADATA_FIELDS = [name for name in AUGMENTED_COLUMNS if name not in ("id", "description")]
+
+# Columnas de final_places que van en el prompt y en la huella de cada fila: se guardan en float64
+EXACT_PLACES_COLUMNS = ["lat", "lon", "bayesian_mean"]
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+def _string_dtype():
+    """
+    Arrow-backed string dtype with NaN for missing values, like the text columns read by `pd.read_csv`.
+    """
+    import pandas as pd
+
+    try:
+        return pd.StringDtype("pyarrow", na_value=np.nan)
+    except TypeError:
+        # pandas < 2.3
+        return pd.StringDtype("pyarrow_numpy")
+
+
+def write_store(path, frame, numeric=(), categorical=(), text=(), extra=None, precise=()):
+    """
+    Writes the given columns of a DataFrame as a store.
+
+    The store is written to a temporary directory and then swapped in, so readers never see a half-written store.
+
+    Parameters:
+    -----------
+    path : str
+        Directory of the store.
+    frame : pandas.DataFrame
+        Data to store. Its index is kept when it is integer, otherwise rows are numbered from 0.
+    numeric, categorical, text : list of str
+        Columns stored as float32 (see `precise`), as categorical codes and as UTF-8 text.
+    extra : dict, optional
+        JSON-serializable information saved in the schema (e.g. the partitions of the vector index).
+    precise : list of str
+        Numeric columns stored as float64 instead of float32.
+
+    Returns:
+    --------
+    int
+        Number of rows written.
+    """
+    import pandas as pd
+
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    if pd.api.types.is_integer_dtype(frame.index.dtype):
+        index = frame.index.to_numpy(dtype=np.int64)
+    else:
+        index = np.arange(len(frame), dtype=np.int64)
+    np.save(os.path.join(tmp_path, "index.npy"), index)
+
+    columns = []
+    kinds = [(name, "numeric") for name in numeric] + [(name, "categorical") for name in categorical] + \
+        [(name, "text") for name in text]
+    # El orden de las columnas del DataFrame se conserva en el esquema
+    kinds.sort(key=lambda item: list(frame.columns).index(item[0]))
+    for number, (name, kind) in enumerate(kinds):
+        base = os.path.join(tmp_path, f"col{number}")
+        column = {"name": name, "kind": kind, "file": f"col{number}"}
+        values = frame[name]
+
+        if kind == "numeric":
+            dtype = np.float64 if name in precise else np.float32
+            np.save(f"{base}.npy", pd.to_numeric(values, errors="coerce").to_numpy(dtype=dtype))
+            if pd.api.types.is_integer_dtype(values.dtype):
+                column["integer"] = True
+        elif kind == "categorical":
+            codes, categories = pd.factorize(values.astype(object), use_na_sentinel=True)
+            np.save(f"{base}.npy", codes.astype(np.int16 if len(categories) < 2 ** 15 else np.int32))
+            column["categories"] = [str(category) for category in categories]
+        else:
+            missing = np.array([_is_missing(value) for value in values], dtype=bool)
+            encoded = [b"" if null else str(value).encode("utf-8") for value, null in zip(values, missing)]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(value) for value in encoded], out=offsets[1:])
+            with open(f"{base}.bin", "wb") as file:
+                file.write(b"".join(encoded))
+            np.save(f"{base}.offsets.npy", offsets)
+            if missing.any():
+                np.save(f"{base}.null.npy", missing)
+                column["nullable"] = True
+        columns.append(column)
+
+    with open(os.path.join(tmp_path, "schema.json"), "w", encoding="utf-8") as file:
+        json.dump({"rows": len(frame), "columns": columns, "extra": extra or {}}, file, ensure_ascii=False)
+
+    old_path = f"{path}.old"
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    return len(frame)
+
+
+class TextColumn:
+    """
+    Read-only sequence over a text column, decoding each value on access.
+    """
+
+    def __init__(self, blob, offsets, null=None):
+        self._blob = blob
+        self._offsets = offsets
+        self._null = null
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[position] for position in range(*row.indices(len(self)))]
+        if row < 0:
+            row += len(self)
+        if self._null is not None and self._null[row]:
+            return None
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        return bytes(self._blob[start:end]).decode("utf-8")
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+    def to_arrow(self):
+        """
+        Wraps the memory-mapped blob and offsets as an Arrow string array, without copying or decoding them.
+        """
+        import pyarrow as pa
+
+        validity = None
+        null_count = 0
+        if self._null is not None:
+            validity = pa.array(~np.asarray(self._null)).buffers()[1]
+            null_count = int(np.count_nonzero(self._null))
+        return pa.LargeStringArray.from_buffers(
+            len(self), pa.py_buffer(self._offsets), pa.py_buffer(self._blob), validity, null_count=null_count
+        )
+
+    def to_list(self):
+        """
+        Decodes the whole column at once, which is much faster than reading the values one by one.
+        """
+        blob = bytes(self._blob)
+        offsets = self._offsets.tolist()
+        values = [blob[start:end].decode("utf-8") for start, end in zip(offsets[:-1], offsets[1:])]
+        if self._null is not None:
+            for row in np.nonzero(self._null)[0]:
+                values[row] = None
+        return values
+
+
+class Records:
+    """
+    Read-only sequence of dicts over some columns of a store, built on access.
+    """
+
+    def __init__(self, store, columns):
+        self._store = store
+        self._columns = columns
+
+    def __len__(self):
+        return len(self._store)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[position] for position in range(*row.indices(len(self)))]
+        return self._store.record(row, self._columns)
+
+    def __iter__(self):
+        # Se decodifica columna a columna, mucho más rápido que fila a fila
+        columns = [self._store.values(name) for name in self._columns]
+        return (dict(zip(self._columns, values)) for values in zip(*columns))
+
+
+class PoiStore:
+    """
+    Memory-mapped columnar store written by `write_store`.
+    """
+
+    def __init__(self, path, schema, index, columns):
+        self.path = path
+        self.schema = schema
+        self.index = index
+        self.extra = schema.get("extra", {})
+        self._columns = columns
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, "schema.json"), "r", encoding="utf-8") as file:
+            schema = json.load(file)
+        index = np.load(os.path.join(path, "index.npy"), mmap_mode="r")
+
+        columns = {}
+        for column in schema["columns"]:
+            base = os.path.join(path, column["file"])
+            if column["kind"] == "text":
+                size = os.path.getsize(f"{base}.bin")
+                blob = np.memmap(f"{base}.bin", dtype=np.uint8, mode="r") if size else np.zeros(0, dtype=np.uint8)
+                null = np.load(f"{base}.null.npy", mmap_mode="r") if column.get("nullable") else None
+                columns[column["name"]] = TextColumn(blob, np.load(f"{base}.offsets.npy", mmap_mode="r"), null)
+            else:
+                columns[column["name"]] = np.load(f"{base}.npy", mmap_mode="r")
+        return cls(path, schema, index, columns)
+
+    def __len__(self):
+        return self.schema["rows"]
+
+    @property
+    def columns(self):
+        return [column["name"] for column in self.schema["columns"]]
+
+    def _kind(self, name):
+        for column in self.schema["columns"]:
+            if column["name"] == name:
+                return column
+        raise KeyError(name)
+
+    def column(self, name):
+        """
+        Returns a column: a float32 or float64 array, a `pandas.Categorical` or a `TextColumn`.
+        """
+        column = self._kind(name)
+        if column["kind"] == "categorical":
+            import pandas as pd
+            return pd.Categorical.from_codes(np.asarray(self._columns[name]), column["categories"])
+        return self._columns[name]
+
+    def value(self, name, row):
+        column = self._kind(name)
+        data = self._columns[name]
+        if column["kind"] == "numeric":
+            value = data[row]
+            return None if np.isnan(value) else float(str(value))
+        if column["kind"] == "categorical":
+            code = int(data[row])
+            return None if code < 0 else column["categories"][code]
+        return data[row]
+
+    def values(self, name):
+        """
+        Returns every value of a column as a list of Python objects (None for missing values).
+        """
+        column = self._kind(name)
+        data = self._columns[name]
+        if column["kind"] == "numeric":
+            shortest = np.asarray(data).astype(str).astype(np.float64)
+            return [None if value != value else value for value in shortest.tolist()]
+        if column["kind"] == "categorical":
+            categories = column["categories"]
+            return [None if code < 0 else categories[code] for code in np.asarray(data).tolist()]
+        return data.to_list()
+
+    def record(self, row, columns=None):
+        return {name: self.value(name, row) for name in (columns or self.columns)}
+
+    def records(self, columns=None):
+        return Records(self, list(columns or self.columns))
+
+    def to_frame(self, columns=None):
+        """
+        Returns the given columns as a DataFrame indexed by the row keys.
+
+        Numeric columns keep their stored dtype, categorical columns are `pandas.Categorical` and text columns are Arrow
+        strings over the memory-mapped blob, so nothing is decoded into Python objects.
+        """
+        import pandas as pd
+
+        data = {}
+        for name in columns or self.columns:
+            column = self._kind(name)
+            if column["kind"] == "numeric":
+                data[name] = np.asarray(self._columns[name])
+            elif column["kind"] == "categorical":
+                data[name] = self.column(name)
+            else:
+                data[name] = pd.array(self._columns[name].to_arrow(), dtype=_string_dtype())
+        return pd.DataFrame(data, index=pd.Index(np.asarray(self.index), name=self.extra.get("index_name")))
+
+
+def write_places_store(df, path=PLACES_STORE_PATH):
+    """
+    Stores the cleaned places (`final_places.csv` or `cleaning.load_final_places()`).
+    """
+    numeric = [name for name in ("score", "c_score", "lat", "lon", "bayesian_mean") if name in df.columns]
+    categorical = [name for name in ("price", "category", "Comuna") if name in df.columns]
+    text = [name for name in df.columns if name not in numeric and name not in categorical]
+    return write_store(path, df, numeric=numeric, categorical=categorical, text=text,
+                       extra={"index_name": df.index.name}, precise=EXACT_PLACES_COLUMNS)
+
+
+def has_exact_places(path=PLACES_STORE_PATH):
+    """
+    Returns whether a places store keeps the coordinates and ratings in float64.
+
+    Stores written before they were float64 round them, which would change the fingerprint of every row.
+    """
+    store = PoiStore.load(path)
+    return all(store.column(name).dtype == np.float64 for name in EXACT_PLACES_COLUMNS if name in store.columns)
+
+
+def load_places(path=PLACES_STORE_PATH):
+    """
+    Returns the cleaned places as a DataFrame, in the same layout as `pd.read_csv(final_places.csv, index_col=0)`.
+
+    Float32 columns are widened to float64 (with their shortest float32 value) and integer columns are restored, so
+    rows serialize like before.
+    """
+    store = PoiStore.load(path)
+    df = store.to_frame()
+    for name in df.select_dtypes(include=np.float32).columns:
+        df[name] = df[name].to_numpy().astype(str).astype(np.float64)
+    for column in store.schema["columns"]:
+        if column.get("integer"):
+            df[column["name"]] = df[column["name"]].astype(np.int64)
+    return df
+
+
+def augmented_frame(pois):
+    """
+    Flattens augmented POIs ({"description": ..., "data": {...}}) into one row per POI, with their `poi_id`.
+    """
+    import pandas as pd
+
+    # Importado aquí para evitar una importación circular con ingest.py
+    from ingest import poi_id
+
+    rows = [{"id": poi_id(poi["data"]), "description": poi["description"], **poi["data"]} for poi in pois]
+    return pd.DataFrame.from_records(rows, columns=list(AUGMENTED_COLUMNS))
+
+
+def write_augmented_store(pois, path=AUGMENTED_STORE_PATH, extra=None):
+    """
+    Stores augmented POIs, keeping the id computed from their full-precision coordinates.
+
+    Coordinates and ratings are stored as float64, so the metadata sent to Chroma is exactly the augmented one.
+    """
+    import pandas as pd
+
+    frame = augmented_frame(pois) if not isinstance(pois, pd.DataFrame) else pois
+    kinds = {kind: [name for name, value in AUGMENTED_COLUMNS.items() if value == kind]
+             for kind in ("numeric", "categorical", "text")}
+    return write_store(path, frame, extra=extra, precise=kinds["numeric"], **kinds)
+
+
+def iter_augmented(store):
+    """
+    Yields `(id, poi)` pairs from an augmented store, with `poi` in the format of `augmented_pois.json`.
+
+    Missing values are left out of "data", since Chroma does not accept null metadata.
+    """
+    ids = store.column("id").to_list()
+    descriptions = store.column("description").to_list()
+    for row, metadata in enumerate(store.records(METADATA_FIELDS)):
+        data = {name: value for name, value in metadata.items() if value is not None}
+        yield ids[row], {"description": descriptions[row], "data": data}
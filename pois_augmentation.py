@@ -7,163 +7,583 @@ The main steps involved are:
 2. Constructing a prompt for the model using a template and the data from each row of the CSV.
 3. Sending the prompt to the Claude model hosted on Amazon Bedrock for processing.
 4. Handling retries and rate-limiting using exponential backoff in case of throttling.
-5. Saving the responses in a JSON file to persist progress and avoid reprocessing.
+5. Appending each response to a JSONL checkpoint keyed by row index to persist progress and avoid reprocessing.
+6. Compacting the checkpoint into the final JSON file once all rows have been processed.
 
 Modules Used:
 - pandas: For reading and processing the CSV data.
 - json: For reading/writing JSON data.
-- boto3: AWS SDK for Python to interact with Amazon Bedrock.
+- boto3: AWS SDK for Python to interact with Amazon Bedrock. The client is created on the first request
+  (`get_bedrock`), so importing this module does not import boto3.
 - botocore.exceptions: For handling AWS-specific errors like throttling.
 - time: For introducing delays between requests and retries.
+- concurrent.futures: For sending several requests to Bedrock at the same time.
+- rate_limiter: Token bucket shared by all the workers to respect the Bedrock quota.
+- completion_cache: On-disk cache of completions, so a prompt already sent is not paid for twice.
+- templates: Reads the templates once, the first time a prompt is built.
+- telemetry: Spans and metrics around every Bedrock call, its retries and its backoff (see `telemetry.py`).
 
 Files:
 - "./data/input/templates/prompt_template.txt": Template for creating the prompt.
 - "./data/input/templates/expected_output_template.txt": Template for the expected output format.
+- "./data/input/templates/pois_augmentation/batch_prompt_template.txt" and
+  "./data/input/templates/pois_augmentation/batch_expected_output_template.txt": Templates of the batched mode.
 - "./data/output/places/final_places.csv": CSV file with place data to be processed.
-- "all_responses.json": JSON file to store the responses from the model.
+- "./data/output/augmented/checkpoint.jsonl": Append-only checkpoint, one line per processed row, keyed by the
+  row index of `final_places.csv`.
+- "./data/output/places/final_places.store": Memory-mapped POI store of the places written by `cleaning.py`. It
+  is read instead of `final_places.csv` when it exists.
+- "./data/output/augmented/augmented_pois.json": Final JSON file with the responses, in row order.
+- "./data/output/augmented/augmented_pois.store": The same responses as a POI store, read by `ingest.py`.
 
 Functions:
 ---------
-- `invoke_claude(prompt, max_retries=5, initial_delay=1)`: 
+- `invoke_claude(prompt, max_retries=5, initial_delay=1, limiter=None)`: 
     Invokes the Claude model with a given prompt and handles retry logic in case of throttling.
+    Completions are served from the shared completion cache when the same prompt was already sent
+    (set `LLM_CACHE_BYPASS=1` to always call the model).
+- `augment_row(index, columns, row, ...)`:
+    Builds the prompt for one row, invokes the model and parses the JSON of the response.
+- `augment_rows(df, concurrency=1, limiter=None, ...)`:
+    Augments the rows with a thread pool and yields the results in row order.
+- `augment_batches(df, batch_size=10, concurrency=1, limiter=None, ...)`:
+    Packs several POIs per prompt using a compact one-line encoding of each row (`encode_row`), asks for a JSON
+    array back and validates every element separately. Only the POIs whose element fails are queued again.
     
 Process:
 --------
 1. Load the CSV file and read the data into a pandas DataFrame.
 2. Read the prompt template and expected output template from text files.
 3. Set up the AWS Bedrock client with credentials stored in environment variables.
-4. Iterate over the rows in the CSV (skipping already processed ones), generate a prompt using the template, 
-   and send the prompt to the Claude model for processing.
-5. Parse the model's response, extract relevant information, and save it to the `all_responses.json` file.
-6. If an error occurs during processing, retry the request up to a specified number of attempts.
+4. Fingerprint every row together with both templates and compare it with the checkpoint: unchanged rows are
+   kept, rows that only moved to another index reuse their description, and rows that disappeared are dropped.
+   Only new, changed or failed rows get a prompt built from the template and are sent to the Claude model.
+5. Parse the model's response, extract relevant information, and append it to the checkpoint.
+6. If an error occurs during processing, retry the request up to a specified number of attempts. Rows that still
+   fail are recorded as failed and retried on the next run.
+7. Compact the checkpoint and write `augmented_pois.json` once at the end. When some rows failed, the command
+   exits with an error, so `pipeline.py` does not mark the stage as up to date and retries them on its next run.
 
 Retries and Delay:
 -----------------
 If the request is rate-limited (throttled), the script will wait and retry the request using exponential backoff. 
+All the workers share a token bucket (`--rate` requests per second): a `ThrottlingException` on any row halves the
+rate and pauses the whole pool, which then recovers gradually as requests succeed.
 It will attempt to process each row a maximum of 5 times before moving to the next row.
 
 Example usage:
 --------------
 1. Place the required CSV and template files in the correct directory.
 2. Ensure AWS credentials are set in the environment variables (`AWS_ACCESS_KEY_ID`, `AWS_SECRET_ACCESS_KEY`).
-3. Run the script to start processing the rows in the CSV and generating model responses.
+3. Run the script to start processing the rows in the CSV and generating model responses:
+   `python pois_augmentation.py --concurrency 8 --rate 4`
+   Add `--batch-size 10` to send ten POIs per prompt: the instructions and examples are paid once per batch and
+   each POI is sent trimmed to the fields needed for its description.
+4. To try it without AWS, start `python fake_bedrock.py` and set `BEDROCK_ENDPOINT_URL=http://127.0.0.1:8765`.
 
 Notes:
 ------
 - Make sure to adjust the `region_name` and credentials as needed for your specific AWS setup.
-- The script will continue from the last successfully processed row to avoid reprocessing data.
+- The script resumes from the checkpoint, so only rows without a successful response are processed again.
+- After the scraper and the cleaning notebook produce a new `final_places.csv`, just run the script again: only
+  the new or modified places are sent to the model. Editing a template invalidates every row.
 """
 
 
 import pandas as pd
+import sys
+import hashlib
 import json
+import re
 import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import threading
 from botocore.exceptions import ClientError
-import boto3
 
 import os
 
-with open("./data/input/templates/pois_augmentation/prompt_template.txt", 'r', encoding='utf-8') as file:
-    prompt_template = file.read()
+from checkpoint import JsonlCheckpoint
+from completion_cache import CompletionCache
+import poi_store
+import telemetry
+import templates
+from rate_limiter import TokenBucket
 
-with open("./data/input/templates/pois_augmentation/expected_output_template.txt", 'r', encoding='utf-8') as file:
-    expected_output_template = file.read()
+PLACES_PATH = "./data/output/places/final_places.csv"
+CHECKPOINT_PATH = "./data/output/augmented/checkpoint.jsonl"
+OUTPUT_PATH = "./data/output/augmented/augmented_pois.json"
 
+# Las plantillas se leen la primera vez que se construye un prompt (ver templates.py).
+# Si cambia cualquiera de ellas, todas las filas se consideran modificadas
+TEMPLATES = [
+    "pois_augmentation/prompt_template.txt",
+    "pois_augmentation/expected_output_template.txt",
+    "pois_augmentation/batch_prompt_template.txt",
+    "pois_augmentation/batch_expected_output_template.txt",
+]
 
-# Crear el cliente de Bedrock
-bedrock = boto3.client(
-    service_name='bedrock-runtime',
-    region_name='us-west-2',  # Especifica tu región
-    aws_access_key_id= os.getenv('AWS_ACCESS_KEY_ID'),
-    aws_secret_access_key= os.getenv('AWS_SECRET_ACCESS_KEY')
-)
+# Campos de "data" de los que dependen la ingesta (id del POI) y las consultas (filtro por comuna). Una respuesta
+# sin alguno de ellos no es válida y la fila se vuelve a enviar
+REQUIRED_DATA = ["name", "comuna", "latitude", "longitude"]
 
+# Columnas enviadas en el modo por lotes y el nombre corto con el que se envían.
+# score, c_score, web, phone y search_parameters no aportan a la descripción y se omiten.
+COMPACT_COLUMNS = {
+    "name": "name",
+    "desc": "desc",
+    "price": "price",
+    "category": "category",
+    "accessibility": "accessibility",
+    "schedule": "schedule",
+    "address": "address",
+    "lat": "lat",
+    "lon": "lon",
+    "bayesian_mean": "rating",
+    "Comuna": "comuna",
+}
 
-def invoke_claude(prompt, max_retries=5, initial_delay=1):
-    for attempt in range(max_retries):
-        try:
-            body = json.dumps({
-                "prompt": f"\n\nHuman: {prompt}\n\nAssistant:",
-                "max_tokens_to_sample": 2000,
-                "temperature": 1,
-                "top_p": 1
-            })
-
-            response = bedrock.invoke_model(
-                modelId="anthropic.claude-v2",
-                body=body
+
+_bedrock = None
+_bedrock_lock = threading.Lock()
+
+
+def get_bedrock():
+    """
+    Returns the Bedrock client, created (and boto3 imported) on first use and shared by every worker.
+    """
+    global _bedrock
+    with _bedrock_lock:
+        if _bedrock is None:
+            import boto3
+            from botocore.config import Config
+            # Crear el cliente de Bedrock
+            _bedrock = boto3.client(
+                service_name='bedrock-runtime',
+                region_name='us-west-2',  # Especifica tu región
+                endpoint_url=os.getenv('BEDROCK_ENDPOINT_URL'),  # Permite apuntar a un Bedrock local (fake_bedrock.py)
+                aws_access_key_id= os.getenv('AWS_ACCESS_KEY_ID'),
+                aws_secret_access_key= os.getenv('AWS_SECRET_ACCESS_KEY'),
+                # Los reintentos por throttling los gestiona invoke_claude para que el limitador compartido los vea
+                config=Config(retries={'total_max_attempts': 1}, max_pool_connections=64)
             )
-            
-            response_body = json.loads(response['body'].read())
-            return response_body['completion']
+    return _bedrock
+
+MODEL_ID = "anthropic.claude-v2"
+SAMPLING_PARAMS = {
+    "max_tokens_to_sample": 2000,
+    "temperature": 1,
+    "top_p": 1
+}
+
+# Caché de completions compartido con user_context.py
+completion_cache = CompletionCache()
+
+
+def invoke_claude(prompt, max_retries=5, initial_delay=1, limiter=None):
+    with telemetry.span("invoke_claude", histogram="govibes.llm.duration", model=MODEL_ID) as span:
+        cache_key = completion_cache.make_key(MODEL_ID, SAMPLING_PARAMS, prompt)
+        cached = completion_cache.get(cache_key)
+        telemetry.count("govibes.cache.hits" if cached is not None else "govibes.cache.misses", cache="completion")
+        span.set_attribute("cache_hit", cached is not None)
+        if cached is not None:
+            return cached
+
+        for attempt in range(max_retries):
+            if limiter is not None:
+                with telemetry.span("rate_limiter.acquire", histogram="govibes.rate_limiter.wait"):
+                    limiter.acquire()
+            try:
+                body = json.dumps({
+                    "prompt": f"\n\nHuman: {prompt}\n\nAssistant:",
+                    **SAMPLING_PARAMS
+                })
+
+                with telemetry.span("bedrock.invoke_model", histogram="govibes.bedrock.duration", model=MODEL_ID):
+                    response = get_bedrock().invoke_model(
+                        modelId=MODEL_ID,
+                        body=body
+                    )
 
-        except ClientError as e:
-            if e.response['Error']['Code'] == 'ThrottlingException':
-                if attempt < max_retries - 1:  # Don't sleep on the last attempt
+                    response_body = json.loads(response['body'].read())
+                telemetry.count_bedrock_tokens(response, MODEL_ID)
+                if limiter is not None:
+                    limiter.succeeded()
+                completion_cache.put(cache_key, response_body['completion'])
+                return response_body['completion']
+
+            except ClientError as e:
+                if e.response['Error']['Code'] == 'ThrottlingException':
+                    telemetry.count("govibes.llm.throttles", model=MODEL_ID)
                     wait_time = initial_delay * (2 ** attempt)  # Exponential backoff
-                    print(f"Rate limited. Waiting {wait_time} seconds before retry...")
-                    time.sleep(wait_time)
-                    continue
-            raise  # Re-raise the exception if it's not a ThrottlingException or we're out of retries
-
-# Read the CSV
-df = pd.read_csv('./data/output/places/final_places.csv', index_col=0)
-
-all_responses = []
-count = 0
-
-# Load existing responses if the file exists
-try:
-    with open("all_responses.json", "r") as file:
-        all_responses = json.load(file)
-        count = len(all_responses)
-        print(f"Loaded {count} existing responses")
-except FileNotFoundError:
-    pass
-
-# Process remaining rows
-for index, row in df.iloc[count:].iterrows():
-    attempt = 0  # Inicializamos el contador de intentos
-    max_attempts = 5  # Número máximo de intentos
-
-    while attempt < max_attempts:
+                    if limiter is not None:
+                        # Frena a todo el pool, no solo a esta fila
+                        limiter.throttled(pause=wait_time)
+                    if attempt < max_retries - 1:  # Don't sleep on the last attempt
+                        telemetry.count("govibes.llm.retries", model=MODEL_ID)
+                        print(f"Rate limited. Waiting {wait_time} seconds before retry...")
+                        if limiter is None:
+                            with telemetry.span("backoff", histogram="govibes.llm.backoff"):
+                                time.sleep(wait_time)
+                        continue
+                raise  # Re-raise the exception if it's not a ThrottlingException or we're out of retries
+
+
+def build_prompt(columns, row):
+    input_text = ', '.join([str(x) for x in row])
+    return templates.load("pois_augmentation/prompt_template.txt").format(
+        columns=columns,
+        input_text=input_text,
+        expected_output=templates.load("pois_augmentation/expected_output_template.txt"),
+    )
+
+
+def row_fingerprint(columns, row):
+    """
+    Returns a hash of the source row and the templates used to augment it.
+    """
+    input_text = ', '.join([str(x) for x in row])
+    content = f"{templates.fingerprint(*TEMPLATES)}\0{columns}\0{input_text}"
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def plan_delta(df, checkpoint):
+    """
+    Compares the rows of `df` with the checkpoint and decides what has to be sent to the model.
+
+    Rows whose fingerprint matches their checkpoint record are left as they are. Rows that changed index but not
+    content (e.g. after the cleaning notebook reordered the CSV) reuse the existing description under their new
+    index. Records of rows that are no longer in `df` are discarded.
+
+    Returns:
+    --------
+    tuple
+        `(pending, fingerprints, summary)`: the rows that need the model, the fingerprint of every row by index
+        and a dict with the number of unchanged, reused, pending and removed rows.
+    """
+    columns = ', '.join(df.columns)
+    fingerprints = {int(index): row_fingerprint(columns, row) for index, row in df.iterrows()}
+
+    reusable = {
+        record["fingerprint"]: record["value"]
+        for record in checkpoint.records.values()
+        if record["status"] == "ok" and record.get("fingerprint")
+    }
+
+    removed = set(checkpoint.records) - set(fingerprints)
+    checkpoint.discard(removed)
+
+    unchanged, reused, pending = 0, 0, []
+    for index, fingerprint in fingerprints.items():
+        record = checkpoint.records.get(index)
+        if record is not None and record["status"] == "ok" and record.get("fingerprint") == fingerprint:
+            unchanged += 1
+        elif fingerprint in reusable:
+            checkpoint.append(index, "ok", reusable[fingerprint], fingerprint=fingerprint)
+            reused += 1
+        else:
+            pending.append(index)
+
+    summary = {"unchanged": unchanged, "reused": reused, "pending": len(pending), "removed": len(removed)}
+    return df.loc[pending], fingerprints, summary
+
+
+def is_valid_result(result):
+    """
+    Returns whether a parsed response has a 'description' string and a 'data' object with every `REQUIRED_DATA`
+    field.
+    """
+    if not isinstance(result, dict) or not isinstance(result.get("description"), str):
+        return False
+    data = result.get("data")
+    return isinstance(data, dict) and all(data.get(name) not in (None, "") for name in REQUIRED_DATA)
+
+
+def parse_response(response):
+    # Extract JSON from response
+    start = response.find('{')
+    end = response.rfind('}')
+    result = json.loads(response[start:end+1])
+    if not is_valid_result(result):
+        raise ValueError(f"Response without a description or without {', '.join(REQUIRED_DATA)} in its data")
+    return result
+
+
+def augment_row(index, columns, row, max_attempts=5, retry_delay=5, limiter=None):
+    """
+    Generates the augmented description of a single POI.
+
+    Returns the parsed JSON response, or None when every attempt failed.
+    """
+    for attempt in range(1, max_attempts + 1):
         try:
-            columns = ', '.join(df.columns)
-            input_text = ', '.join([str(x) for x in row])
-            prompt = prompt_template.format(columns=columns, input_text=input_text, expected_output=expected_output_template)
-            
-            response = invoke_claude(prompt)
-            
-            # Extract JSON from response
-            start = response.find('{')
-            end = response.rfind('}')
-            json_response = response[start:end+1]
-            json_response = json.loads(json_response)
-            
-            all_responses.append(json_response)
-            
-            # Save progress after each successful response
-            with open("all_responses.json", "w") as file:
-                json.dump(all_responses, file)
-            
-            count += 1
-            print(f"Processed {count}/{len(df)} rows")
-            
-            # Add a small delay between requests to avoid rate limiting
-            time.sleep(1)
-            break  # Sale del bucle while si la solicitud fue exitosa
+            prompt = build_prompt(columns, row)
+            response = invoke_claude(prompt, limiter=limiter)
+            try:
+                return parse_response(response)
+            except ValueError:
+                # No dejar en caché una respuesta que no se puede parsear o que está incompleta
+                completion_cache.discard(completion_cache.make_key(MODEL_ID, SAMPLING_PARAMS, prompt))
+                raise
 
         except Exception as e:
-            print(f"Error processing row {count}: {str(e)}")
-            attempt += 1  # Incrementamos el número de intentos
+            print(f"Error processing row {index}: {str(e)}")
             if attempt < max_attempts:
-                print(f"Retrying in 5 seconds... Attempt {attempt}/{max_attempts}")
-                time.sleep(5)  # Esperamos 5 segundos antes de intentar nuevamente
+                print(f"Retrying in {retry_delay} seconds... Attempt {attempt}/{max_attempts}")
+                time.sleep(retry_delay)
             else:
                 print("Max attempts reached. Moving to the next row.")
-                # Save progress before moving to the next row
-                with open("all_responses.json", "w") as file:
-                    json.dump(all_responses, file)
-                break  # Sale del bucle while después de alcanzar el máximo de intentos
+    return None
+
+
+def compact_desc(desc):
+    """
+    Collapses the multi-line `desc` blob of the scraper into a single line of items separated by `; `.
+    """
+    # Los íconos de Google Maps llegan como caracteres de uso privado (p. ej. U+E5CA) y solo gastan tokens
+    desc = re.sub("[\ue000-\uf8ff]", "", str(desc))
+    items = [line.strip() for line in desc.splitlines()]
+    items = [item for item in items if item]
+    if items:
+        items[0] = items[0].removeprefix("Información").strip()
+    return "; ".join(item for item in items if item)
+
+
+def encode_row(index, row):
+    """
+    Encodes a POI as a single-line JSON object with only the fields needed for its description.
+    """
+    fields = {"id": int(index)}
+    for column, key in COMPACT_COLUMNS.items():
+        value = row.get(column)
+        if value is None or pd.isna(value) or str(value).strip() == "":
+            continue
+        if column == "desc":
+            value = compact_desc(value)
+        elif column == "bayesian_mean":
+            value = round(float(value), 3)
+        elif isinstance(value, str):
+            value = value.strip()
+        fields[key] = value
+    return json.dumps(fields, ensure_ascii=False, separators=(',', ':'))
+
+
+def build_batch_prompt(batch):
+    rows = "\n".join(encode_row(index, row) for index, row in batch)
+    return templates.load("pois_augmentation/batch_prompt_template.txt").format(
+        count=len(batch),
+        rows=rows,
+        expected_output=templates.load("pois_augmentation/batch_expected_output_template.txt"),
+    )
+
+
+def parse_batch_response(response, indices):
+    """
+    Splits the JSON array of a batched response into one result per POI.
+
+    Returns:
+    --------
+    dict
+        Valid results by row index. Elements with an unknown id, or that are not valid (see `is_valid_result`), are
+        left out so their rows can be sent again.
+    """
+    start = response.find('[')
+    end = response.rfind(']')
+    elements = json.loads(response[start:end+1])
+
+    results = {}
+    for element in elements:
+        if not isinstance(element, dict):
+            continue
+        try:
+            index = int(element.pop("id"))
+        except (KeyError, TypeError, ValueError):
+            continue
+        if index not in indices or index in results:
+            continue
+        if is_valid_result(element):
+            results[index] = {"description": element["description"], "data": element["data"]}
+    return results
+
+
+def augment_batch(batch, limiter=None):
+    """
+    Sends several POIs in a single prompt.
+
+    Returns the valid results by row index. A failed request or an unparseable response returns an empty dict.
+    A response that leaves out some POIs is not kept in the completion cache, so the retry of the same rows asks
+    the model again instead of getting the same incomplete answer.
+    """
+    indices = [index for index, _ in batch]
+    prompt = build_batch_prompt(batch)
+    try:
+        response = invoke_claude(prompt, limiter=limiter)
+    except Exception as e:
+        print(f"Error processing batch {indices[0]}..{indices[-1]}: {str(e)}")
+        return {}
+    try:
+        results = parse_batch_response(response, set(indices))
+    except ValueError as e:
+        print(f"Unparseable response for batch {indices[0]}..{indices[-1]}: {str(e)}")
+        results = {}
+    if len(results) < len(indices):
+        # Un lote reencolado con las mismas filas arma el mismo prompt: sin esto recibiría la misma respuesta
+        completion_cache.discard(completion_cache.make_key(MODEL_ID, SAMPLING_PARAMS, prompt))
+    return results
+
+
+def augment_batches(df, batch_size=10, concurrency=1, limiter=None, max_attempts=3):
+    """
+    Augments the rows of a DataFrame packing `batch_size` POIs in every prompt.
+
+    Only the POIs whose element is missing or invalid in the response are queued again, together with other
+    pending rows, until they reach `max_attempts`.
+
+    Yields:
+    -------
+    tuple
+        `(index, response)` pairs as batches complete. `response` is None for rows that failed every attempt.
+    """
+    queue = deque((index, row, 1) for index, row in df.iterrows())
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        running = {}
+        while queue or running:
+            while queue and len(running) < max(1, concurrency):
+                batch = [queue.popleft() for _ in range(min(batch_size, len(queue)))]
+                future = executor.submit(augment_batch, [(index, row) for index, row, _ in batch], limiter)
+                running[future] = batch
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch = running.pop(future)
+                results = future.result()
+                for index, row, attempt in batch:
+                    if index in results:
+                        yield index, results[index]
+                    elif attempt < max_attempts:
+                        queue.append((index, row, attempt + 1))
+                    else:
+                        print(f"Max attempts reached for row {index}.")
+                        yield index, None
+
+
+def augment_rows(df, concurrency=1, limiter=None, max_attempts=5, retry_delay=5):
+    """
+    Augments the rows of a DataFrame with a pool of worker threads.
+
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        Rows to augment.
+    concurrency : int
+        Number of requests in flight at the same time.
+    limiter : TokenBucket, optional
+        Limiter shared by every worker. When Bedrock throttles one request the whole pool slows down.
+    max_attempts : int
+        Attempts per row before giving up on it.
+    retry_delay : float
+        Seconds to wait between attempts of the same row after a non-throttling error.
+
+    Yields:
+    -------
+    tuple
+        `(index, response)` pairs in the same order as the rows of `df`. `response` is None for rows that failed.
+    """
+    columns = ', '.join(df.columns)
+    window = max(1, concurrency) * 2  # Limita las filas encoladas para no cargar todo en memoria
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        pending = deque()
+        for index, row in df.iterrows():
+            future = executor.submit(augment_row, index, columns, row, max_attempts, retry_delay, limiter)
+            pending.append((index, future))
+            if len(pending) >= window:
+                index, future = pending.popleft()
+                yield index, future.result()
+
+        while pending:
+            index, future = pending.popleft()
+            yield index, future.result()
+
+
+def load_places():
+    """
+    Reads the places to augment from the POI store written by `cleaning.py`, or from `final_places.csv` when
+    there is no store.
+    """
+    if os.path.exists(os.path.join(poi_store.PLACES_STORE_PATH, "schema.json")):
+        return poi_store.load_places(poi_store.PLACES_STORE_PATH)
+    return pd.read_csv(PLACES_PATH, index_col=0)
+
+
+def compact_responses(df, checkpoint, output_path, store_path=None):
+    """
+    Writes the successful responses of the checkpoint to `output_path`, in the row order of `df`.
+
+    The file is written to a temporary path and then renamed, so a crash never leaves a truncated output. With
+    `store_path` the responses are also written as a POI store (see `poi_store.py`) for the ingest.
+    """
+    responses = [
+        checkpoint.records[index]["value"]
+        for index in map(int, df.index)
+        if index in checkpoint.records and checkpoint.records[index]["status"] == "ok"
+    ]
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(responses, file)
+    os.replace(tmp_path, output_path)
+    if store_path:
+        poi_store.write_augmented_store(responses, store_path)
+    return len(responses)
+
+
+def main(concurrency=4, rate=2.0, batch_size=1):
+    """
+    Augments the new, changed and failed rows of the places and writes the responses.
+
+    Returns:
+    --------
+    int
+        Number of rows that could not be augmented (recorded as failed in the checkpoint).
+    """
+    # Read the places (memory-mapped store when available, CSV otherwise)
+    df = load_places()
+
+    # Load the checkpoint: only new, changed or failed rows are sent to the model
+    checkpoint = JsonlCheckpoint(CHECKPOINT_PATH)
+    checkpoint.load()
+    pending, fingerprints, summary = plan_delta(df, checkpoint)
+    print(f"Unchanged: {summary['unchanged']}, reused: {summary['reused']}, "
+          f"to augment: {summary['pending']}, removed: {summary['removed']}")
+
+    limiter = TokenBucket(rate=rate, capacity=concurrency)
+
+    # Process remaining rows
+    count = len(df) - len(pending)
+    if batch_size > 1:
+        results = augment_batches(pending, batch_size=batch_size, concurrency=concurrency, limiter=limiter)
+    else:
+        results = augment_rows(pending, concurrency=concurrency, limiter=limiter)
+
+    for index, json_response in results:
+        index = int(index)
+        if json_response is not None:
+            checkpoint.append(index, "ok", json_response, fingerprint=fingerprints[index])
+            count += 1
+            print(f"Processed {count}/{len(df)} rows")
+        else:
+            checkpoint.append(index, "failed", fingerprint=fingerprints[index])
+
+    # Compact once at the end
+    checkpoint.compact()
+    written = compact_responses(df, checkpoint, OUTPUT_PATH, poi_store.AUGMENTED_STORE_PATH)
+    print(f"Processing completed! {written} responses written to {OUTPUT_PATH}")
+    print(f"Completion cache: {completion_cache.stats()}")
+    return len(df) - written
+
 
-print("Processing completed!")
+if __name__ == "__main__":
+    # Las opciones se definen en cli.py, el punto de entrada común
+    import cli
+    cli.main(["augment", *sys.argv[1:]])
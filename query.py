@@ -1,10 +1,484 @@
-import chromadb as db
+import numpy as np
 import pandas as pd
+import sys
 import random
+from collections import Counter
 from dotenv import load_dotenv
 import os
 
-def query(profile:str):
+import telemetry
+from embeddings import Embedder
+import lexical_index
+from lexical_index import CATEGORIES, LexicalIndex, extract_category
+from spatial_index import SpatialIndex
+from vector_index import NumpyIndex
+
+PROBABILITIES = {
+    "Popular": 0.078,
+    "Santa Cruz": 0.078,
+    "Manrique": 0.078,
+    "Aranjuez": 0.078,
+    "Castilla": 0.078,
+    "Doce de Octubre": 0.078,
+    "Robledo": 0.078,
+    "Villa Hermosa": 0.078,
+    "Buenos Aires": 0.078,
+    "La Candelaria": 0.005,
+    "Laureles-Estadio": 0.005,
+    "La América": 0.078,
+    "San Javier": 0.078,
+    "El Poblado": 0.004,
+    "Guayabal": 0.078,
+    "Belén": 0.05,
+}
+
+METADATA_COLUMNS = [
+    "address",
+    "categories",
+    "comuna",
+    "latitude",
+    "longitude",
+    "name",
+    "precio",
+    "rating bayesian",
+]
+
+_collection = None
+_vector_index = None
+_spatial_index = None
+_lexical_index = None
+_embedder = None
+
+
+def get_collection():
+    """
+    Returns the "GoVibes" collection, reusing the same HTTP client (and its connection pool) across calls.
+
+    With `VECTOR_BACKEND=numpy` the in-process `NumpyIndex` is returned instead of the Chroma collection; both
+    expose the same `query` method.
+    """
+    global _collection
+    if _collection is None:
+        load_dotenv()
+        if os.getenv("VECTOR_BACKEND", "chroma") == "numpy":
+            _collection = NumpyIndex.load()
+        else:
+            # chromadb tarda casi un segundo en importarse: solo se carga si se usa
+            import chromadb as db
+            client = db.HttpClient(host=os.getenv("DB_HOST"), port=os.getenv("DB_PORT"))
+            _collection = client.get_collection("GoVibes")
+    return _collection
+
+
+def get_vector_index():
+    """
+    Returns every POI vector as a `NumpyIndex`, loaded (or pulled from Chroma) once per process.
+    """
+    global _vector_index
+    if _vector_index is None:
+        collection = get_collection()
+        _vector_index = collection if isinstance(collection, NumpyIndex) else NumpyIndex.from_collection(collection)
+    return _vector_index
+
+
+def get_spatial_index():
+    """
+    Returns the spatial index over the coordinates of the ingested POIs, built once per process.
+    """
+    global _spatial_index
+    if _spatial_index is None:
+        index = get_vector_index()
+        _spatial_index = SpatialIndex.from_metadatas(index.ids, index.metadatas)
+    return _spatial_index
+
+
+def get_embedder():
+    """
+    Returns the profile embedder, so the model is loaded once per process.
+    """
+    global _embedder
+    if _embedder is None:
+        _embedder = Embedder()
+    return _embedder
+
+
+def get_lexical_index():
+    """
+    Returns the lexical index written by `ingest.py`, or None when it was not built.
+    """
+    global _lexical_index
+    if _lexical_index is None:
+        path = os.getenv("LEXICAL_INDEX_PATH", lexical_index.DEFAULT_PATH)
+        if not os.path.exists(os.path.join(path, "meta.json")):
+            return None
+        _lexical_index = LexicalIndex.load(path)
+    return _lexical_index
+
+
+def sample_comunas(k=3, among=None):
+    """
+    Randomly selects `k` different comunas based on their weighted probabilities.
+
+    If `among` is given, only those comunas can be selected.
+    """
+    keys = [key for key in PROBABILITIES if among is None or key in among]
+    weights = [PROBABILITIES[key] for key in keys]
+    k = min(k, len(keys))
+
+    comunas = []
+    while len(comunas) < k:
+        chosen = random.choices(keys, weights=weights, k=1)[0]
+        if chosen not in comunas:
+            comunas.append(chosen)
+    return comunas
+
+
+def results_to_frame(poi):
+    """
+    Builds the POI DataFrame from a Chroma query result, reading the metadata in a single pass.
+    """
+    df = pd.DataFrame.from_records(poi["metadatas"][0], columns=METADATA_COLUMNS)
+    df.insert(0, "ids", poi["ids"][0])
+    df.insert(1, "documents", poi["documents"][0])
+    df.insert(2, "distances", poi["distances"][0])
+    return df
+
+
+def comuna_sizes():
+    """
+    Returns the number of POIs of every comuna when it is known without a request to Chroma, or None.
+
+    The counts come from the lexical index or from the in-process vector index, whichever is available.
+    """
+    lexical = get_lexical_index()
+    if lexical is not None:
+        return {comuna: sum(len(rows) for rows in groups.values()) for comuna, groups in lexical.groups.items()}
+    index = _vector_index if _vector_index is not None else get_collection()
+    if isinstance(index, NumpyIndex):
+        return {comuna: end - start for comuna, (start, end) in index.partitions.items()}
+    return None
+
+
+def retrieve(collection, profile_embedding, comunas, n_results=10, overfetch=4, ids=None, sizes=None):
+    """
+    Retrieves the `n_results` nearest POIs of every comuna with a single `collection.query`.
+
+    All the comunas are requested at once with an `$in` filter and the top-k per comuna is done client-side. A
+    comuna that got fewer than `n_results` hits is queried again on its own when it was crowded out by the
+    others. A comuna that already got all its POIs is not: either the combined query returned fewer results than
+    it asked for, so nothing was left out, or `sizes` says the comuna has no more POIs.
+
+    Parameters:
+    -----------
+    collection : chromadb.Collection
+        The "GoVibes" collection.
+    profile_embedding : list
+        Embedding of the user profile, as returned by `Embedder.embed([profile]).tolist()`.
+    comunas : list of str
+        Comunas to retrieve POIs from.
+    n_results : int
+        Number of POIs per comuna.
+    overfetch : int
+        Multiplier applied to `n_results * len(comunas)` for the combined query.
+    ids : list of str, optional
+        Candidate POI ids (e.g. from the spatial index). Only supported by `NumpyIndex`.
+    sizes : dict, optional
+        Number of POIs of every comuna (among `ids`, when given), e.g. from `comuna_sizes`.
+    """
+    # Chroma 0.5 no acepta `ids` en query(), así que solo se pasa cuando hay candidatos
+    candidates = {} if ids is None else {"ids": ids}
+    requested = n_results * len(comunas) * overfetch
+    with telemetry.span("collection.query", histogram="govibes.vector.query.duration", comunas=len(comunas)):
+        poi = collection.query(
+            query_embeddings = profile_embedding,
+            n_results = requested,
+            where={"comuna": {"$in": comunas}},
+            **candidates,
+        )
+    df_poi = results_to_frame(poi)
+    # Si la consulta devolvió menos de lo pedido, ya trajo todos los POIs de las comunas
+    exhausted = len(df_poi) < requested
+
+    # Chroma devuelve los resultados ordenados por distancia: head() conserva los más cercanos de cada comuna
+    df_poi = df_poi.groupby("comuna", sort=False).head(n_results)
+
+    counts = df_poi["comuna"].value_counts()
+    frames = [df_poi]
+    for comuna in comunas:
+        found = counts.get(comuna, 0)
+        if found < n_results and not exhausted and (sizes is None or found < sizes.get(comuna, 0)):
+            telemetry.count("govibes.vector.requery")
+            with telemetry.span("collection.query", histogram="govibes.vector.query.duration", comunas=1):
+                poi = collection.query(
+                    query_embeddings = profile_embedding,
+                    n_results = n_results,
+                    where={"comuna": comuna},
+                    **candidates,
+                )
+            frames = [frame[frame["comuna"] != comuna] for frame in frames] + [results_to_frame(poi)]
+    return pd.concat(frames, ignore_index=True)
+
+
+def fetch_by_ids(collection, profile_embedding, ids):
+    """
+    Scores only the given POIs against the profile, in the format of `results_to_frame`.
+
+    `NumpyIndex` restricts its query to the ids; with Chroma the vectors of the ids are fetched with `get` and
+    scored locally, since `query` does not accept ids.
+    """
+    if isinstance(collection, NumpyIndex):
+        with telemetry.span("collection.query", histogram="govibes.vector.query.duration"):
+            result = collection.query(query_embeddings=profile_embedding, n_results=len(ids), ids=ids)
+        return results_to_frame(result)
+    with telemetry.span("collection.get", histogram="govibes.vector.query.duration"):
+        data = collection.get(ids=ids, include=["embeddings", "documents", "metadatas"])
+    vectors = np.asarray(data["embeddings"], dtype=np.float32).reshape(len(data["ids"]), -1)
+    query_vector = np.asarray(profile_embedding, dtype=np.float32).reshape(-1)
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    query_vector = query_vector / max(np.linalg.norm(query_vector), 1e-12)
+    distances = 1.0 - vectors @ query_vector
+    return results_to_frame({
+        "ids": [data["ids"]],
+        "documents": [data["documents"]],
+        "metadatas": [data["metadatas"]],
+        "distances": [distances.tolist()],
+    })
+
+
+def hybrid_retrieve(collection, lexical, profile, profile_embedding, comunas, per_category=5, alpha=0.7,
+                    allowed_ids=None):
+    """
+    Retrieves category-diverse candidates by combining the lexical index with the vector scores.
+
+    For every comuna and every category in it, the `per_category` best POIs by BM25 against the profile (then by
+    rating) are pre-selected; only those are scored with the vectors, in a single request.
+
+    Parameters:
+    -----------
+    collection : chromadb.Collection or NumpyIndex
+        Vector store with the POIs.
+    lexical : LexicalIndex
+        Index built by `ingest.py` over the same POIs.
+    profile : str
+        Profile text, for the lexical score.
+    profile_embedding : list
+        Embedding of the profile, for the vector score.
+    comunas : list of str
+        Comunas to retrieve POIs from.
+    alpha : float
+        Weight of the vector similarity in the fused score; the rest is the BM25 score normalized by the best
+        candidate of the comuna.
+    allowed_ids : list of str, optional
+        Only these POIs can be retrieved (e.g. the ones near the tourist).
+
+    Returns:
+    --------
+    pandas.DataFrame
+        The columns of `retrieve` plus `final_category`, `lexical` and the fused `score`.
+    """
+    with telemetry.span("lexical.scores", histogram="govibes.lexical.duration"):
+        scores = lexical.scores(profile)
+    allowed = None
+    if allowed_ids is not None:
+        row_of = {poi: row for row, poi in enumerate(lexical.ids)}
+        allowed = {row_of[poi] for poi in allowed_ids if poi in row_of}
+
+    rows, categories = [], {}
+    for comuna in comunas:
+        for category, selected in lexical.candidates(comuna, scores, per_category, allowed).items():
+            rows.extend(selected)
+            categories.update(dict.fromkeys(selected, category))
+    if not rows:
+        return pd.DataFrame(columns=["ids", "documents", "distances"] + METADATA_COLUMNS
+                            + ["final_category", "lexical", "score"])
+
+    by_id = {lexical.ids[row]: row for row in rows}
+    df_poi = fetch_by_ids(collection, profile_embedding, list(by_id))
+    df_poi["final_category"] = [categories[by_id[poi]] for poi in df_poi["ids"]]
+    df_poi["lexical"] = [float(scores[by_id[poi]]) for poi in df_poi["ids"]]
+
+    best = df_poi.groupby("comuna")["lexical"].transform("max")
+    df_poi["score"] = alpha * (1 - df_poi["distances"]) + (1 - alpha) * (df_poi["lexical"] / best.where(best > 0, 1))
+    return df_poi
+
+
+def sample_comunas_many(n_users, k=3, rng=None):
+    """
+    Samples `k` different comunas for each of `n_users` users at once.
+
+    Uses the Gumbel-top-k trick, which draws from the same distribution as repeating `random.choices` and
+    rejecting comunas already chosen, as `sample_comunas` does.
+
+    Returns:
+    --------
+    tuple
+        `(names, chosen)`: the list of comuna names and an `(n_users, k)` array with indices into it.
+    """
+    rng = rng or np.random.default_rng()
+    names = list(PROBABILITIES.keys())
+    weights = np.array(list(PROBABILITIES.values()))
+    keys = np.log(weights) + rng.gumbel(size=(n_users, len(names)))
+    chosen = np.argsort(-keys, axis=1)[:, :k]
+    return names, chosen
+
+
+def recommend_many(profiles, index, embedder=None, seed=None, n_results=10, top=3):
+    """
+    Recommends the top POIs of three sampled comunas for many user profiles at once.
+
+    Applies the same rules as `query` (10 nearest POIs per comuna, nearest and best rated first, one POI per
+    `final_category`, 3 per comuna) but in vectorized form: all the profiles are embedded in one pass and scored
+    with a single matrix product per comuna.
+
+    Parameters:
+    -----------
+    profiles : dict
+        Profile text by user id, in the format written by `user_context.py`.
+    index : NumpyIndex
+        POI vectors and metadata, e.g. `NumpyIndex.load()` or `NumpyIndex.from_collection(collection)`.
+    embedder : Embedder, optional
+        Embedder used for the profiles.
+    seed : int, optional
+        Seed of the comuna sampling, for reproducible outputs.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per (user, recommended POI), with the user id, the rank inside its comuna and the POI columns of
+        `top3_places.csv`.
+    """
+    embedder = embedder or Embedder()
+    user_ids = list(profiles)
+    queries = embedder.embed([profiles[user] for user in user_ids]).astype(np.float32)
+    norms = np.linalg.norm(queries, axis=1, keepdims=True)
+    queries = queries / np.where(norms == 0, 1, norms)
+
+    names, chosen = sample_comunas_many(len(user_ids), rng=np.random.default_rng(seed))
+
+    pois = index.metadata_frame(METADATA_COLUMNS)
+    pois.insert(0, "ids", index.ids)
+    pois.insert(1, "documents", list(index.documents))
+    pois["final_category"] = [extract_category(text, CATEGORIES) for text in pois["categories"]]
+    category_codes, _ = pd.factorize(pois["final_category"], use_na_sentinel=False)
+    ratings = pois["rating bayesian"].to_numpy(dtype=np.float64)
+
+    frames = []
+    for position, comuna in enumerate(names):
+        users = np.nonzero((chosen == position).any(axis=1))[0]
+        if len(users) == 0 or comuna not in index.partitions:
+            continue
+        start, end = index.partitions[comuna]
+        k = min(n_results, end - start)
+        if k == 0:
+            continue
+
+        distances = 1.0 - queries[users] @ np.asarray(index.vectors[start:end]).T
+        if k < end - start:
+            candidates = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.tile(np.arange(k), (len(users), 1))
+        candidate_distances = np.take_along_axis(distances, candidates, axis=1)
+        rows = candidates + start
+
+        # Mismo orden que recommend(): primero el más cercano y, a igual distancia, el de mejor rating
+        order = np.lexsort((-ratings[rows], candidate_distances), axis=-1)
+        rows = np.take_along_axis(rows, order, axis=1)
+        candidate_distances = np.take_along_axis(candidate_distances, order, axis=1)
+
+        # Un POI por final_category: se descarta todo candidato cuya categoría ya apareció antes en la fila
+        codes = category_codes[rows]
+        earlier = np.tril(np.ones((k, k), dtype=bool), -1)
+        duplicated = ((codes[:, :, None] == codes[:, None, :]) & earlier).any(axis=2)
+        rank = np.cumsum(~duplicated, axis=1)
+        keep = ~duplicated & (rank <= top)
+
+        user_rows, columns = np.nonzero(keep)
+        frame = pois.iloc[rows[user_rows, columns]].reset_index(drop=True)
+        frame.insert(0, "user_id", [user_ids[user] for user in users[user_rows]])
+        frame.insert(1, "rank", rank[user_rows, columns])
+        frame.insert(4, "distances", candidate_distances[user_rows, columns])
+        frames.append(frame)
+
+    if not frames:
+        return pd.DataFrame(columns=["user_id", "rank", "ids", "documents", "distances"] + METADATA_COLUMNS)
+    return pd.concat(frames, ignore_index=True).sort_values(["user_id", "comuna", "rank"], ignore_index=True)
+
+
+def query_many(profile_paths, output_path, seed=None):
+    """
+    Precomputes recommendations for many stored profiles and writes them to a single Parquet file.
+
+    Parameters:
+    -----------
+    profile_paths : list of str
+        Profile files written by `user_context.py`. The user id is the file name without extension.
+    output_path : str
+        Parquet file with one row per (user, recommended POI).
+    """
+    profiles = {}
+    for path in profile_paths:
+        with open(path, "r") as f:
+            profiles[os.path.splitext(os.path.basename(path))[0]] = f.read()
+
+    df = recommend_many(profiles, get_vector_index(), seed=seed)
+    df.to_parquet(output_path, index=False)
+    return df
+
+
+def recommend(profile, near=None, radius_km=2.0):
+    """
+    Returns the top 3 POIs per comuna for a profile, as written to `top3_places.csv` by `query`.
+
+    It keeps no state besides the pooled clients and indexes, so `service.py` calls it directly for every request.
+
+    Returns:
+    --------
+    pandas.DataFrame or None
+        The recommended POIs, by comuna in alphabetical order and best first inside every comuna (highest fused
+        score, or nearest and then best rated), or None when there are no POIs within `radius_km` of `near`.
+    """
+    collection = get_collection()
+
+    # El perfil se embebe una sola vez (y queda en caché) en lugar de que Chroma lo embeba en cada consulta
+    profile_embedding = get_embedder().embed([profile]).tolist()
+
+    candidate_ids = None
+    if near is None:
+        comunas = sample_comunas()
+    else:
+        # Prefiltro espacial: solo se puntúan los POIs dentro del radio
+        index = get_vector_index()
+        rows = get_spatial_index().within_rows(near[0], near[1], radius_km)
+        if len(rows) == 0:
+            return None
+        candidate_ids = [index.ids[row] for row in rows]
+        comunas = sample_comunas(among={index.metadatas[row].get("comuna") for row in rows})
+
+    lexical = get_lexical_index()
+    if lexical is not None:
+        # Búsqueda híbrida: pocos candidatos por (comuna, categoría), puntuación léxica + vectorial
+        df_poi = hybrid_retrieve(collection, lexical, profile, profile_embedding, comunas, allowed_ids=candidate_ids)
+        ranking, ascending = ["comuna", "score"], [True, False]
+    else:
+        if candidate_ids is None:
+            df_poi = retrieve(collection, profile_embedding, comunas, sizes=comuna_sizes())
+        else:
+            sizes = Counter(str(index.metadatas[row].get("comuna", "")) for row in rows)
+            df_poi = retrieve(get_vector_index(), profile_embedding, comunas, ids=candidate_ids, sizes=sizes)
+        df_poi["final_category"] = [extract_category(text, CATEGORIES) for text in df_poi["categories"]]
+        ranking, ascending = ["comuna", "distances", "rating bayesian"], [True, True, False]
+
+    # Todas las rutas devuelven las comunas en orden alfabético y, dentro de cada una, el mejor POI primero
+    with telemetry.span("query.postprocess", histogram="govibes.query.postprocess.duration", rows=len(df_poi)):
+        return (
+            df_poi.sort_values(ranking, ascending=ascending, kind="stable")
+            .drop_duplicates(subset=["comuna", "final_category"])
+            .groupby('comuna')
+            .head(3)
+        )
+
+
+def query(profile:str, near=None, radius_km=2.0):
     """
     Queries a database of points of interest (POIs) from the GoVibes collection based on the provided user profile,
     and filters the results by random selection of three neighborhoods (comunas) with weighted probabilities.
@@ -16,115 +490,36 @@ def query(profile:str):
     -----------
     profile : str
         A description of the user profile that is used to search for relevant POIs in the database.
+    near : tuple, optional
+        (lat, lon) of the tourist. When given, only POIs within `radius_km` of it are considered, and the comunas
+        are sampled among the ones that have such POIs.
+    radius_km : float
+        Search radius around `near`, in kilometres.
 
     Process:
     --------
-    1. Loads environment variables for database connection.
-    2. Connects to the database and accesses the "GoVibes" collection.
-    3. Randomly selects 3 neighborhoods based on specified weighted probabilities.
-    4. Queries the database for POIs within each of the selected neighborhoods that match the given profile.
-    5. Extracts relevant metadata (e.g., address, categories, rating) from the query results.
-    6. Sorts and filters the POIs based on specific criteria (distance and rating).
+    1. Loads environment variables for database connection (only on the first call).
+    2. Reuses a pooled client to access the "GoVibes" collection, and embeds the profile locally with an embedder
+       loaded once per process.
+    3. Randomly selects 3 neighborhoods based on specified weighted probabilities. With `near`, the POIs within
+       `radius_km` are looked up in the spatial index first and only their neighborhoods can be selected.
+    4. Queries the database once for POIs within the selected neighborhoods that match the given profile, and
+       keeps the 10 nearest of each neighborhood. When `ingest.py` built the lexical index, only the best few
+       POIs of every category of those neighborhoods (by BM25 against the profile) are scored instead, and the
+       lexical and vector scores are fused (see `hybrid_retrieve`).
+    5. Extracts relevant metadata (e.g., address, categories, rating) from the query results in a single pass.
+    6. Sorts and filters the POIs based on specific criteria (fused score, or distance and rating).
     7. Saves the final list of top 3 POIs per comuna to a CSV file.
     """
-    load_dotenv()
-
-    client = db.HttpClient(host=os.getenv("DB_HOST"), port=os.getenv("DB_PORT"))
-    collection = client.get_collection("GoVibes")
-
-    probabilities = {
-        "Popular": 0.078,
-        "Santa Cruz": 0.078,
-        "Manrique": 0.078,
-        "Aranjuez": 0.078,
-        "Castilla": 0.078,
-        "Doce de Octubre": 0.078,
-        "Robledo": 0.078,
-        "Villa Hermosa": 0.078,
-        "Buenos Aires": 0.078,
-        "La Candelaria": 0.005,
-        "Laureles-Estadio": 0.005,
-        "La América": 0.078,
-        "San Javier": 0.078,
-        "El Poblado": 0.004,
-        "Guayabal": 0.078,
-        "Belén": 0.05,
-    }
-
-    keys = list(probabilities.keys())
-    weights = list(probabilities.values())
-
-    comunas = []
-    while len(comunas) < 3:
-        chosen = random.choices(keys, weights=weights, k=1)[0]
-        if chosen not in comunas:
-            comunas.append(chosen)
-
-    df_poi = pd.DataFrame(
-        columns=[
-            "ids",
-            "documents",
-            "distances",
-            "address",
-            "categories",
-            "comuna",
-            "latitude",
-            "longitude",
-            "name",
-            "precio",
-            "rating bayesian",
-        ]
-    )
-    for comuna in comunas:
-
-        poi = collection.query(
-            query_texts = profile,
-            n_results = 10,
-            where={"comuna": comuna},
-        )
-
-        df_temp = pd.DataFrame(
-            {
-                "ids": poi["ids"][0],
-                "documents": poi["documents"][0],
-                "distances": poi["distances"][0],
-                "address": list(map(lambda x: x["address"], poi["metadatas"][0])),
-                "categories": list(map(lambda x: x["categories"], poi["metadatas"][0])),
-                "comuna": list(map(lambda x: x["comuna"], poi["metadatas"][0])),
-                "latitude": list(map(lambda x: x["latitude"], poi["metadatas"][0])),
-                "longitude": list(map(lambda x: x["longitude"], poi["metadatas"][0])),
-                "name": list(map(lambda x: x["name"], poi["metadatas"][0])),
-                "precio": list(map(lambda x: x["precio"], poi["metadatas"][0])),
-                "rating bayesian": list(
-                    map(lambda x: x["rating bayesian"], poi["metadatas"][0])
-                ),
-            }
-        ).sort_values("distances", ascending=False)
-
-        df_poi = pd.concat([df_poi, df_temp])
-        
-    categories = ["restaurante", "parque", "bar", "discoteca", "cine", "teatro", "jardin",
-        "museo", "centro comercial"]
-
-    def extract_category(text, categories):
-        for category in categories:
-            if category in text.lower():
-                return category
-        return None
-
-    df_poi["final_category"] = df_poi["categories"].apply(lambda x: extract_category(x, categories))
-    
-    df_final = (
-        df_poi.sort_values(["comuna", "distances", "rating bayesian"], ascending=False)
-        .drop_duplicates(subset=["comuna", "final_category"])
-        .groupby('comuna')
-        .head(3)
-    )
+    df_final = recommend(profile, near=near, radius_km=radius_km)
+    if df_final is None:
+        print(f"No hay POIs a menos de {radius_km} km de {near}")
+        return
     path = "./data/output/recomended_pois/top3_places.csv"
     df_final.to_csv(path, index=False)
 
 
 if __name__ == "__main__":
-    with open("./data/output/user_profile/profile.txt", 'r') as f:
-        profile = f.read()
-    query(profile)
\ No newline at end of file
+    # Las opciones se definen en cli.py, el punto de entrada común
+    import cli
+    cli.main(["query", *sys.argv[1:]])
@@ -0,0 +1,100 @@
+"""
+Thread-safe token-bucket rate limiter shared by every worker that talks to the same external service.
+
+Every request takes one token before it is sent. Tokens refill at `rate` per second up to `capacity`, so bursts
+are bounded and the sustained request rate never exceeds `rate`. When the service answers with a throttling
+error, `throttled()` cuts the rate multiplicatively and pauses the whole bucket, which slows down all workers at
+once instead of letting each of them hammer the service with its own retries. Successful requests call
+`succeeded()`, which slowly raises the rate back towards `max_rate` (AIMD, as in TCP congestion control).
+
+Example usage:
+--------------
+    limiter = TokenBucket(rate=2, capacity=4)
+    limiter.acquire()      # blocks until a token is available
+    ...                    # send the request
+    limiter.succeeded()    # or limiter.throttled() on ThrottlingException
+"""
+
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Token bucket with adaptive rate.
+
+    Parameters:
+    -----------
+    rate : float
+        Initial number of requests per second.
+    capacity : float, optional
+        Maximum burst size. Defaults to `rate` (at least 1).
+    max_rate : float, optional
+        Ceiling for the adaptive rate. Defaults to the initial `rate`.
+    min_rate : float
+        Floor for the adaptive rate after repeated throttling.
+    backoff_factor : float
+        Multiplier applied to the rate on every throttling event.
+    recovery_step : float
+        Requests per second added back after every successful request.
+    pause : float
+        Seconds during which the whole bucket stops handing out tokens after a throttling event.
+    """
+
+    def __init__(self, rate, capacity=None, max_rate=None, min_rate=0.1,
+                 backoff_factor=0.5, recovery_step=0.05, pause=1.0):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self.max_rate = float(max_rate if max_rate is not None else rate)
+        self.min_rate = float(min_rate)
+        self.backoff_factor = backoff_factor
+        self.recovery_step = recovery_step
+        self.pause = pause
+
+        self.throttle_count = 0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - max(self._updated, self._paused_until)
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated = max(now, self._updated)
+
+    def acquire(self):
+        """
+        Blocks until one token is available and takes it.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def throttled(self, pause=None):
+        """
+        Slows down every worker after the service reported throttling.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.throttle_count += 1
+            self.rate = max(self.min_rate, self.rate * self.backoff_factor)
+            self._tokens = 0
+            self._paused_until = max(self._paused_until, now + (self.pause if pause is None else pause))
+
+    def succeeded(self):
+        """
+        Gradually restores the rate after successful requests.
+        """
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.recovery_step)
@@ -1,54 +1,272 @@
-import requests
-import pandas as pd
+import sys
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-def get_transit_directions(origin, destination, api_key):
+import telemetry
+from directions_cache import DirectionsCache
+
+BASE_URL = os.getenv("DIRECTIONS_URL", "https://maps.googleapis.com/maps/api/directions/json")
+
+# Respuestas que vale la pena guardar: los errores (cuota, clave inválida...) se vuelven a consultar
+CACHEABLE_STATUS = {"OK", "ZERO_RESULTS"}
+
+directions_cache = DirectionsCache()
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Returns the HTTP session shared by every leg, created (and requests imported) on first use.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            # Sesión HTTP compartida para reutilizar las conexiones entre tramos
+            _session = requests.Session()
+            _session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+            _session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+    return _session
+
+
+def get_transit_directions(origin, destination, api_key, mode="transit", language="es", timeout=10):
     """
     Fetches transit directions between an origin and destination using the Google Maps API.
 
+    Responses are served from the directions cache when the same leg was already requested, and fetched
+    over the pooled HTTP session otherwise.
+
     Parameters:
     - origin (tuple): Latitude and longitude of the starting point as (lat, lon).
     - destination (tuple): Latitude and longitude of the ending point as (lat, lon).
     - api_key (str): API key for Google Maps API.
+    - mode (str): Travel mode requested to the API.
+    - language (str): Language of the instructions in the response.
+    - timeout (float): Seconds to wait for the API before giving up.
 
     Returns:
     - dict: JSON response from the Google Maps API containing route information.
     """
-    base_url = "https://maps.googleapis.com/maps/api/directions/json"
+    key = directions_cache.make_key(origin, destination, mode, language)
+    cached = directions_cache.get(key)
+    if cached is not None:
+        telemetry.count("govibes.cache.hits", cache="directions")
+        return cached
+    telemetry.count("govibes.cache.misses", cache="directions")
+
     params = {
         "origin": f"{origin[0]},{origin[1]}",
         "destination": f"{destination[0]},{destination[1]}",
-        "mode": "transit",
-        "language": "es",  # Spanish language for the response
+        "mode": mode,
+        "language": language,  # Spanish language for the response
         "key": api_key
     }
-    
-    response = requests.get(base_url, params=params)
-    return response.json()
 
-# Load recommended points of interest (POIs) from CSV
-df = pd.read_csv("data/output/recomended_pois/top3_places.csv")
+    with telemetry.span("get_transit_directions", histogram="govibes.directions.duration", mode=mode) as span:
+        response = get_session().get(BASE_URL, params=params, timeout=timeout)
+        result = response.json()
+        span.set_attribute("status", str(result.get("status")))
+    if result.get("status") in CACHEABLE_STATUS:
+        directions_cache.put(key, result)
+    return result
+
+
+def haversine_matrix(points):
+    """
+    Computes the great-circle distance in kilometres between every pair of points.
+
+    Parameters:
+    - points (list): (lat, lon) of the places.
+
+    Returns:
+    - numpy.ndarray: Symmetric (N, N) matrix of distances.
+    """
+    # numpy y pandas se importan al planear una ruta, no al importar el módulo (service.py, cli.py --help)
+    import numpy as np
+    coords = np.radians(np.asarray(points, dtype=np.float64).reshape(-1, 2))
+    lat, lon = coords[:, 0:1], coords[:, 1:2]
+    a = np.sin((lat - lat.T) / 2) ** 2 + np.cos(lat) * np.cos(lat.T) * np.sin((lon - lon.T) / 2) ** 2
+    return 6371.0 * 2 * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def _path_length(order, distances):
+    return sum(distances[a, b] for a, b in zip(order[:-1], order[1:]))
+
+
+def _held_karp(distances, start=None, end=None):
+    """
+    Exact shortest open path visiting every point once (O(N^2 2^N)), from `start` and to `end` when given.
+    """
+    import numpy as np
+
+    n = len(distances)
+    full = (1 << n) - 1
+    cost = np.full((1 << n, n), np.inf)
+    parent = np.full((1 << n, n), -1, dtype=np.int64)
+    for i in range(n) if start is None else [start]:
+        cost[1 << i, i] = 0.0
+
+    for mask in range(1, full + 1):
+        for last in range(n):
+            if not mask & (1 << last) or cost[mask, last] == np.inf:
+                continue
+            for nxt in range(n):
+                # El punto final fijo solo puede ser el último en entrar
+                if mask & (1 << nxt) or (nxt == end and mask | (1 << nxt) != full):
+                    continue
+                new_mask = mask | (1 << nxt)
+                new_cost = cost[mask, last] + distances[last, nxt]
+                if new_cost < cost[new_mask, nxt]:
+                    cost[new_mask, nxt] = new_cost
+                    parent[new_mask, nxt] = last
+
+    last = int(np.argmin(cost[full])) if end is None else end
+    order, mask = [], full
+    while last != -1:
+        order.append(last)
+        last, mask = int(parent[mask, last]), mask & ~(1 << last)
+    return order[::-1]
+
+
+def _nearest_neighbour_two_opt(distances, start=None, end=None):
+    """
+    Heuristic open path: nearest neighbour from every start (or from `start`), improved with 2-opt. With `end` the
+    path is closed at that point.
+    """
+    import numpy as np
+
+    n = len(distances)
+    best = None
+    for first in range(n) if start is None else [start]:
+        if first == end:
+            continue
+        order, visited = [first], {first} if end is None else {first, end}
+        while len(visited) < n:
+            row = distances[order[-1]].copy()
+            row[list(visited)] = np.inf
+            order.append(int(np.argmin(row)))
+            visited.add(order[-1])
+        if end is not None:
+            order.append(end)
+
+        # Los segmentos invertidos no mueven el inicio ni el final fijos
+        low, high = (0 if start is None else 1), (n if end is None else n - 1)
+        improved = True
+        while improved:
+            improved = False
+            for i in range(low, high - 1):
+                for j in range(i + 2, high + 1):
+                    candidate = order[:i] + order[i:j][::-1] + order[j:]
+                    if _path_length(candidate, distances) < _path_length(order, distances) - 1e-9:
+                        order, improved = candidate, True
+
+        if best is None or _path_length(order, distances) < _path_length(best, distances):
+            best = order
+    return best
+
+
+def order_route(points, exact_limit=10, start=None, end=None):
+    """
+    Chooses the visiting order that minimizes the total straight-line distance of the route.
+
+    The order is solved locally, so no extra Directions requests are needed: exactly (Held-Karp) for up to
+    `exact_limit` points and with nearest neighbour plus 2-opt above that.
+
+    Parameters:
+    - points (list): (lat, lon) of the places to visit.
+    - exact_limit (int): Largest number of points solved exactly.
+    - start (int, optional): Index of the point where the route must start (e.g. the hotel of the tourist).
+    - end (int, optional): Index of the point where the route must end.
+
+    Returns:
+    - list: Indices of `points` in visiting order.
+    """
+    n = len(points)
+    if start is not None and start == end and n > 1:
+        raise ValueError("The start and the end of a route must be different points")
+    if n <= 2:
+        order = list(range(n))
+        # Con dos puntos solo se invierte el orden si el inicio o el final fijos lo piden
+        if (start is not None and start != 0) or (end is not None and end != n - 1):
+            order.reverse()
+        return order
+    distances = haversine_matrix(points)
+    if n <= exact_limit:
+        return _held_karp(distances, start, end)
+    return _nearest_neighbour_two_opt(distances, start, end)
+
+
+def get_route_legs(points, api_key, max_workers=4, **kwargs):
+    """
+    Fetches the directions of every consecutive leg of a route concurrently.
+
+    Parameters:
+    - points (list): (lat, lon) of the places to visit, in order.
+    - api_key (str): API key for Google Maps API.
+    - max_workers (int): Maximum number of legs requested at the same time.
+
+    Returns:
+    - list: One Directions response per leg, in route order.
+    """
+    legs = list(zip(points[:-1], points[1:]))
+    if not legs:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(legs)))) as executor:
+        return list(executor.map(lambda leg: get_transit_directions(leg[0], leg[1], api_key, **kwargs), legs))
 
-# Select the top 3 places from the dataframe
-df = df.head(3)
 
-# Extract routes and names for easier iteration
-complete_route = df[["latitude", "longitude"]].values.tolist()
-nombres = df["name"].values.tolist()
+def plan_route(df, api_key, stops=3, **kwargs):
+    """
+    Orders the first `stops` recommended POIs into the shortest route and fetches the directions of its legs.
 
-# Your API key (ensure security by not hardcoding in production)
-api_key = os.getenv("GOOGLE_MAPS_API_KEY")
+    Parameters:
+    - df (pandas.DataFrame): Recommended POIs, with the columns of `top3_places.csv`.
+    - api_key (str): API key for Google Maps API.
+    - stops (int): Number of POIs to visit.
 
-# Iterate over the route points to fetch and display directions
-for i in range(len(complete_route) - 1):
-    origin = complete_route[i]
-    destination = complete_route[i + 1]
-    nombre_origen = nombres[i]
-    nombre_destino = nombres[i + 1]
+    Returns:
+    - tuple: The visited POIs in route order and one Directions response per leg.
+    """
+    df = df.head(stops)
+    df = df.iloc[order_route(df[["latitude", "longitude"]].values.tolist())]
+    return df, get_route_legs(df[["latitude", "longitude"]].values.tolist(), api_key, **kwargs)
 
-    # Fetch transit directions
-    result = get_transit_directions(origin, destination, api_key)
 
+def summarize_leg(result):
+    """
+    Extracts the fields shown by `print_leg` from a Directions response.
+
+    Parameters:
+    - result (dict): Directions response of one leg.
+
+    Returns:
+    - dict: Status and, when the route was found, duration, distance and steps (with their transit line and stops).
+    """
+    if result.get("status") != "OK":
+        return {"status": result.get("status")}
+    route = result["routes"][0]["legs"][0]
+    steps = []
+    for step in route["steps"]:
+        summary = {"instructions": step["html_instructions"]}
+        if "transit_details" in step:
+            transit = step["transit_details"]
+            summary["line"] = transit["line"].get("short_name", transit["line"]["name"])
+            summary["departure_stop"] = transit["departure_stop"]["name"]
+            summary["arrival_stop"] = transit["arrival_stop"]["name"]
+        steps.append(summary)
+    return {
+        "status": "OK",
+        "duration": route["duration"]["text"],
+        "distance": route["distance"]["text"],
+        "steps": steps,
+    }
+
+
+def print_leg(result, nombre_origen, nombre_destino):
     # Check API response status
     if result["status"] == "OK":
         # Extract route details for display
@@ -62,15 +280,40 @@ for i in range(len(complete_route) - 1):
         )
         print(f"Duración total: {route['duration']['text']}")
         print(f"Distancia total: {route['distance']['text']}")
-        
+
         print("\nPasos del viaje:")
         for step in route["steps"]:
             # Display travel instructions
             print(f"\n- {step['html_instructions']}")
-            
+
             # Display transit details if available
             if "transit_details" in step:
                 transit = step["transit_details"]
                 print(f"  Línea: {transit['line']['short_name'] if 'short_name' in transit['line'] else transit['line']['name']}")
                 print(f"  Desde: {transit['departure_stop']['name']}")
                 print(f"  Hasta: {transit['arrival_stop']['name']}")
+
+
+def main(stops=3):
+    import pandas as pd
+
+    # Load recommended points of interest (POIs) from CSV
+    df = pd.read_csv("data/output/recomended_pois/top3_places.csv")
+
+    # Your API key (ensure security by not hardcoding in production)
+    api_key = os.getenv("GOOGLE_MAPS_API_KEY")
+
+    # Select the top places (up to the 9 POIs recommended by query.py), sort them locally so the route is as
+    # short as possible and fetch only the chosen legs, all at once (cached legs are not requested again)
+    df, results = plan_route(df, api_key, stops=stops)
+    nombres = df["name"].values.tolist()
+
+    # Display the directions of every leg in route order
+    for i, result in enumerate(results):
+        print_leg(result, nombres[i], nombres[i + 1])
+
+
+if __name__ == "__main__":
+    # Las opciones se definen en cli.py, el punto de entrada común
+    import cli
+    cli.main(["route", *sys.argv[1:]])
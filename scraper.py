@@ -0,0 +1,612 @@
+"""
+Parallel, resumable Google Maps scraper, built from `scrapping.ipynb`.
+
+The notebook drives a single Chrome sequentially over every (comuna, site) search, waits with fixed `time.sleep`
+calls and keeps every result in memory until the final `to_csv`. Here:
+
+- Every (comuna, site) search is a task in a queue, consumed by `workers` threads that own one browser each.
+- The browser waits for the elements it needs (`WebDriverWait`) instead of sleeping a fixed time.
+- Every task appends its places to its own JSONL checkpoint (see `checkpoint.py`) as soon as they are scraped. An
+  interrupted run resumes where it stopped: finished tasks are skipped and, inside an unfinished task, the places
+  already scraped are not opened again.
+- Extraction only sees HTML: a `PageSource` returns the HTML of the search results and of every place, and the
+  `parse_*` functions extract the fields from it. `SeleniumSource` drives Chrome, `FixtureSource` serves saved
+  pages from disk, so the extraction can be exercised at full speed without a browser. Wrapping a source in
+  `RecordingSource` saves the pages it returns as fixtures. `tests/fixtures/maps` holds a search and its places,
+  trimmed to the elements the parser reads.
+
+Files:
+------
+- `./data/output/places/tasks/<comuna>_<site>.jsonl`: Checkpoint of every task.
+- `./data/output/places/places_scraper_<comuna>_<site>.csv`: The places of every task, with the columns of the
+  notebook, for `cleaning.py`. One file per task, so a new scrape only changes the files of its tasks and the
+  cleaning only processes those.
+
+Example usage:
+--------------
+    python scraper.py --workers 4
+    python scraper.py --comunas "Comuna Popular" --sites Museos Parques
+    python scraper.py --fixtures ./tests/fixtures/maps --comunas "Comuna Popular" --sites Museos    # No browser
+"""
+
+import sys
+import hashlib
+import os
+import queue
+import re
+import threading
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from html.parser import HTMLParser
+
+import pandas as pd
+
+from checkpoint import JsonlCheckpoint
+
+
+PLACES = {
+    "Medellín": {
+        "Comunidades": [
+            "Comuna Popular",
+            "Comuna Santa Cruz",
+            "Comuna Manrique",
+            "Comuna Aranjuez",
+            "Comuna Castilla",
+            "Comuna Doce de Octubre",
+            "Comuna Robledo",
+            "Comuna Villa Hermosa",
+            "Comuna Buenos Aires",
+            "Comuna La Candelaria",
+            "Comuna Laureles-Estadio",
+            "Comuna La América",
+            "Comuna San Javier",
+            "Comuna El Poblado",
+            "Comuna Guayabal",
+            "Comuna Belén",
+        ],
+        "Corregimientos": ["San Sebastián de Palmitas", "San Cristóbal", "Altavista", "San Antonio de Prado", "Santa Elena"],
+    }
+}
+
+CORDS = {
+    "Comuna Popular": "https://www.google.com/maps/@6.3042295,-75.5513746,16z?hl=es",
+    "Comuna Santa Cruz": "https://www.google.com/maps/@6.2930215,-75.5588579,17z?hl=es",
+    "Comuna Manrique": "https://www.google.com/maps/@6.2689654,-75.5473832,16.34z?hl=es",
+    "Comuna Aranjuez": "https://www.google.com/maps/@6.2830811,-75.5777798,15z?hl=es",
+    "Comuna Castilla": "https://www.google.com/maps/@6.2917204,-75.5779338,16z?hl=es",
+    "Comuna Doce de Octubre": "https://www.google.com/maps/@6.3020681,-75.5816456,15.81z?hl=es",
+    "Comuna Robledo": "https://www.google.com/maps/@39.2178016,-4.284476,15.52z?hl=es",
+    "Comuna Villa Hermosa": "https://www.google.com/maps/@6.24759,-75.5554641,15.44z?hl=es",
+    "Comuna Buenos Aires": "https://www.google.com/maps/@6.2383113,-75.5595339,16z?hl=es",
+    "Comuna La Candelaria": "https://www.google.com/maps/@6.2463071,-75.5791721,15.63z?hl=es",
+    "Comuna Laureles-Estadio": "https://www.google.com/maps/@6.2524967,-75.5997339,14.8z?hl=es",
+    "Comuna La América": "https://www.google.com/maps/@6.2554805,-75.6071289,15.69z?hl=es",
+    "Comuna San Javier": "https://www.google.com/maps/@6.2552154,-75.6266392,15.74z?hl=es",
+    "Comuna El Poblado": "https://www.google.com/maps/@6.209337,-75.5702626,17z?hl=es",
+    "Comuna Guayabal": "https://www.google.com/maps/@6.2098079,-75.5885941,14.39z?hl=es",
+    "Comuna Belén": "https://www.google.com/maps/@6.2262257,-75.6077478,14.53z?hl=es"
+}
+
+# Búsquedas con pocos resultados: no hace falta desplazarse para cargar más
+COMMON = ["Museos", "Parques temático", "Parques de atracciones", "Parques acuaticos", "Jardines", "Cines"]
+
+SITES = ["Restaurantes", "Hoteles", "Parques", "Comida rápida",
+         "Bares", "Discotecas", "Cines", "Teatros", "Jardines",
+         "Museos", "Parques temático", "Centros comerciales",
+         "Parques de atracciones", "Parques acuaticos"]
+
+COLUMNS = ["name", "desc", "score", "c_score", "price", "category", "accessibility", "schedule", "web",
+           "search_parameters", "phone", "address", "lat", "lon"]
+
+TASKS_DIR = "./data/output/places/tasks"
+OUTPUT_DIR = "./data/output/places"
+OUTPUT_PREFIX = "places_scraper_"
+
+# Claves reservadas en el checkpoint de cada tarea
+SEARCH_KEY = "__search__"
+DONE_KEY = "__done__"
+
+PlacePage = namedtuple("PlacePage", ["url", "html", "about_html"])
+
+
+class _Node:
+    __slots__ = ("tag", "attrs", "children")
+
+    def __init__(self, tag, attrs):
+        self.tag = tag
+        self.attrs = attrs
+        self.children = []
+
+    def get(self, name):
+        return self.attrs.get(name)
+
+    @property
+    def text(self):
+        """
+        Visible text of the element, one line per text node, as Selenium's `.text`.
+        """
+        lines, stack = [], [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                if node.strip():
+                    lines.append(node.strip())
+                continue
+            stack.extend(reversed(node.children))
+        return "\n".join(lines)
+
+
+class Page(HTMLParser):
+    """
+    Minimal DOM of an HTML page, indexed by the exact value of the `class` attribute.
+
+    `page.by_class("F7nice ")` matches the same elements as the XPath `//*[@class='F7nice ']` of the notebook.
+    """
+
+    VOID = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+    SKIP = {"script", "style"}
+
+    def __init__(self, html):
+        super().__init__(convert_charrefs=True)
+        self.root = _Node("#document", {})
+        self._stack = [self.root]
+        self._classes = {}
+        self._skip = 0
+        self.feed(html or "")
+        self.close()
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skip += 1
+            return
+        node = _Node(tag, {name: value if value is not None else "" for name, value in attrs})
+        self._stack[-1].children.append(node)
+        if "class" in node.attrs:
+            self._classes.setdefault(node.attrs["class"], []).append(node)
+        if tag not in self.VOID:
+            self._stack.append(node)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in self.VOID and tag not in self.SKIP and self._stack[-1].tag == tag:
+            self._stack.pop()
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP:
+            self._skip = max(0, self._skip - 1)
+            return
+        for position in range(len(self._stack) - 1, 0, -1):
+            if self._stack[position].tag == tag:
+                del self._stack[position:]
+                break
+
+    def handle_data(self, data):
+        if not self._skip:
+            self._stack[-1].children.append(data)
+
+    def by_class(self, name):
+        return self._classes.get(name, [])
+
+
+def parse_search(html):
+    """
+    Returns the URLs of the places listed in a search results page, without the sponsored ones.
+    """
+    page = Page(html)
+    links = [link.get("href") for link in page.by_class("hfpxzc") if link.get("href")]
+    publicity = len(page.by_class("geckTe FcJlLe"))
+    return links[publicity:]
+
+
+def parse_score(text):
+    """
+    Parses the rating block ("4,6\\n(1.234)") into `(score, c_score)`.
+    """
+    try:
+        score, c_score = (
+            float(x) for x in text.replace("(", "").replace(")", "").replace(".", "").replace(",", ".").split("\n")
+        )
+        return score, c_score
+    except ValueError:
+        return None, None
+
+
+def parse_schedule(page):
+    """
+    Estimates the opening hours from the "popular times" chart: from the first hour with visitors to the next one
+    without them.
+    """
+    if not page.by_class("g2BVhd eoFzo "):
+        return None
+    inicio = None
+    fin = None
+    try:
+        for horario in page.by_class("dpoVLd finExf"):
+            label = horario.get("aria-label") or ""
+            # Extraemos la ocupación y la hora del string
+            ocupacion = int(re.findall(r"ocupación: (\d*)", label)[0])
+            hora = label.split("hora:")[1].strip().replace("\u202f", " ")
+
+            if ocupacion > 0 and inicio is None:
+                inicio = hora
+            if ocupacion == 0 and inicio is not None:
+                fin = hora
+                break
+    except (IndexError, ValueError):
+        return None
+    return str(str(inicio) + "," + str(fin)).replace("p.\xa0m.)", "pm").replace("a.\xa0m.)", "")
+
+
+def parse_coordinates(url):
+    """
+    Returns `(lat, lon)` from the `@lat,lon,zoom` part of a Google Maps URL.
+    """
+    found = re.search(r"@(-?\d+(?:\.\d+)?),(-?\d+(?:\.\d+)?)", url or "")
+    if found is None:
+        return None, None
+    return float(found.group(1)), float(found.group(2))
+
+
+def parse_place(place, comuna, site):
+    """
+    Extracts the columns of the notebook from the pages of a place.
+
+    Parameters:
+    -----------
+    place : PlacePage
+        URL of the place once loaded, HTML of its overview and HTML after opening its "Información" tab.
+    comuna, site : str
+        Search that listed the place, saved in `search_parameters`.
+
+    Returns:
+    --------
+    dict
+        One row with the `COLUMNS` of the scraper output. Missing fields are None.
+    """
+    page = Page(place.html)
+
+    def first(name, attribute=None):
+        nodes = page.by_class(name)
+        if not nodes:
+            return None
+        return nodes[0].get(attribute) if attribute else nodes[0].text
+
+    row = dict.fromkeys(COLUMNS)
+    row["name"] = first("DUwDvf lfPIob")
+
+    scores = first("F7nice ")
+    if scores is not None:
+        row["score"], row["c_score"] = parse_score(scores)
+
+    price = first("mgr77e")
+    row["price"] = price.replace("·", "").strip() if price is not None else None
+    row["category"] = first("DkEaL ")
+    row["accessibility"] = first("wmQCje google-symbols", "aria-label")
+    row["address"] = first("Io6YTe fontBodyMedium kR99db fdkmkc ")
+
+    for web in page.by_class("CsEnBe"):
+        label = web.get("aria-label")
+        if label is None:
+            continue
+        if label.startswith("Teléfono: ") and row["phone"] is None:
+            row["phone"] = label.replace("Teléfono: ", "")
+        elif label.startswith("Sitio web: ") and row["web"] is None:
+            row["web"] = web.get("href") or None
+
+    row["search_parameters"] = f"{comuna} {site}"
+    row["schedule"] = parse_schedule(page)
+
+    about = Page(place.about_html)
+    info_button = about.by_class("hh2c6 ")
+    info = about.by_class("m6QErb DxyBCb kA9KIf dS8AEf XiKgde ")
+    if info_button and info and info_button[-1].get("aria-label"):
+        row["desc"] = str(info_button[-1].get("aria-label").split()[0] + ",".join([i.text for i in info]))
+
+    row["lat"], row["lon"] = parse_coordinates(place.url)
+    return row
+
+
+class PageSource(ABC):
+    """
+    Interface between the scraper and wherever the pages come from.
+    """
+
+    @abstractmethod
+    def search(self, comuna, site):
+        """
+        Returns the HTML of the results of searching `site` in `comuna`.
+        """
+
+    @abstractmethod
+    def place(self, url):
+        """
+        Returns the `PlacePage` of a place listed in the search results.
+        """
+
+    def close(self):
+        pass
+
+
+class SeleniumSource(PageSource):
+    """
+    Chrome driven by Selenium, with explicit waits.
+
+    Parameters:
+    -----------
+    headless : bool
+        Runs Chrome without a window.
+    timeout : float
+        Maximum seconds to wait for an element before giving up on it.
+    """
+
+    def __init__(self, headless=True, timeout=10):
+        # Selenium solo hace falta con el navegador real, no para las fixtures
+        from selenium import webdriver
+
+        options = webdriver.ChromeOptions()
+        if headless:
+            options.add_argument("--headless=new")
+        options.add_argument("--lang=es")
+        self.driver = webdriver.Chrome(options=options)
+        self.timeout = timeout
+
+    def _wait(self, condition, timeout=None):
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        try:
+            return WebDriverWait(self.driver, timeout or self.timeout).until(condition)
+        except TimeoutException:
+            return None
+
+    def _present(self, class_name, timeout=None):
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+
+        return self._wait(EC.presence_of_all_elements_located((By.XPATH, f"//*[@class='{class_name}']")), timeout)
+
+    def search(self, comuna, site):
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+
+        self.driver.get(CORDS[comuna])
+        search_input = self._wait(EC.element_to_be_clickable((By.ID, "searchboxinput")))
+        search_input.clear()
+        search_input.send_keys(f"{site} en {comuna}")
+        self.driver.find_element(By.ID, "searchbox-searchbutton").click()
+
+        results = self._wait(EC.presence_of_all_elements_located((By.CLASS_NAME, "hfpxzc"))) or []
+        if results and site not in COMMON:
+            # Desplazarse al último resultado carga la siguiente página de la lista
+            count = len(results)
+            self.driver.execute_script("arguments[0].scrollIntoView()", results[-1])
+            self._wait(lambda driver: len(driver.find_elements(By.CLASS_NAME, "hfpxzc")) > count, timeout=3)
+        return self.driver.page_source
+
+    def place(self, url):
+        from selenium.webdriver.common.by import By
+
+        self.driver.get(url)
+        self._present("DUwDvf lfPIob")
+        # La URL incluye las coordenadas (@lat,lon) cuando el mapa termina de centrarse en el lugar
+        self._wait(lambda driver: parse_coordinates(driver.current_url)[0] is not None)
+
+        schedules = self.driver.find_elements(By.XPATH, "//*[@class='g2BVhd eoFzo ']")
+        if schedules:
+            self.driver.execute_script("arguments[0].scrollIntoView()", schedules[0])
+            self._present("dpoVLd finExf", timeout=3)
+        html = self.driver.page_source
+        current_url = self.driver.current_url
+
+        about_html = ""
+        info_button = self.driver.find_elements(By.XPATH, "//*[@class='hh2c6 ']")
+        if info_button:
+            info_button[-1].click()
+            self._present("m6QErb DxyBCb kA9KIf dS8AEf XiKgde ", timeout=5)
+            about_html = self.driver.page_source
+        return PlacePage(current_url, html, about_html)
+
+    def close(self):
+        self.driver.quit()
+
+
+def task_name(comuna, site):
+    return re.sub(r"\W+", "_", f"{comuna} {site}").strip("_")
+
+
+def place_name(url):
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+
+
+class FixtureSource(PageSource):
+    """
+    Serves pages saved on disk: `search/<task>.html`, `place/<hash>.html`, `place/<hash>.about.html` and
+    `place/<hash>.url` (the URL of the place once loaded, with its coordinates).
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _read(self, *parts, default=None):
+        path = os.path.join(self.directory, *parts)
+        if not os.path.exists(path):
+            if default is not None:
+                return default
+            raise FileNotFoundError(path)
+        with open(path, "r", encoding="utf-8") as file:
+            return file.read()
+
+    def search(self, comuna, site):
+        return self._read("search", f"{task_name(comuna, site)}.html", default="")
+
+    def place(self, url):
+        name = place_name(url)
+        return PlacePage(
+            self._read("place", f"{name}.url", default=url).strip(),
+            self._read("place", f"{name}.html"),
+            self._read("place", f"{name}.about.html", default=""),
+        )
+
+
+class RecordingSource(PageSource):
+    """
+    Wraps another source and saves every page it returns in the layout read by `FixtureSource`.
+    """
+
+    def __init__(self, source, directory):
+        self.source = source
+        self.directory = directory
+        os.makedirs(os.path.join(directory, "search"), exist_ok=True)
+        os.makedirs(os.path.join(directory, "place"), exist_ok=True)
+
+    def _write(self, content, *parts):
+        with open(os.path.join(self.directory, *parts), "w", encoding="utf-8") as file:
+            file.write(content)
+
+    def search(self, comuna, site):
+        html = self.source.search(comuna, site)
+        self._write(html, "search", f"{task_name(comuna, site)}.html")
+        return html
+
+    def place(self, url):
+        page = self.source.place(url)
+        name = place_name(url)
+        self._write(page.url, "place", f"{name}.url")
+        self._write(page.html, "place", f"{name}.html")
+        self._write(page.about_html, "place", f"{name}.about.html")
+        return page
+
+    def close(self):
+        self.source.close()
+
+
+def run_task(source, comuna, site, tasks_dir=TASKS_DIR):
+    """
+    Scrapes every place of one search, appending each one to the checkpoint of the task.
+
+    Returns:
+    --------
+    int
+        Number of places of the task scraped successfully, including the ones of previous runs.
+    """
+    checkpoint = JsonlCheckpoint(os.path.join(tasks_dir, f"{task_name(comuna, site)}.jsonl"))
+    checkpoint.load()
+    try:
+        if DONE_KEY in checkpoint.completed_keys():
+            return checkpoint.records[DONE_KEY]["value"]
+
+        # La lista de resultados se guarda para no repetir la búsqueda al reanudar
+        if SEARCH_KEY in checkpoint.completed_keys():
+            urls = checkpoint.records[SEARCH_KEY]["value"]
+        else:
+            urls = parse_search(source.search(comuna, site))
+            checkpoint.append(SEARCH_KEY, "ok", urls)
+
+        done = checkpoint.completed_keys()
+        for url in urls:
+            if url in done:
+                continue
+            try:
+                checkpoint.append(url, "ok", parse_place(source.place(url), comuna, site))
+            except Exception as e:
+                checkpoint.append(url, "failed", str(e))
+
+        scraped = len([url for url in urls if url in checkpoint.completed_keys()])
+        if scraped == len(urls):
+            checkpoint.append(DONE_KEY, "ok", scraped)
+        return scraped
+    finally:
+        checkpoint.close()
+
+
+def scrape(tasks, source_factory, workers=4, tasks_dir=TASKS_DIR):
+    """
+    Runs the (comuna, site) tasks with a pool of workers, each one with its own page source.
+
+    A worker whose task raises (e.g. the browser crashed) closes its source, opens a new one and continues with
+    the next task; the failed task is retried on the next run.
+
+    Parameters:
+    -----------
+    tasks : list of tuple
+        `(comuna, site)` searches.
+    source_factory : callable
+        Returns a new `PageSource`. Called once per worker.
+    workers : int
+        Number of tasks scraped at the same time.
+
+    Returns:
+    --------
+    dict
+        Places scraped by task, or the error of the tasks that failed.
+    """
+    pending = queue.Queue()
+    for task in tasks:
+        pending.put(task)
+    results = {}
+    lock = threading.Lock()
+
+    def worker():
+        source = source_factory()
+        try:
+            while True:
+                try:
+                    comuna, site = pending.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    result = run_task(source, comuna, site, tasks_dir)
+                except Exception as e:
+                    result = e
+                    source.close()
+                    source = source_factory()
+                with lock:
+                    results[(comuna, site)] = result
+                print(f"{comuna} {site}: {result}")
+        finally:
+            source.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(max(1, min(workers, len(tasks))))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def collect(tasks_dir=TASKS_DIR, output_dir=OUTPUT_DIR):
+    """
+    Writes the places of every task checkpoint as `places_scraper_<task>.csv`, with the columns of the notebook.
+
+    Files whose content did not change are not rewritten, and tasks without places get no file.
+
+    Returns:
+    --------
+    int
+        Number of places of every task.
+    """
+    total = 0
+    for name in sorted(os.listdir(tasks_dir)) if os.path.isdir(tasks_dir) else []:
+        if not name.endswith(".jsonl"):
+            continue
+        checkpoint = JsonlCheckpoint(os.path.join(tasks_dir, name))
+        rows = [record["value"] for key, record in checkpoint.load().items()
+                if key not in (SEARCH_KEY, DONE_KEY) and record["status"] == "ok"]
+        if not rows:
+            continue
+        total += len(rows)
+        content = pd.DataFrame(rows, columns=COLUMNS).to_csv()
+        path = os.path.join(output_dir, f"{OUTPUT_PREFIX}{os.path.splitext(name)[0]}.csv")
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8", newline="") as file:
+                if file.read() == content:
+                    continue
+        with open(path, "w", encoding="utf-8", newline="") as file:
+            file.write(content)
+    return total
+
+
+if __name__ == "__main__":
+    # Las opciones se definen en cli.py, el punto de entrada común
+    import cli
+    cli.main(["scrape", *sys.argv[1:]])
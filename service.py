@@ -0,0 +1,261 @@
+"""
+Resident HTTP service for the whole GoVibes flow: profile questions -> recommended POIs -> route.
+
+Running `user_context.py`, `query.py` and `route_recommender.py` as separate processes pays the interpreter,
+pandas, chromadb and boto3 start-up on every step, opens new connections every time and passes the results through
+`profile.txt` and `top3_places.csv`. This service loads everything once and answers JSON:
+
+- The Chroma collection (or the NumPy index), the lexical and spatial indexes, the embedding model, the question
+  tree, the Bedrock client and the Directions HTTP session are created at start-up and shared by every request.
+- The blocking work, including the JSON encoding of the responses, runs in a thread pool, so the event loop only
+  parses requests and writes bytes.
+- Identical requests that arrive while the first one is still running wait for its result instead of doing the
+  same work again (see `SingleFlight`).
+
+Endpoints:
+----------
+- `GET /health`: Liveness check.
+- `POST /profile/question`: `{"compania": "familia", "selections": [...]}`. Returns the next question of the
+  onboarding conversation and its options, or the final `profile` once the 3 selections are given.
+- `POST /recommendations`: `{"profile": "...", "near": [lat, lon], "radius_km": 2.0}`. Returns the top 3 POIs per
+  comuna, as in `top3_places.csv`.
+- `POST /route`: `{"pois": [{"name": ..., "latitude": ..., "longitude": ...}], "stops": 3}`. Returns the POIs in
+  visiting order and the summary of every leg.
+- `POST /plan`: Recommendations and route of a profile in a single request.
+
+Environment variables:
+----------------------
+- `SERVICE_THREADS`: Threads for the blocking work (default 16).
+- The variables of the scripts it serves (`VECTOR_BACKEND`, `DB_HOST`, `DB_PORT`, `BEDROCK_ENDPOINT_URL`,
+  `DIRECTIONS_URL`, `GOOGLE_MAPS_API_KEY`...).
+
+Example usage:
+--------------
+    python service.py --port 8000
+    curl -X POST localhost:8000/plan -H 'Content-Type: application/json' \\
+         -d '{"profile": "Soy un turista que viaja con ... familia. Museos"}'
+
+The state lives in the process, so scale with more instances behind a load balancer rather than with uvicorn
+workers inside one instance.
+"""
+
+import sys
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import List, Optional
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException, Response
+from pydantic import BaseModel, Field
+
+import query
+import route_recommender
+import user_context
+
+
+DEFAULT_THREADS = 16
+
+
+class SingleFlight:
+    """
+    Runs a blocking call once for all the concurrent requests with the same key.
+
+    The first request for a key starts the call in the thread pool; the ones that arrive before it finishes await
+    the same future. The key is forgotten as soon as the call finishes, so nothing is cached across requests.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self.merged = 0
+
+    async def run(self, key, func, *args, **kwargs):
+        future = self._inflight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(None, partial(func, *args, **kwargs))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.merged += 1
+        # Si un cliente se desconecta, la llamada sigue para los demás que la esperan
+        return await asyncio.shield(future)
+
+
+class QuestionRequest(BaseModel):
+    compania: str = Field(description="Companion of the tourist: familia, amigos, pareja or solo (or 1-4)")
+    selections: List[str] = Field(default_factory=list, description="Options chosen so far, in order")
+
+
+class RecommendationRequest(BaseModel):
+    profile: str
+    near: Optional[List[float]] = Field(default=None, min_length=2, max_length=2, description="[lat, lon]")
+    radius_km: float = Field(default=2.0, gt=0)
+
+
+class Stop(BaseModel, extra="allow"):
+    name: str
+    latitude: float
+    longitude: float
+
+
+class RouteRequest(BaseModel):
+    pois: List[Stop]
+    stops: int = Field(default=3, ge=1)
+    mode: str = "transit"
+
+
+class PlanRequest(RecommendationRequest):
+    stops: int = Field(default=3, ge=1)
+    mode: str = "transit"
+
+
+def request_key(endpoint, request):
+    return endpoint + json.dumps(request.model_dump(), sort_keys=True, ensure_ascii=False)
+
+
+def frame_records(df):
+    """
+    Returns the rows of a DataFrame as dicts of plain Python values (missing values stay NaN and are encoded as null).
+    """
+    columns = [str(column) for column in df.columns]
+    return [dict(zip(columns, row)) for row in zip(*(df[column].tolist() for column in df.columns))]
+
+
+def to_json(payload):
+    # orjson y pandas se importan al atender la primera solicitud, no al importar el módulo
+    import orjson
+    return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def warm_up():
+    """
+    Creates every client and index used by the endpoints, so the first request does not pay for them.
+    """
+    load_dotenv()
+    query.get_collection()
+    query.get_lexical_index()
+    query.get_spatial_index()
+    query.get_embedder().embed([user_context.CONTEXTO_INICIAL])
+    user_context.get_bedrock()
+    return user_context.load_question_tree()
+
+
+def next_question(tree, compania, selections):
+    compania = user_context.DICT_COMPANIA.get(compania, compania)
+    if compania not in user_context.DICT_COMPANIA.values():
+        raise HTTPException(status_code=422, detail=f"Compañía desconocida: {compania}")
+    if len(selections) > user_context.ITERACIONES:
+        raise HTTPException(status_code=422, detail=f"Se esperan como máximo {user_context.ITERACIONES} selecciones")
+
+    contexto = f"{user_context.CONTEXTO_INICIAL} {compania}"
+    for selection in selections:
+        contexto = f"{contexto}. {selection}"
+    if len(selections) == user_context.ITERACIONES:
+        return to_json({"profile": contexto})
+
+    response = user_context.ask(contexto, tree)
+    return to_json({
+        "contexto": contexto,
+        "iteration": len(selections) + 1,
+        "question": response,
+        "options": user_context.extract_options(response),
+    })
+
+
+def recommend(profile, near, radius_km):
+    df = query.recommend(profile, near=tuple(near) if near else None, radius_km=radius_km)
+    if df is None:
+        raise HTTPException(status_code=404, detail=f"No hay POIs a menos de {radius_km} km de {near}")
+    return df
+
+
+def recommendations_payload(profile, near, radius_km):
+    return to_json({"pois": frame_records(recommend(profile, near, radius_km))})
+
+
+def route(pois, stops, mode):
+    import pandas as pd
+
+    df, results = route_recommender.plan_route(
+        pd.DataFrame(pois), os.getenv("GOOGLE_MAPS_API_KEY"), stops=stops, mode=mode
+    )
+    names = df["name"].tolist()
+    return {
+        "stops": frame_records(df),
+        "legs": [
+            {"from": origin, "to": destination, **route_recommender.summarize_leg(result)}
+            for origin, destination, result in zip(names[:-1], names[1:], results)
+        ],
+    }
+
+
+def route_payload(pois, stops, mode):
+    return to_json(route(pois, stops, mode))
+
+
+def plan_payload(profile, near, radius_km, stops, mode):
+    df = recommend(profile, near, radius_km)
+    return to_json({"pois": frame_records(df), "route": route(df, stops, mode)})
+
+
+@asynccontextmanager
+async def lifespan(app):
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=int(os.getenv("SERVICE_THREADS", DEFAULT_THREADS)))
+    loop.set_default_executor(executor)
+    app.state.tree = await loop.run_in_executor(None, warm_up)
+    app.state.flights = SingleFlight()
+    yield
+    executor.shutdown(wait=False)
+
+
+app = FastAPI(title="GoVibes", lifespan=lifespan)
+
+
+async def respond(key, func, *args):
+    content = await app.state.flights.run(key, func, *args)
+    return Response(content, media_type="application/json")
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "merged_requests": app.state.flights.merged}
+
+
+@app.post("/profile/question")
+async def profile_question(request: QuestionRequest):
+    return await respond(
+        request_key("question", request), next_question, app.state.tree, request.compania, request.selections
+    )
+
+
+@app.post("/recommendations")
+async def recommendations(request: RecommendationRequest):
+    return await respond(
+        request_key("recommendations", request), recommendations_payload,
+        request.profile, request.near, request.radius_km,
+    )
+
+
+@app.post("/route")
+async def route_endpoint(request: RouteRequest):
+    pois = [poi.model_dump() for poi in request.pois]
+    return await respond(request_key("route", request), route_payload, pois, request.stops, request.mode)
+
+
+@app.post("/plan")
+async def plan_endpoint(request: PlanRequest):
+    return await respond(
+        request_key("plan", request), plan_payload,
+        request.profile, request.near, request.radius_km, request.stops, request.mode,
+    )
+
+
+if __name__ == "__main__":
+    # Las opciones se definen en cli.py, el punto de entrada común
+    import cli
+    cli.main(["serve", *sys.argv[1:]])
@@ -0,0 +1,85 @@
+"""
+Spatial index over the POIs for "within R km" and "k nearest" lookups.
+
+The latitude and longitude of every POI are stored in a scikit-learn `BallTree` with the haversine metric, built
+once from the ingested metadata. Radius and nearest-neighbour queries then take microseconds, which lets
+`query.py` pre-filter candidate ids by proximity before the vector scoring.
+
+Example usage:
+--------------
+    spatial = SpatialIndex.from_metadatas(index.ids, index.metadatas)
+    ids = spatial.within(6.2442, -75.5812, radius_km=1.5)
+    ids, distances_km = spatial.nearest(6.2442, -75.5812, k=5)
+"""
+
+import numpy as np
+
+
+EARTH_RADIUS_KM = 6371.0
+
+
+class SpatialIndex:
+    """
+    BallTree (haversine) over POI coordinates.
+
+    Parameters:
+    -----------
+    ids : list of str
+        Id of every POI.
+    latitudes, longitudes : array-like
+        Coordinates of every POI in degrees.
+    """
+
+    def __init__(self, ids, latitudes, longitudes):
+        self.ids = np.asarray(ids, dtype=object)
+        coords = np.column_stack([
+            np.asarray(latitudes, dtype=np.float64),
+            np.asarray(longitudes, dtype=np.float64),
+        ])
+        # Los POIs sin coordenadas no pueden aparecer en búsquedas por cercanía
+        valid = np.isfinite(coords).all(axis=1)
+        # scikit-learn se importa al construir el índice, no al importar el módulo
+        from sklearn.neighbors import BallTree
+        self._rows = np.nonzero(valid)[0]
+        self._tree = BallTree(np.radians(coords[valid]), metric="haversine") if valid.any() else None
+
+    @classmethod
+    def from_metadatas(cls, ids, metadatas):
+        """
+        Builds the index from POI metadata with "latitude" and "longitude" fields.
+        """
+        def coordinate(metadata, field):
+            value = metadata.get(field)
+            return np.nan if value is None or value == "" else float(value)
+
+        return cls(
+            ids,
+            [coordinate(metadata, "latitude") for metadata in metadatas],
+            [coordinate(metadata, "longitude") for metadata in metadatas],
+        )
+
+    def within_rows(self, lat, lon, radius_km):
+        """
+        Returns the row positions of the POIs at most `radius_km` away from (lat, lon).
+        """
+        if self._tree is None:
+            return np.zeros(0, dtype=np.int64)
+        point = np.radians([[lat, lon]])
+        found = self._tree.query_radius(point, r=radius_km / EARTH_RADIUS_KM)[0]
+        return np.sort(self._rows[found])
+
+    def within(self, lat, lon, radius_km):
+        """
+        Returns the ids of the POIs at most `radius_km` away from (lat, lon).
+        """
+        return self.ids[self.within_rows(lat, lon, radius_km)].tolist()
+
+    def nearest(self, lat, lon, k=10):
+        """
+        Returns the ids of the `k` POIs closest to (lat, lon) and their distances in kilometres.
+        """
+        if self._tree is None:
+            return [], []
+        k = min(k, len(self._rows))
+        distances, found = self._tree.query(np.radians([[lat, lon]]), k=k)
+        return self.ids[self._rows[found[0]]].tolist(), (distances[0] * EARTH_RADIUS_KM).tolist()
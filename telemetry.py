@@ -0,0 +1,191 @@
+"""
+OpenTelemetry tracing and metrics for the hot paths of GoVibes.
+
+Spans are opened around the calls where a slow recommendation can spend its time: `invoke_claude` (with one child
+span per Bedrock attempt, the wait on the rate limiter and the backoff sleeps), `collection.query`, the pandas
+post-processing of `query.py` and `get_transit_directions`. Counters record retries, throttles, cache hits and
+misses and the tokens reported by Bedrock; histograms record the latency of every instrumented call.
+
+The exporter is chosen with `TELEMETRY_EXPORTER`:
+
+- `none` (default): nothing is configured. `span`, `count` and `record` return right away, so the instrumentation
+  costs a function call and an `if` per call site.
+- `console`: spans and metrics are printed to stdout.
+- `file`: spans and metrics are appended as JSON lines to `TELEMETRY_FILE` (default
+  `./data/output/telemetry/telemetry.jsonl`).
+- `otlp`: spans and metrics are sent over gRPC to the collector of `OTEL_EXPORTER_OTLP_ENDPOINT`.
+
+Spans keep every attribute they are given, but metrics are only labeled with the attributes in `METRIC_LABELS`, a
+small fixed set of low-cardinality values. Per-call values such as the number of rows or texts of a call stay on
+the span: as labels they would create a new time series for every distinct count.
+
+The SDK is only imported when an exporter is enabled. The service name is `govibes` unless `OTEL_SERVICE_NAME` is
+set, and metrics are exported every `TELEMETRY_METRICS_INTERVAL` milliseconds (default 10000) and at exit.
+
+Example usage:
+--------------
+    with telemetry.span("bedrock.invoke_model", histogram="govibes.bedrock.duration", attempt=attempt):
+        response = bedrock.invoke_model(...)
+    telemetry.count("govibes.llm.retries", model=MODEL_ID)
+"""
+
+import os
+import threading
+import time
+
+
+DEFAULT_FILE = "./data/output/telemetry/telemetry.jsonl"
+
+# Únicos atributos que se usan como etiquetas de las métricas; los demás solo van en los spans
+METRIC_LABELS = ("model", "cache", "mode", "direction")
+
+_lock = threading.Lock()
+_configured = False
+_enabled = False
+_tracer = None
+_meter = None
+_instruments = {}
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set_attribute(self, key, value):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _configure():
+    global _configured, _enabled, _tracer, _meter
+    with _lock:
+        if _configured:
+            return
+        _configured = True
+        exporter = os.getenv("TELEMETRY_EXPORTER", "none").lower()
+        if exporter in ("", "none", "off"):
+            return
+
+        from opentelemetry import metrics, trace
+        from opentelemetry.sdk.metrics import MeterProvider
+        from opentelemetry.sdk.metrics.export import ConsoleMetricExporter, PeriodicExportingMetricReader
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+        if exporter == "console":
+            span_exporter, metric_exporter = ConsoleSpanExporter(), ConsoleMetricExporter()
+        elif exporter == "file":
+            path = os.getenv("TELEMETRY_FILE", DEFAULT_FILE)
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            out = open(path, "a", encoding="utf-8")
+            span_exporter = ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+            metric_exporter = ConsoleMetricExporter(
+                out=out, formatter=lambda data: data.to_json(indent=None) + "\n"
+            )
+        elif exporter == "otlp":
+            from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import OTLPMetricExporter
+            from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+            span_exporter, metric_exporter = OTLPSpanExporter(), OTLPMetricExporter()
+        else:
+            raise ValueError(f"Unknown TELEMETRY_EXPORTER: {exporter}")
+
+        resource = Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", "govibes")})
+        tracer_provider = TracerProvider(resource=resource)
+        tracer_provider.add_span_processor(BatchSpanProcessor(span_exporter))
+        reader = PeriodicExportingMetricReader(
+            metric_exporter, export_interval_millis=int(os.getenv("TELEMETRY_METRICS_INTERVAL", 10000))
+        )
+        trace.set_tracer_provider(tracer_provider)
+        metrics.set_meter_provider(MeterProvider(resource=resource, metric_readers=[reader]))
+
+        _tracer = trace.get_tracer("govibes")
+        _meter = metrics.get_meter("govibes")
+        _enabled = True
+
+
+def enabled():
+    if not _configured:
+        _configure()
+    return _enabled
+
+
+def _instrument(kind, name):
+    instrument = _instruments.get(name)
+    if instrument is None:
+        with _lock:
+            instrument = _instruments.get(name)
+            if instrument is None:
+                if kind == "counter":
+                    instrument = _meter.create_counter(name)
+                else:
+                    instrument = _meter.create_histogram(name, unit="ms")
+                _instruments[name] = instrument
+    return instrument
+
+
+def _labels(attributes):
+    return {key: value for key, value in attributes.items() if key in METRIC_LABELS}
+
+
+def count(name, value=1, **attributes):
+    """
+    Adds `value` to the counter `name`, labeled with the attributes in `METRIC_LABELS`.
+    """
+    if enabled():
+        _instrument("counter", name).add(value, _labels(attributes))
+
+
+def record(name, value, **attributes):
+    """
+    Records `value` (in milliseconds) in the histogram `name`, labeled with the attributes in `METRIC_LABELS`.
+    """
+    if enabled():
+        _instrument("histogram", name).record(value, _labels(attributes))
+
+
+class _Span:
+    def __init__(self, name, histogram, attributes):
+        self.name = name
+        self.histogram = histogram
+        self.attributes = attributes
+
+    def __enter__(self):
+        self._context = _tracer.start_as_current_span(self.name, attributes=self.attributes)
+        self._span = self._context.__enter__()
+        self._start = time.perf_counter()
+        return self._span
+
+    def __exit__(self, *exc_info):
+        if self.histogram:
+            record(self.histogram, (time.perf_counter() - self._start) * 1000, **self.attributes)
+        return self._context.__exit__(*exc_info)
+
+
+def span(name, histogram=None, **attributes):
+    """
+    Returns a context manager that traces a block as the span `name` and, if given, records its duration in the
+    histogram `histogram`, labeled with the attributes in `METRIC_LABELS`; the other attributes are only set on the
+    span. Exceptions raised inside are recorded on the span.
+    """
+    if not enabled():
+        return _NOOP_SPAN
+    return _Span(name, histogram, attributes)
+
+
+def count_bedrock_tokens(response, model):
+    """
+    Counts the input and output tokens that Bedrock reports in the headers of an `invoke_model` response.
+    """
+    if not enabled():
+        return
+    headers = response.get("ResponseMetadata", {}).get("HTTPHeaders", {})
+    for direction in ("input", "output"):
+        tokens = headers.get(f"x-amzn-bedrock-{direction}-token-count")
+        if tokens is not None:
+            count("govibes.llm.tokens", int(tokens), model=model, direction=direction)
@@ -0,0 +1,41 @@
+"""
+Prompt templates of `./data/input/templates`, read from disk once per process.
+
+`pois_augmentation.py` and `user_context.py` used to open their templates at import time, so importing them (or
+asking the CLI for `--help`) touched the disk even when no prompt was built. Templates are now read the first time
+they are used and kept in memory; `fingerprint` hashes a group of templates so a change in any of them invalidates
+what was generated with the old text.
+
+Environment variables:
+----------------------
+- `TEMPLATES_DIR`: Directory of the templates (default `./data/input/templates`).
+
+Example usage:
+--------------
+    prompt = templates.load("user_context/prompt_template.txt").format(contexto=contexto)
+"""
+
+import hashlib
+import os
+from functools import lru_cache
+
+
+DEFAULT_DIR = "./data/input/templates"
+
+
+@lru_cache(maxsize=None)
+def load(name):
+    """
+    Returns the text of the template `name` (a path relative to `TEMPLATES_DIR`).
+    """
+    path = os.path.join(os.getenv("TEMPLATES_DIR", DEFAULT_DIR), name)
+    with open(path, 'r', encoding='utf-8') as file:
+        return file.read()
+
+
+@lru_cache(maxsize=None)
+def fingerprint(*names):
+    """
+    Returns the SHA-256 of the content of the templates `names`, in order.
+    """
+    return hashlib.sha256("\0".join(load(name) for name in names).encode('utf-8')).hexdigest()
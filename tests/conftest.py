@@ -0,0 +1,57 @@
+"""
+Shared setup of the test suite.
+
+The modules of GoVibes live at the root of the repository and read their inputs from paths relative to the working
+directory, so the root is put on `sys.path` and the templates are always read from the repository, wherever
+`pytest` is run from.
+"""
+
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("TEMPLATES_DIR", os.path.join(ROOT, "data", "input", "templates"))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """
+    Runs the test inside an empty directory, so the `./data/...` paths of the modules never touch the repository.
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "cache" / "completions.sqlite"))
+    return tmp_path
+
+
+@pytest.fixture
+def embedder(workdir):
+    """
+    Embedder backed by the hashing encoder of `benchmark.py` instead of the sentence-transformers model.
+    """
+    from benchmark import HashingEncoder
+    from embeddings import Embedder
+
+    embedder = Embedder()
+    embedder._model = HashingEncoder()
+    return embedder
+
+
+@pytest.fixture
+def template_dir(workdir, monkeypatch):
+    """
+    Editable copy of the templates, read instead of the ones of the repository.
+    """
+    import templates
+
+    path = workdir / "templates"
+    shutil.copytree(os.environ["TEMPLATES_DIR"], path)
+    monkeypatch.setenv("TEMPLATES_DIR", str(path))
+    templates.load.cache_clear()
+    templates.fingerprint.cache_clear()
+    yield path
+    templates.load.cache_clear()
+    templates.fingerprint.cache_clear()
@@ -0,0 +1,66 @@
+import json
+
+from checkpoint import JsonlCheckpoint
+
+
+def lines(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_torn_last_line_is_truncated_and_appends_continue(workdir):
+    path = workdir / "checkpoint.jsonl"
+    checkpoint = JsonlCheckpoint(str(path))
+    checkpoint.append(0, "ok", {"name": "Museo A"})
+    checkpoint.append(1, "failed")
+    checkpoint.close()
+    # Una interrupción deja la última línea a medias
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"key": 2, "status": "ok", "val')
+
+    checkpoint = JsonlCheckpoint(str(path))
+    records = checkpoint.load()
+
+    assert set(records) == {0, 1}
+    assert checkpoint.completed_keys() == {0}
+    assert path.read_text(encoding="utf-8").endswith("\n")
+
+    checkpoint.append(2, "ok", {"name": "Parque B"})
+    checkpoint.append(1, "ok", {"name": "Bar C"})
+    checkpoint.close()
+
+    assert [record["key"] for record in lines(path)] == [0, 1, 2, 1]
+    reloaded = JsonlCheckpoint(str(path)).load()
+    assert reloaded.keys() == {0, 1, 2}
+    assert reloaded[1]["value"] == {"name": "Bar C"}
+
+
+def test_unparseable_lines_are_ignored(workdir):
+    path = workdir / "checkpoint.jsonl"
+    path.write_text('{"key": 0, "status": "ok", "value": 1}\nnot json\n', encoding="utf-8")
+
+    assert JsonlCheckpoint(str(path)).load().keys() == {0}
+
+
+def test_discard_is_persisted_by_compact(workdir):
+    path = workdir / "checkpoint.jsonl"
+    checkpoint = JsonlCheckpoint(str(path))
+    for key in range(3):
+        checkpoint.append(key, "ok", key, fingerprint=f"f{key}")
+    checkpoint.append(0, "ok", 10, fingerprint="f0")
+
+    checkpoint.discard([1, 5])
+
+    assert checkpoint.completed_keys() == {0, 2}
+    # Hasta compactar, el archivo conserva los registros descartados
+    assert JsonlCheckpoint(str(path)).load().keys() == {0, 1, 2}
+
+    checkpoint.compact()
+
+    assert lines(path) == [
+        {"key": 0, "status": "ok", "value": 10, "fingerprint": "f0"},
+        {"key": 2, "status": "ok", "value": 2, "fingerprint": "f2"},
+    ]
+    checkpoint.append(3, "ok", 3)
+    checkpoint.close()
+    assert JsonlCheckpoint(str(path)).load().keys() == {0, 2, 3}
@@ -0,0 +1,70 @@
+import os
+
+import pandas as pd
+
+import cleaning
+from poi_store import PLACES_STORE_PATH, load_places
+
+
+def scrape(path, rows):
+    columns = ["name", "score", "c_score", "search_parameters", "lat", "lon"]
+    pd.DataFrame(rows, columns=columns).to_csv(path)
+
+
+def test_main_cleans_new_scrape_files_and_refreshes_the_store(workdir, capsys):
+    os.makedirs(cleaning.PLACES_DIR)
+    scrape(os.path.join(cleaning.PLACES_DIR, "places_1.csv"), [
+        ("Parque Explora", 4.7, 5321, "Comuna Aranjuez Parques", 6.2706, -75.5654),
+        ("Parque Explora", 4.6, 120, "Comuna Aranjuez Parques", 6.27061, -75.56541),
+        ("Ludoteca Infantil", 4.8, 90, "Comuna Aranjuez Parques", 6.2710, -75.5660),
+        ("Hotel Nutibara", 4.5, 800, "Comuna Candelaria Hoteles", 6.2500, -75.5680),
+        ("Café sin reseñas", 5.0, 3, "Comuna Candelaria Cafés", 6.2510, -75.5690),
+    ])
+
+    cleaning.main(export_csv=True)
+
+    places = load_places(PLACES_STORE_PATH)
+    assert places["name"].tolist() == ["Parque Explora"]
+    assert places["c_score"].tolist() == [5321]
+    assert places["Comuna"].tolist() == ["Aranjuez"]
+    exported = pd.read_csv(os.path.join(cleaning.PLACES_DIR, "final_places.csv"), index_col=0)
+    assert exported["name"].tolist() == ["Parque Explora"]
+
+    # Sin archivos nuevos el almacén no se vuelve a escribir
+    schema = os.path.join(PLACES_STORE_PATH, "schema.json")
+    written = os.stat(schema).st_mtime_ns
+    capsys.readouterr()
+    cleaning.main()
+    assert "No new scrape files" in capsys.readouterr().out
+    assert os.stat(schema).st_mtime_ns == written
+
+
+def test_changed_file_replaces_its_part(workdir):
+    os.makedirs(cleaning.PLACES_DIR)
+    first = os.path.join(cleaning.PLACES_DIR, "places_1.csv")
+    second = os.path.join(cleaning.PLACES_DIR, "places_2.csv")
+    scrape(first, [
+        ("Parque Explora", 4.7, 5321, "Comuna Aranjuez Parques", 6.2706, -75.5654),
+        ("Jardín Botánico", 4.8, 9000, "Comuna Aranjuez Jardines", 6.2710, -75.5640),
+    ])
+    scrape(second, [("Parque Explora", 4.6, 6000, "Comuna Aranjuez Parques", 6.2706, -75.5654)])
+    cleaning.update()
+    ids = load_ids()
+
+    # El jardín se borra del primer archivo y el parque cambia, pero el segundo archivo sigue ganando
+    scrape(first, [
+        ("Parque Explora", 4.9, 7000, "Comuna Aranjuez Parques", 6.2706, -75.5654),
+        ("Museo de Antioquia", 4.7, 8000, "Comuna Candelaria Museos", 6.2520, -75.5690),
+    ])
+    assert len(cleaning.update()) == 1
+
+    df = cleaning.load_final_places()
+    assert sorted(df["name"]) == ["Museo de Antioquia", "Parque Explora"]
+    assert df.set_index("name").loc["Parque Explora", "c_score"] == 6000
+    assert load_ids()["Parque Explora"] == ids["Parque Explora"]
+    assert len(cleaning.load_manifest()["parts"]) == 2
+
+
+def load_ids():
+    df = cleaning.load_final_places()
+    return dict(zip(df["name"], df.index))
@@ -0,0 +1,32 @@
+import dedup
+
+PRESIDENTA = ("El Parque Lineal La Presidenta es un corredor verde junto a la quebrada, con senderos arborizados, "
+              "zonas de descanso y juegos para niños en El Poblado.")
+PRESIDENTA_PARAPHRASE = ("El Parque de La Presidenta es un corredor verde a lo largo de la quebrada, con senderos "
+                         "arborizados, zonas de descanso y juegos infantiles en El Poblado.")
+BAR = "Bar de barrio con cerveza fria, musica en vivo los fines de semana y mesas en la acera."
+
+
+def poi(name, description, latitude, longitude, rating=4.0):
+    return {"description": description, "data": {"name": name, "latitude": latitude, "longitude": longitude,
+                                                  "rating bayesian": rating}}
+
+
+def test_names_without_tokens_or_with_different_numbers_do_not_match():
+    assert dedup.name_similarity("La 70", "El 33") == 0.0
+    assert dedup.name_similarity("La", "El") == 0.0
+    assert dedup.name_similarity("Bar 70", "Bar 80") < dedup.DEFAULT_NAME_THRESHOLD
+    assert dedup.name_similarity("Museos de Medellín", "Museo de Medellín") == 1.0
+
+
+def test_clones_are_merged_but_numbered_places_nearby_are_not():
+    pois = [
+        ("presidenta-1", poi("Parque Lineal La Presidenta", PRESIDENTA, 6.20951, -75.56760, rating=4.5)),
+        ("presidenta-2", poi("Parque De La Presidenta", PRESIDENTA_PARAPHRASE, 6.20960, -75.56772, rating=4.6)),
+        ("bar-70", poi("Bar 70", BAR, 6.25000, -75.59000)),
+        ("bar-80", poi("Bar 80", BAR, 6.25010, -75.59010)),
+        ("la-70", poi("La 70", BAR, 6.25020, -75.59020)),
+        ("el-33", poi("El 33", BAR, 6.25030, -75.59030)),
+    ]
+
+    assert dedup.find_duplicates(pois) == {"presidenta-1": "presidenta-2"}
@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+from ingest import iter_json_array
+
+ELEMENTS = [
+    12345, -1.5e10, 0.25, 7, "texto, con [corchetes]", True, None, False,
+    {"name": "Museo A", "rating bayesian": 4.25, "tags": [1, 22, 333]},
+    [3, 40, 500],
+]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 1 << 16])
+def test_elements_crossing_chunk_boundaries_are_decoded_whole(workdir, chunk_size):
+    path = workdir / "array.json"
+    path.write_text("\n  " + json.dumps(ELEMENTS, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+
+    assert list(iter_json_array(str(path), chunk_size=chunk_size)) == ELEMENTS
+
+
+def test_compact_numbers_are_not_split(workdir):
+    path = workdir / "array.json"
+    path.write_text("[123,4.5e-3,-67]", encoding="utf-8")
+
+    assert list(iter_json_array(str(path), chunk_size=1)) == [123, 4.5e-3, -67]
+
+
+def test_truncated_array_fails(workdir):
+    path = workdir / "array.json"
+    path.write_text('[{"name": "Museo A"}, 12', encoding="utf-8")
+
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_array(str(path), chunk_size=1))
+
+
+def test_file_without_an_array_fails(workdir):
+    path = workdir / "object.json"
+    path.write_text('  {"name": "Museo A"}', encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        list(iter_json_array(str(path), chunk_size=1))
@@ -0,0 +1,33 @@
+import numpy as np
+
+from lexical_index import LexicalIndex, LexicalIndexBuilder
+
+POIS = {
+    "a": ("Museo de arte moderno con salas para niños.", {"categories": "Museo", "comuna": "Laureles"}),
+    "b": ("Parque con senderos y lago.", {"categories": "Parque", "comuna": "Laureles", "rating bayesian": 4.5}),
+    "c": ("Bar de cocteles y musica en vivo.", {"categories": "Bar", "comuna": "Poblado"}),
+}
+
+
+def columns(pois):
+    return list(pois), [document for document, _ in pois.values()], [metadata for _, metadata in pois.values()]
+
+
+def test_batches_with_repeated_ids_build_the_same_index():
+    builder = LexicalIndexBuilder()
+    builder.add(*columns({"a": ("Cine antiguo.", {"categories": "Cine", "comuna": "Poblado"}), "b": POIS["b"]}))
+    # El segundo lote reemplaza a "a", como lo haría un upsert en el vector store
+    builder.add(*columns({"a": POIS["a"], "c": POIS["c"]}))
+
+    batched = builder.build()
+    whole = LexicalIndex.build(*columns(POIS))
+
+    profile = "Me gustan los museos y la musica"
+    assert sorted(batched.ids) == sorted(whole.ids)
+    assert dict(zip(batched.ids, batched.scores(profile))) == dict(zip(whole.ids, whole.scores(profile)))
+    assert {comuna: {category: sorted(batched.ids[row] for row in rows) for category, rows in categories.items()}
+            for comuna, categories in batched.groups.items()} == {
+        "Laureles": {"museo": ["a"], "parque": ["b"]},
+        "Poblado": {"bar": ["c"]},
+    }
+    assert np.isclose(batched.ratings[batched.ids.index("b")], 4.5)
@@ -0,0 +1,75 @@
+import os
+
+import pipeline
+from pipeline import Stage
+
+# Copia la entrada en la salida, o falla si la entrada dice "fail"
+COPY = ("import sys; data = open('input.txt').read(); data == 'fail' and sys.exit(3); "
+        "open('output.txt', 'w').write(data); open('runs.txt', 'a').write('x')")
+
+
+def stages():
+    return [Stage(name="copy", command=["-c", COPY], inputs=["input.txt"], outputs=["output.txt"], deps=[], env=[])]
+
+
+def run():
+    return pipeline.run_pipeline(stages(), state_dir="state")["copy"]["status"]
+
+
+def write(path, text):
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(text)
+
+
+def runs():
+    with open("runs.txt", encoding="utf-8") as file:
+        return len(file.read())
+
+
+def test_unchanged_stage_is_skipped(workdir):
+    write("input.txt", "a")
+
+    assert run() == "ran"
+    assert run() == "skipped"
+    assert runs() == 1
+
+
+def test_stage_runs_again_when_an_input_changes(workdir):
+    write("input.txt", "a")
+    run()
+
+    write("input.txt", "bb")
+
+    assert run() == "ran"
+    assert runs() == 2
+
+
+def test_stage_runs_again_when_an_output_is_missing(workdir):
+    write("input.txt", "a")
+    run()
+
+    os.remove("output.txt")
+
+    assert run() == "ran"
+    assert os.path.exists("output.txt")
+
+
+def test_failed_stage_is_never_marked_done(workdir):
+    write("input.txt", "fail")
+
+    assert run() == "failed"
+    assert "copy" not in pipeline.load_state("state")["stages"]
+    # Ni siquiera con sus salidas de una ejecución anterior: la etapa se vuelve a ejecutar
+    write("output.txt", "old")
+    assert run() == "failed"
+
+
+def test_env_outputs_only_apply_with_their_value(workdir, monkeypatch):
+    ingest = next(stage for stage in pipeline.STAGES if stage.name == "ingest")
+    augment = next(stage for stage in pipeline.STAGES if stage.name == "augment")
+
+    monkeypatch.setenv("VECTOR_BACKEND", "numpy")
+    assert "./data/output/vector_index" in pipeline.stage_outputs(ingest)
+    monkeypatch.setenv("VECTOR_BACKEND", "chroma")
+    assert "./data/output/vector_index" not in pipeline.stage_outputs(ingest)
+    assert "./data/output/places/final_places.csv" in augment.inputs
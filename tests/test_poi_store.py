@@ -0,0 +1,35 @@
+import pandas as pd
+
+import benchmark
+import pois_augmentation
+from ingest import poi_id
+from poi_store import (
+    PoiStore, has_exact_places, iter_augmented, load_places, write_augmented_store, write_places_store,
+)
+
+
+def test_places_store_keeps_the_fingerprints_of_the_csv(workdir):
+    df = benchmark.synthetic_places(50, seed=2)
+    df.to_csv("final_places.csv")
+    from_csv = pd.read_csv("final_places.csv", index_col=0)
+    write_places_store(from_csv, str(workdir / "final_places.store"))
+    from_store = load_places(str(workdir / "final_places.store"))
+    assert has_exact_places(str(workdir / "final_places.store"))
+
+    columns = ", ".join(from_csv.columns)
+    # Si cambiara la huella de alguna fila, la primera ejecución con el almacén volvería a aumentarla
+    assert [pois_augmentation.row_fingerprint(columns, row) for _, row in from_store.iterrows()] == \
+        [pois_augmentation.row_fingerprint(columns, row) for _, row in from_csv.iterrows()]
+    assert from_store[["lat", "lon", "bayesian_mean"]].equals(from_csv[["lat", "lon", "bayesian_mean"]])
+
+
+def test_augmented_store_keeps_coordinates_ratings_and_ids(workdir):
+    pois = benchmark.synthetic_pois(50, seed=2)
+    pois[0]["data"].update({"latitude": 6.295462, "longitude": -75.5485003, "rating bayesian": 4.43871})
+    write_augmented_store(pois, str(workdir / "augmented.store"))
+
+    stored = list(iter_augmented(PoiStore.load(str(workdir / "augmented.store"))))
+
+    assert [poi["data"] for _, poi in stored] == [poi["data"] for poi in pois]
+    assert [key for key, _ in stored] == [poi_id(poi["data"]) for poi in pois]
+    assert [key for key, poi in stored] == [poi_id(poi["data"]) for _, poi in stored]
@@ -0,0 +1,177 @@
+import functools
+import json
+import os
+
+import pandas as pd
+import pytest
+
+import pois_augmentation
+import templates
+from checkpoint import JsonlCheckpoint
+from completion_cache import CompletionCache
+from fake_bedrock import FakeBedrock, batch_rows, place_data
+from rate_limiter import TokenBucket
+
+
+def use_bedrock(server, monkeypatch):
+    """
+    Points the augmentation at a local Bedrock, with an empty completion cache.
+    """
+    monkeypatch.setenv("BEDROCK_ENDPOINT_URL", server.url)
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    monkeypatch.setattr(pois_augmentation, "_bedrock", None)
+    monkeypatch.setattr(pois_augmentation, "completion_cache", CompletionCache())
+    # Backoff de centésimas de segundo para que la prueba no espere segundos por cada throttling
+    monkeypatch.setattr(
+        pois_augmentation, "invoke_claude",
+        functools.partial(pois_augmentation.invoke_claude, initial_delay=0.01),
+    )
+    return server
+
+
+@pytest.fixture
+def bedrock(workdir, monkeypatch):
+    """
+    Local Bedrock that throttles a third of the requests.
+    """
+    with FakeBedrock(throttle_rate=0.3, latency=0.01, seed=0) as server:
+        yield use_bedrock(server, monkeypatch)
+
+
+def places(n):
+    return pd.DataFrame({
+        "name": [f"Lugar {i}" for i in range(n)],
+        "category": ["Parque"] * n,
+        "lat": [6.25 + i / 1000 for i in range(n)],
+        "lon": [-75.56] * n,
+        "Comuna": ["Laureles"] * n,
+    })
+
+
+def test_augment_rows_survives_throttling_and_caches_completions(bedrock):
+    df = places(12)
+    limiter = TokenBucket(rate=100, capacity=4)
+
+    results = dict(pois_augmentation.augment_rows(df, concurrency=4, limiter=limiter, retry_delay=0))
+
+    assert sorted(results) == list(df.index)
+    assert all(result is not None and result["description"] for result in results.values())
+    assert results[3]["data"] == {"name": "Lugar 3", "comuna": "Laureles", "categories": "parque", "latitude": 6.253,
+                                  "longitude": -75.56}
+    assert bedrock.throttled > 0
+    # Cada ThrottlingException frena el limitador compartido
+    assert limiter.throttle_count == bedrock.throttled
+    assert limiter.rate < 100
+
+    requests = bedrock.requests
+    again = dict(pois_augmentation.augment_rows(df, concurrency=4, limiter=limiter, retry_delay=0))
+
+    assert again == results
+    assert bedrock.requests == requests
+
+
+def place(row):
+    return {"id": row["id"], "description": f"{row['name']}.", "data": place_data(row)}
+
+
+def forgetful_responder():
+    """
+    Returns a batch responder that leaves out the last POI the first time it sees a prompt.
+    """
+    seen = set()
+
+    def responder(prompt):
+        rows = batch_rows(prompt)
+        if prompt not in seen:
+            seen.add(prompt)
+            rows = rows[:-1]
+        return json.dumps([place(row) for row in rows])
+
+    return responder
+
+
+def sloppy_responder():
+    """
+    Returns a batch responder whose first answer to a prompt leaves the comuna out of the data of every POI.
+    """
+    seen = set()
+
+    def responder(prompt):
+        elements = [place(row) for row in batch_rows(prompt)]
+        if prompt not in seen:
+            seen.add(prompt)
+            for element in elements:
+                del element["data"]["comuna"]
+        return json.dumps(elements)
+
+    return responder
+
+
+def test_incomplete_batch_response_is_not_served_from_cache(workdir, monkeypatch):
+    with FakeBedrock(responder=forgetful_responder()) as server:
+        use_bedrock(server, monkeypatch)
+        # Un solo POI: el reintento arma exactamente el mismo prompt que el intento fallido
+        results = dict(pois_augmentation.augment_batches(places(1), batch_size=10, max_attempts=3))
+
+    assert results == {0: {"description": "Lugar 0.", "data": {
+        "name": "Lugar 0", "comuna": "Laureles", "categories": "parque", "latitude": 6.25, "longitude": -75.56,
+    }}}
+    assert server.requests == 2
+
+
+def test_results_without_required_data_are_sent_again(workdir, monkeypatch):
+    with FakeBedrock(responder=sloppy_responder()) as server:
+        use_bedrock(server, monkeypatch)
+        results = dict(pois_augmentation.augment_batches(places(3), batch_size=10, max_attempts=3))
+
+    assert sorted(results) == [0, 1, 2]
+    assert all(result["data"]["comuna"] == "Laureles" for result in results.values())
+    assert server.requests == 2
+    assert not pois_augmentation.is_valid_result({"description": "Lugar 0.", "data": {}})
+
+
+def test_augment_command_fails_while_rows_are_still_failed(workdir, monkeypatch):
+    import cli
+
+    os.makedirs(os.path.dirname(pois_augmentation.PLACES_PATH))
+    os.makedirs(os.path.dirname(pois_augmentation.CHECKPOINT_PATH))
+    places(2).to_csv(pois_augmentation.PLACES_PATH)
+    monkeypatch.setattr(pois_augmentation, "augment_rows", lambda df, **kwargs: [(index, None) for index in df.index])
+
+    # Con filas fallidas la etapa termina con error, para que pipeline.py no la dé por terminada
+    with pytest.raises(SystemExit) as exit_info:
+        cli.main(["augment"])
+    assert exit_info.value.code
+
+
+def test_plan_delta_schedules_only_changed_rows_until_the_template_changes(template_dir):
+    df = places(4)
+    checkpoint = JsonlCheckpoint(str(template_dir.parent / "checkpoint.jsonl"))
+    pending, fingerprints, _ = pois_augmentation.plan_delta(df, checkpoint)
+    assert list(pending.index) == [0, 1, 2, 3]
+    for index in pending.index:
+        checkpoint.append(index, "ok", {"description": df.loc[index, "name"]}, fingerprint=fingerprints[index])
+
+    df.loc[2, "name"] = "Lugar nuevo"
+    pending, _, summary = pois_augmentation.plan_delta(df, checkpoint)
+
+    assert list(pending.index) == [2]
+    assert summary == {"unchanged": 3, "reused": 0, "pending": 1, "removed": 0}
+
+    # Una fila que solo cambió de posición reutiliza su descripción; una fila borrada se descarta
+    moved = df.drop(index=[0, 2]).rename(index={1: 0, 3: 1})
+    pending, _, summary = pois_augmentation.plan_delta(moved, checkpoint)
+
+    assert list(pending.index) == []
+    assert summary == {"unchanged": 0, "reused": 2, "pending": 0, "removed": 2}
+    assert checkpoint.records[0]["value"] == {"description": "Lugar 1"}
+
+    prompt = template_dir / "pois_augmentation" / "prompt_template.txt"
+    prompt.write_text(prompt.read_text(encoding="utf-8") + "\nResponde en español.", encoding="utf-8")
+    templates.load.cache_clear()
+    templates.fingerprint.cache_clear()
+    pending, _, summary = pois_augmentation.plan_delta(df, checkpoint)
+
+    assert list(pending.index) == [0, 1, 2, 3]
+    assert summary["pending"] == 4
@@ -0,0 +1,144 @@
+import zlib
+
+import numpy as np
+import pytest
+
+import benchmark
+import query
+from ingest import poi_id
+from lexical_index import LexicalIndex
+from vector_index import NumpyIndex, build_index, partition_bounds
+
+
+class CountingIndex:
+    """
+    Wraps a `NumpyIndex` and counts the calls to `query`.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.queries = 0
+
+    def query(self, **kwargs):
+        self.queries += 1
+        return self.index.query(**kwargs)
+
+
+def make_index(sizes, near=()):
+    """
+    Builds an index with `sizes[comuna]` POIs per comuna. The POIs of the comunas in `near` point at the profile
+    and the rest away from it.
+    """
+    metadatas = [{"comuna": comuna, "name": f"{comuna} {i}"} for comuna, size in sizes.items() for i in range(size)]
+    vectors = np.array([[1.0, 0.1] if metadata["comuna"] in near else [0.1, 1.0] for metadata in metadatas],
+                       dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [metadata["name"] for metadata in metadatas]
+    return NumpyIndex(vectors, ids, ids, metadatas, partition_bounds(metadatas))
+
+
+PROFILE = [[1.0, 0.0]]
+
+
+class DenseEncoder:
+    """
+    Encoder with a random dense vector per text, so no two POIs are ever at the same distance from a profile.
+    """
+
+    def encode(self, texts, **kwargs):
+        vectors = np.array([np.random.default_rng(zlib.crc32(text.encode())).normal(size=32) for text in texts])
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_small_comuna_with_all_its_pois_is_not_queried_again():
+    sizes = {"Popular": 3, "Robledo": 50}
+    index = CountingIndex(make_index(sizes, near={"Popular"}))
+
+    df = query.retrieve(index, PROFILE, list(sizes), n_results=10, overfetch=1, sizes=sizes)
+
+    assert index.queries == 1
+    assert df["comuna"].value_counts().to_dict() == {"Popular": 3, "Robledo": 10}
+
+
+def test_exhausted_query_is_not_repeated_without_sizes():
+    sizes = {"Popular": 3, "Robledo": 5}
+    index = CountingIndex(make_index(sizes))
+
+    df = query.retrieve(index, PROFILE, list(sizes), n_results=10, overfetch=1)
+
+    assert index.queries == 1
+    assert len(df) == 8
+
+
+def test_crowded_out_comuna_is_queried_again():
+    sizes = {"Popular": 30, "Robledo": 50}
+    index = CountingIndex(make_index(sizes, near={"Robledo"}))
+
+    df = query.retrieve(index, PROFILE, list(sizes), n_results=10, overfetch=1, sizes=sizes)
+
+    assert index.queries == 2
+    assert df["comuna"].value_counts().to_dict() == {"Robledo": 10, "Popular": 10}
+
+
+@pytest.fixture
+def recommender(workdir, embedder, monkeypatch):
+    """
+    Points `recommend` at an in-process index of 600 synthetic POIs, without the lexical index.
+    """
+    # Con el codificador de hashing hay empates de distancia y cada camino los desempata a su manera
+    embedder._model = DenseEncoder()
+    pois = {poi_id(poi["data"]): poi for poi in benchmark.synthetic_pois(600, seed=2)}
+    build_index(pois.items(), path=str(workdir / "vector_index"), embedder=embedder)
+    index = NumpyIndex.load(str(workdir / "vector_index"))
+    monkeypatch.setattr(query, "_collection", index)
+    monkeypatch.setattr(query, "_vector_index", index)
+    monkeypatch.setattr(query, "_embedder", embedder)
+    monkeypatch.setattr(query, "get_lexical_index", lambda: None)
+    return index
+
+
+PROFILES = dict(enumerate(benchmark.synthetic_profiles(8, seed=2)))
+
+
+def test_recommend_many_matches_recommend_for_every_profile(recommender, embedder, monkeypatch):
+    bulk = query.recommend_many(PROFILES, recommender, embedder=embedder, seed=5)
+
+    # recommend() sortea las comunas con random: se le dan las mismas que sorteó recommend_many con la semilla
+    names, chosen = query.sample_comunas_many(len(PROFILES), rng=np.random.default_rng(5))
+    draws = iter([[names[position] for position in row] for row in chosen])
+    monkeypatch.setattr(query, "sample_comunas", lambda k=3, among=None: next(draws))
+
+    for user, profile in PROFILES.items():
+        single = query.recommend(profile)
+        expected = bulk[bulk["user_id"] == user]
+        assert len(single) > 0
+        assert list(single["ids"]) == list(expected["ids"])
+
+
+def best_first(df, column, descending=False):
+    """
+    Returns whether the comunas of `df` are in alphabetical order and every comuna is sorted by `column`.
+    """
+    comunas = list(dict.fromkeys(df["comuna"]))
+    values = [list(group[column]) for _, group in df.groupby("comuna", sort=False)]
+    return comunas == sorted(comunas) and all(group == sorted(group, reverse=descending) for group in values)
+
+
+def test_every_path_returns_the_best_poi_of_each_comuna_first(recommender, embedder, monkeypatch):
+    profile = PROFILES[0]
+    distances = 1.0 - recommender.vectors @ embedder.embed([profile])[0]
+    nearest = {comuna: distances[start:end].min() for comuna, (start, end) in recommender.partitions.items()}
+
+    vector = query.recommend(profile)
+    assert best_first(vector, "distances")
+    for comuna, group in vector.groupby("comuna"):
+        assert group["distances"].iloc[0] == pytest.approx(nearest[comuna], abs=1e-6)
+
+    bulk = query.recommend_many(PROFILES, recommender, embedder=embedder, seed=5)
+    for _, rows in bulk.groupby("user_id"):
+        assert best_first(rows, "distances")
+        assert best_first(rows, "rank")
+
+    lexical = LexicalIndex.build(recommender.ids, list(recommender.documents), recommender.metadatas)
+    monkeypatch.setattr(query, "get_lexical_index", lambda: lexical)
+    assert best_first(query.recommend(profile), "score", descending=True)
@@ -0,0 +1,119 @@
+import itertools
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+import route_recommender
+from directions_cache import DirectionsCache
+from fake_directions import FakeDirections
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+POINTS = [(6.2442, -75.5812), (6.2518, -75.5636), (6.2308, -75.5906), (6.2675, -75.5688)]
+
+
+def test_cached_legs_are_not_requested_again(workdir, monkeypatch):
+    monkeypatch.setattr(route_recommender, "directions_cache", DirectionsCache(path=str(workdir / "directions.sqlite")))
+    with FakeDirections() as server:
+        monkeypatch.setattr(route_recommender, "BASE_URL", f"{server.url}/maps/api/directions/json")
+
+        legs = route_recommender.get_route_legs(POINTS, api_key="test")
+        assert server.requests == 3
+        assert all(leg["status"] == "OK" for leg in legs)
+
+        # Las coordenadas se redondean en la clave: un desplazamiento de centímetros es el mismo tramo
+        nudged = [(lat + 1e-7, lon - 1e-7) for lat, lon in POINTS]
+        again = route_recommender.get_route_legs(nudged, api_key="test")
+        assert server.requests == 3
+        assert again == legs
+
+        route_recommender.get_route_legs(POINTS[::-1], api_key="test")
+        assert server.requests == 6
+
+    assert route_recommender.directions_cache.hits == 3
+
+
+def random_points(n, seed):
+    rng = np.random.default_rng(seed)
+    return list(zip(rng.uniform(6.17, 6.34, size=n), rng.uniform(-75.64, -75.53, size=n)))
+
+
+def length(order, points):
+    distances = route_recommender.haversine_matrix(points)
+    return sum(distances[a, b] for a, b in zip(order[:-1], order[1:]))
+
+
+def brute_force(points, start=None, end=None):
+    orders = [list(order) for order in itertools.permutations(range(len(points)))
+              if (start is None or order[0] == start) and (end is None or order[-1] == end)]
+    return min(length(order, points) for order in orders)
+
+
+def test_haversine_matrix_matches_known_distances():
+    distances = route_recommender.haversine_matrix([(0.0, 0.0), (0.0, 1.0), (1.0, 0.0)])
+
+    assert np.allclose(distances, distances.T)
+    assert np.allclose(np.diag(distances), 0.0)
+    # Un grado sobre el ecuador (y sobre un meridiano) mide unos 111.19 km
+    assert distances[0, 1] == pytest.approx(111.195, abs=0.01)
+    assert distances[0, 2] == pytest.approx(111.195, abs=0.01)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_held_karp_finds_the_shortest_path(seed):
+    points = random_points(6, seed)
+
+    order = route_recommender.order_route(points)
+
+    assert sorted(order) == list(range(6))
+    assert length(order, points) == pytest.approx(brute_force(points))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_two_opt_is_never_worse_than_nearest_neighbour(seed):
+    points = random_points(12, seed)
+    distances = route_recommender.haversine_matrix(points)
+
+    order = route_recommender.order_route(points, exact_limit=0)
+
+    assert sorted(order) == list(range(12))
+    for start in range(12):
+        greedy, visited = [start], {start}
+        while len(greedy) < 12:
+            row = distances[greedy[-1]].copy()
+            row[list(visited)] = np.inf
+            greedy.append(int(np.argmin(row)))
+            visited.add(greedy[-1])
+        assert length(order, points) <= length(greedy, points) + 1e-9
+
+
+@pytest.mark.parametrize("exact_limit", [10, 0])
+def test_fixed_start_and_end_stops(exact_limit):
+    points = random_points(7, 42)
+
+    for start, end in [(3, None), (None, 5), (3, 5)]:
+        order = route_recommender.order_route(points, exact_limit=exact_limit, start=start, end=end)
+        assert sorted(order) == list(range(7))
+        assert start is None or order[0] == start
+        assert end is None or order[-1] == end
+        if exact_limit:
+            assert length(order, points) == pytest.approx(brute_force(points, start, end))
+
+
+def test_routes_of_zero_one_and_two_stops():
+    assert route_recommender.order_route([]) == []
+    assert route_recommender.order_route(POINTS[:1]) == [0]
+    assert route_recommender.order_route(POINTS[:2]) == [0, 1]
+    assert route_recommender.order_route(POINTS[:2], start=1) == [1, 0]
+    assert route_recommender.order_route(POINTS[:2], end=0) == [1, 0]
+    with pytest.raises(ValueError):
+        route_recommender.order_route(POINTS[:2], start=1, end=1)
+
+
+def test_import_loads_neither_requests_nor_numpy_nor_pandas():
+    code = "import sys, route_recommender; print(sorted({'requests', 'numpy', 'pandas'} & set(sys.modules)))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == "[]"
@@ -0,0 +1,110 @@
+import os
+
+import pandas as pd
+import pytest
+
+import scraper
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "maps")
+MEMORIA = "https://www.google.com/maps/place/Museo+Casa+de+la+Memoria/data=!4m7!3m6!1s0x8e4428f:0x1"
+BIBLIOTECA = "https://www.google.com/maps/place/Biblioteca+Parque+Espa%C3%B1a/data=!4m7!3m6!1s0x8e4428e:0x2"
+
+
+class Crash(BaseException):
+    """
+    Stands for the process dying (e.g. Chrome taking the interpreter down): not caught by `run_task`.
+    """
+
+
+class CountingSource(scraper.FixtureSource):
+    """
+    Fixture source that records the searches and places it serves, and can crash on a given place.
+    """
+
+    def __init__(self, directory, crash_on=None):
+        super().__init__(directory)
+        self.crash_on = crash_on
+        self.searches = []
+        self.places = []
+
+    def search(self, comuna, site):
+        self.searches.append((comuna, site))
+        return super().search(comuna, site)
+
+    def place(self, url):
+        if url == self.crash_on:
+            raise Crash(url)
+        self.places.append(url)
+        return super().place(url)
+
+
+def test_page_source_is_abstract():
+    with pytest.raises(TypeError):
+        scraper.PageSource()
+
+
+def test_parse_search_skips_sponsored_results():
+    html = scraper.FixtureSource(FIXTURES).search("Comuna Popular", "Museos")
+
+    assert scraper.parse_search(html) == [MEMORIA, BIBLIOTECA]
+
+
+def test_parse_place_extracts_every_column():
+    row = scraper.parse_place(scraper.FixtureSource(FIXTURES).place(MEMORIA), "Comuna Popular", "Museos")
+
+    assert row == {
+        "name": "Museo Casa de la Memoria",
+        "desc": "InformaciónAccesibilidad\n\ue5ca\nEntrada accesible para personas en silla de ruedas\n"
+                "Menores\n\ue5ca\nIdeal para ir con niños",
+        "score": 4.7,
+        "c_score": 5321.0,
+        "price": "Gratis",
+        "category": "Museo",
+        "accessibility": "Entrada accesible para personas en silla de ruedas",
+        "schedule": "9 a.m.,6 p.m.",
+        "web": "https://museocasadelamemoria.gov.co/",
+        "search_parameters": "Comuna Popular Museos",
+        "phone": "604 3834001 ",
+        "address": "Cl. 51 #36-66, La Candelaria, Medellín, Antioquia",
+        "lat": 6.2450938,
+        "lon": -75.5577455,
+    }
+
+
+def test_parse_place_leaves_missing_fields_empty():
+    row = scraper.parse_place(scraper.FixtureSource(FIXTURES).place(BIBLIOTECA), "Comuna Popular", "Museos")
+
+    assert row["name"] == "Biblioteca Parque España"
+    assert row["category"] == "Biblioteca"
+    assert all(row[column] is None for column in scraper.COLUMNS
+               if column not in ("name", "category", "search_parameters"))
+
+
+def test_run_task_resumes_after_a_crash(workdir):
+    tasks_dir = str(workdir / "tasks")
+
+    crashing = CountingSource(FIXTURES, crash_on=BIBLIOTECA)
+    with pytest.raises(Crash):
+        scraper.run_task(crashing, "Comuna Popular", "Museos", tasks_dir)
+    assert crashing.places == [MEMORIA]
+
+    # Al reanudar no se repite la búsqueda ni se abre otra vez el lugar ya extraído
+    resumed = CountingSource(FIXTURES)
+    assert scraper.run_task(resumed, "Comuna Popular", "Museos", tasks_dir) == 2
+    assert resumed.searches == []
+    assert resumed.places == [BIBLIOTECA]
+
+    finished = CountingSource(FIXTURES)
+    assert scraper.run_task(finished, "Comuna Popular", "Museos", tasks_dir) == 2
+    assert finished.searches == [] and finished.places == []
+
+    output_path = workdir / "places_scraper_Comuna_Popular_Museos.csv"
+    assert scraper.collect(tasks_dir, str(workdir)) == 2
+    df = pd.read_csv(output_path, index_col=0)
+    assert list(df.columns) == scraper.COLUMNS
+    assert sorted(df["name"]) == ["Biblioteca Parque España", "Museo Casa de la Memoria"]
+
+    # Un archivo sin cambios no se reescribe, así la limpieza no lo vuelve a procesar
+    written = os.stat(output_path).st_mtime_ns
+    assert scraper.collect(tasks_dir, str(workdir)) == 2
+    assert os.stat(output_path).st_mtime_ns == written
@@ -0,0 +1,138 @@
+import asyncio
+import threading
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import query
+import route_recommender
+import service
+import user_context
+from directions_cache import DirectionsCache
+from fake_directions import FakeDirections
+
+QUESTION = "¿Qué plan te gustaría hacer?\n1. Museos\n2. Parques\n3. Bares"
+FAMILIA = f"{user_context.CONTEXTO_INICIAL} familia"
+POIS = pd.DataFrame({
+    "comuna": ["Laureles", "Laureles", "Aranjuez"],
+    "name": ["Museo A", "Parque B", "Jardín C"],
+    "latitude": [6.2442, 6.2518, 6.2705],
+    "longitude": [-75.5812, -75.5636, -75.5646],
+    "final_category": ["museo", "parque", "jardin"],
+})
+
+
+@pytest.fixture
+def client(workdir, monkeypatch):
+    """
+    Service with a question tree of one context, canned recommendations and a local Directions API.
+    """
+    calls = []
+
+    def recommend(profile, near=None, radius_km=2.0):
+        calls.append(profile)
+        return None if near == (0.0, 0.0) else POIS
+
+    monkeypatch.setattr(service, "warm_up", lambda: {FAMILIA: QUESTION})
+    monkeypatch.setattr(query, "recommend", recommend)
+    monkeypatch.setattr(route_recommender, "directions_cache", DirectionsCache(path=str(workdir / "directions.sqlite")))
+    with FakeDirections() as server:
+        monkeypatch.setattr(route_recommender, "BASE_URL", f"{server.url}/maps/api/directions/json")
+        with TestClient(service.app) as client:
+            client.recommend_calls = calls
+            yield client
+
+
+def test_health(client):
+    assert client.get("/health").json() == {"status": "ok", "merged_requests": 0}
+
+
+def test_profile_question(client):
+    response = client.post("/profile/question", json={"compania": "1"}).json()
+    assert response == {"contexto": FAMILIA, "iteration": 1, "question": QUESTION,
+                        "options": ["Museos", "Parques", "Bares"]}
+
+    final = client.post("/profile/question", json={"compania": "familia", "selections": ["a", "b", "c"]}).json()
+    assert final == {"profile": f"{FAMILIA}. a. b. c"}
+
+    assert client.post("/profile/question", json={"compania": "abuela"}).status_code == 422
+    assert client.post("/profile/question", json={"compania": "1", "selections": list("abcd")}).status_code == 422
+
+
+def test_recommendations(client):
+    response = client.post("/recommendations", json={"profile": "Museos"})
+
+    assert response.status_code == 200
+    assert [poi["name"] for poi in response.json()["pois"]] == ["Museo A", "Parque B", "Jardín C"]
+    assert client.post("/recommendations", json={"profile": "Museos", "near": [0.0, 0.0]}).status_code == 404
+    assert client.post("/recommendations", json={"profile": "Museos", "near": [6.2]}).status_code == 422
+
+
+def test_route(client):
+    pois = POIS[["name", "latitude", "longitude"]].to_dict("records")
+
+    response = client.post("/route", json={"pois": pois, "stops": 3}).json()
+
+    assert sorted(stop["name"] for stop in response["stops"]) == ["Jardín C", "Museo A", "Parque B"]
+    assert len(response["legs"]) == 2
+    assert [leg["from"] for leg in response["legs"]] == [stop["name"] for stop in response["stops"][:-1]]
+
+
+def test_plan(client):
+    response = client.post("/plan", json={"profile": "Museos", "stops": 2}).json()
+
+    assert len(response["pois"]) == 3
+    assert len(response["route"]["stops"]) == 2
+    assert len(response["route"]["legs"]) == 1
+    assert client.recommend_calls == ["Museos"]
+
+
+def test_single_flight_runs_concurrent_identical_calls_once():
+    flights = service.SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def work(value):
+        calls.append(value)
+        release.wait(5)
+        return value * 2
+
+    async def scenario():
+        first = asyncio.ensure_future(flights.run("key", work, 21))
+        second = asyncio.ensure_future(flights.run("key", work, 21))
+        other = asyncio.ensure_future(flights.run("other", work, 1))
+        await asyncio.sleep(0.05)
+        release.set()
+        return await asyncio.gather(first, second, other)
+
+    assert asyncio.run(scenario()) == [42, 42, 2]
+    assert sorted(calls) == [1, 21]
+    assert flights.merged == 1
+    assert flights._inflight == {}
+
+
+def test_single_flight_error_reaches_every_waiter_and_clears_the_key():
+    flights = service.SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fail():
+        calls.append(1)
+        release.wait(5)
+        raise RuntimeError("Bedrock no responde")
+
+    async def scenario():
+        waiters = [asyncio.ensure_future(flights.run("key", fail)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        release.set()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        # La clave se olvida: la siguiente solicitud vuelve a ejecutar la llamada
+        await asyncio.sleep(0)
+        retry = await flights.run("key", lambda: "ok")
+        return results, retry
+
+    results, retry = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert len(calls) == 1
+    assert retry == "ok"
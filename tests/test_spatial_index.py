@@ -0,0 +1,72 @@
+import math
+
+import numpy as np
+import pytest
+
+from spatial_index import EARTH_RADIUS_KM, SpatialIndex
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+CENTER = (6.2442, -75.5812)
+
+
+@pytest.fixture
+def pois():
+    """
+    200 POIs around Medellín, plus one without coordinates.
+    """
+    rng = np.random.default_rng(3)
+    metadatas = [{"latitude": lat, "longitude": lon}
+                 for lat, lon in zip(rng.uniform(6.15, 6.35, 200), rng.uniform(-75.65, -75.50, 200))]
+    metadatas.append({"latitude": "", "longitude": None})
+    ids = [f"poi-{row}" for row in range(len(metadatas))]
+    return ids, metadatas
+
+
+def distances(pois):
+    ids, metadatas = pois
+    return {poi: haversine_km(*CENTER, metadata["latitude"], metadata["longitude"])
+            for poi, metadata in zip(ids, metadatas) if metadata["latitude"] != ""}
+
+
+@pytest.mark.parametrize("radius_km", [0.5, 2.0, 5.0])
+def test_within_matches_brute_force(pois, radius_km):
+    index = SpatialIndex.from_metadatas(*pois)
+    expected = sorted(poi for poi, distance in distances(pois).items() if distance <= radius_km)
+
+    assert sorted(index.within(*CENTER, radius_km)) == expected
+    assert index.within_rows(*CENTER, radius_km).tolist() == sorted(pois[0].index(poi) for poi in expected)
+
+
+def test_within_radius_boundary_and_empty_result(pois):
+    index = SpatialIndex.from_metadatas(*pois)
+    poi, distance = sorted(distances(pois).items(), key=lambda item: item[1])[4]
+
+    assert poi in index.within(*CENTER, distance * (1 + 1e-9))
+    assert poi not in index.within(*CENTER, distance * (1 - 1e-9))
+    assert index.within(0.0, 0.0, 10.0) == []
+    assert index.within_rows(0.0, 0.0, 10.0).dtype.kind == "i"
+
+
+def test_nearest_matches_brute_force(pois):
+    index = SpatialIndex.from_metadatas(*pois)
+    expected = sorted(distances(pois).items(), key=lambda item: item[1])[:7]
+
+    ids, distances_km = index.nearest(*CENTER, k=7)
+
+    assert ids == [poi for poi, _ in expected]
+    assert distances_km == pytest.approx([distance for _, distance in expected], rel=1e-9)
+    # Nunca devuelve más POIs de los que tienen coordenadas
+    assert len(index.nearest(*CENTER, k=500)[0]) == 200
+
+
+def test_index_without_coordinates_finds_nothing():
+    index = SpatialIndex.from_metadatas(["a"], [{"latitude": None, "longitude": None}])
+
+    assert index.within(*CENTER, 100.0) == []
+    assert index.nearest(*CENTER, k=3) == ([], [])
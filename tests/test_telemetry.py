@@ -0,0 +1,46 @@
+import pytest
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+import telemetry
+
+
+@pytest.fixture
+def exported(monkeypatch):
+    """
+    Enables the telemetry with in-memory exporters instead of the ones chosen by `TELEMETRY_EXPORTER`.
+    """
+    spans, reader = InMemorySpanExporter(), InMemoryMetricReader()
+    tracer_provider = TracerProvider()
+    tracer_provider.add_span_processor(SimpleSpanProcessor(spans))
+    monkeypatch.setattr(telemetry, "_configured", True)
+    monkeypatch.setattr(telemetry, "_enabled", True)
+    monkeypatch.setattr(telemetry, "_tracer", tracer_provider.get_tracer("test"))
+    monkeypatch.setattr(telemetry, "_meter", MeterProvider(metric_readers=[reader]).get_meter("test"))
+    monkeypatch.setattr(telemetry, "_instruments", {})
+    return spans, reader
+
+
+def points(reader, name):
+    return [point for resource in reader.get_metrics_data().resource_metrics for scope in resource.scope_metrics
+            for metric in scope.metrics if metric.name == name for point in metric.data.data_points]
+
+
+def test_per_call_attributes_stay_on_the_span(exported):
+    spans, reader = exported
+
+    for texts in (1, 7, 32):
+        with telemetry.span("embedder.encode", histogram="govibes.embedding.duration", texts=texts,
+                            model="minilm"):
+            pass
+    telemetry.count("govibes.cache.misses", 3, cache="embedding", texts=3)
+
+    assert [span.attributes["texts"] for span in spans.get_finished_spans()] == [1, 7, 32]
+    histogram = points(reader, "govibes.embedding.duration")
+    # Una sola serie: el número de textos no se vuelve etiqueta de la métrica
+    assert [dict(point.attributes) for point in histogram] == [{"model": "minilm"}]
+    assert histogram[0].count == 3
+    assert [dict(point.attributes) for point in points(reader, "govibes.cache.misses")] == [{"cache": "embedding"}]
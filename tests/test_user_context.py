@@ -0,0 +1,36 @@
+import templates
+import user_context
+from completion_cache import CompletionCache
+from fake_bedrock import FakeBedrock
+
+QUESTION = "¿Qué te gustaría hacer?\n1. Museos\n2. Parques\n3. Bares"
+
+
+def test_question_tree_is_reused_until_the_template_changes(template_dir, monkeypatch):
+    path = str(template_dir.parent / "question_tree.json")
+    with FakeBedrock(responder=lambda prompt: QUESTION) as server:
+        monkeypatch.setenv("BEDROCK_ENDPOINT_URL", server.url)
+        monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+        monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+        monkeypatch.setattr(user_context, "_bedrock", None)
+        monkeypatch.setattr(user_context, "completion_cache", CompletionCache())
+
+        tree = user_context.build_question_tree(path)
+        # 4 compañías, 3 opciones por ronda y 3 rondas: 4 + 12 + 36 preguntas
+        assert server.requests == 52
+        assert user_context.load_question_tree(path) == tree["nodes"]
+        assert tree["nodes"][f"{user_context.CONTEXTO_INICIAL} familia. Museos. Bares"] == QUESTION
+
+        # Con la misma plantilla, reconstruir el árbol sale entero del caché de completions
+        assert user_context.build_question_tree(path) == tree
+        assert server.requests == 52
+
+        prompt = template_dir / user_context.PROMPT_TEMPLATE
+        prompt.write_text(prompt.read_text(encoding="utf-8") + "\nSé breve.", encoding="utf-8")
+        templates.load.cache_clear()
+
+        assert user_context.load_question_tree(path) == {}
+        rebuilt = user_context.build_question_tree(path)
+        assert server.requests == 104
+        assert rebuilt["fingerprint"] != tree["fingerprint"]
+        assert user_context.load_question_tree(path) == rebuilt["nodes"]
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+import benchmark
+from ingest import poi_id
+from vector_index import NumpyIndex, build_index, compare_with_chroma, partition_bounds
+
+
+def test_numpy_index_returns_the_same_top_k_as_chroma(workdir, embedder):
+    chromadb = pytest.importorskip("chromadb")
+    pois = {poi_id(poi["data"]): poi for poi in benchmark.synthetic_pois(400, seed=1)}
+    build_index(pois.items(), path=str(workdir / "vector_index"), embedder=embedder)
+    index = NumpyIndex.load(str(workdir / "vector_index"))
+
+    collection = chromadb.EphemeralClient().create_collection(
+        f"govibes-{workdir.name}", metadata={"hnsw:space": "cosine"}
+    )
+    documents = [poi["description"] for poi in pois.values()]
+    collection.add(
+        ids=list(pois),
+        documents=documents,
+        embeddings=embedder.embed(documents).tolist(),
+        metadatas=[poi["data"] for poi in pois.values()],
+    )
+
+    profiles = embedder.embed(benchmark.synthetic_profiles(5, seed=1)).tolist()
+    report = compare_with_chroma(index, collection, profiles, list(index.partitions))
+
+    assert report["recall"] > 0.98
+    assert report["max_distance_diff"] < 1e-5
+    for comuna in index.partitions:
+        where = {"comuna": comuna}
+        exact = index.query(query_embeddings=profiles, n_results=10, where=where)
+        approx = collection.query(query_embeddings=profiles, n_results=10, where=where)
+        # Los ids solo pueden diferir entre POIs empatados: las distancias del top-k son las mismas
+        for exact_distances, approx_distances in zip(exact["distances"], approx["distances"]):
+            assert approx_distances == pytest.approx(exact_distances, abs=1e-5)
+
+
+def test_in_filter_out_of_storage_order_returns_the_right_pois():
+    metadatas = [{"comuna": f"P{row}", "name": f"POI {row}"} for row in range(4)]
+    vectors = np.eye(4, dtype=np.float32)
+    ids = [metadata["name"] for metadata in metadatas]
+    index = NumpyIndex(vectors, ids, ids, metadatas, partition_bounds(metadatas))
+
+    # Las filas [0, 2, 1, 3] parecen contiguas aunque no estén ordenadas
+    result = index.query(query_embeddings=[[0.0, 1.0, 0.0, 0.0]], n_results=4,
+                         where={"comuna": {"$in": ["P0", "P2", "P1", "P3"]}})
+
+    assert result["ids"][0][0] == "POI 1"
+    assert result["metadatas"][0][0]["comuna"] == "P1"
+    assert result["distances"][0][0] == pytest.approx(0.0)
+    assert sorted(result["ids"][0]) == ids
+
+    repeated = index.query(query_embeddings=[[0.0, 1.0, 0.0, 0.0]], n_results=4,
+                           where={"comuna": {"$in": ["P2", "P1", "P2"]}})
+    assert repeated["ids"][0] == ["POI 1", "POI 2"]
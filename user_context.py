@@ -12,23 +12,28 @@ The main tasks performed by this script are:
 
 Modules Used:
 -------------
-- `pandas`: Not used in the code but could be useful for future expansion.
 - `json`: For handling JSON data and responses from the Claude model.
 - `time`: For adding delays during retries in case of throttling from the AWS service.
 - `botocore.exceptions`: For handling exceptions specific to AWS (e.g., `ThrottlingException`).
-- `boto3`: The AWS SDK for Python, used for invoking the Claude model hosted on Amazon Bedrock.
+- `boto3`: The AWS SDK for Python, used for invoking the Claude model hosted on Amazon Bedrock. It is only
+  imported when the first question is sent to the model (`get_bedrock`).
 - `re`: Not explicitly used in the code but may be used for regex processing.
 - `os`: For accessing environment variables for AWS credentials.
+- `completion_cache`: On-disk cache of completions shared with `pois_augmentation.py`.
+- `templates`: Reads the prompt template once, the first time it is needed.
+- `telemetry`: Spans and metrics around every Bedrock call (see `telemetry.py`).
 
 Files:
 ------
 - `./data/input/templates/user_context/prompt_template.txt`: A text file containing the template for generating prompts based on the user's context.
+- `./data/output/user_profile/question_tree.json`: Precomputed question of every context, written by `--build-tree`.
 
 Functions:
 ----------
 - `invoke_claude(prompt, max_retries=5, initial_delay=1)`:
     Sends a request to the Claude model with the provided prompt, handles throttling using exponential backoff, 
-    and returns the model's response (completion).
+    and returns the model's response (completion). Repeated prompts are answered from the completion cache
+    (set `LLM_CACHE_BYPASS=1` to always call the model).
     
 - `get_user_preference(options)`:
     Prompts the user to select an option from the available choices (1, 2, or 3) and returns the selected option.
@@ -36,9 +41,20 @@ Functions:
 - `extract_options(response)`:
     Parses the response from Claude, extracting the available options for the user to choose from.
 
-- `main()`:
+- `ask(contexto, tree=None)`:
+    Returns the question of a context, from `tree` when it is there and from Claude otherwise.
+
+- `build_question_tree(path=TREE_PATH, concurrency=4)`:
+    Precomputes the question of every reachable context (4 companions, 3 options per round, 3 rounds) and
+    saves them to `question_tree.json`.
+
+- `load_question_tree(path=TREE_PATH)`:
+    Loads the precomputed questions, ignoring a tree built with another template or model.
+
+- `main(tree=None)`:
     Orchestrates the conversation, prompting the user for their initial context and preferences,
     generating prompts for the Claude model, processing responses, and updating the context for further questions.
+    Questions found in `tree` are shown immediately; Claude is only called for contexts missing from it.
     
 Process:
 --------
@@ -57,8 +73,10 @@ Example Usage:
 --------------
 1. Ensure that AWS credentials are set in the environment variables (`AWS_ACCESS_KEY_ID` and `AWS_SECRET_ACCESS_KEY`).
 2. Place the `prompt_template.txt` in the specified directory.
-3. Run the script, and it will prompt the user for their travel companion and process their selections.
-4. The profile of the tourist will be generated and printed after 3 iterations.
+3. Run `python user_context.py --build-tree` once to precompute every question (52 model calls).
+4. Run the script, and it will prompt the user for their travel companion and process their selections. With the
+   tree built, no model call is made and every question appears immediately (use `--no-tree` to ask live).
+5. The profile of the tourist will be generated and printed after 3 iterations.
 
 Notes:
 ------
@@ -67,51 +85,108 @@ Notes:
 
 """
 
-import pandas as pd
+import sys
+import hashlib
 import json
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from botocore.exceptions import ClientError
-import boto3
 import re
 import os
 
-with open("./data/input/templates/user_context/prompt_template.txt", 'r', encoding='utf-8') as file:
-    prompt_template = file.read()
+from completion_cache import CompletionCache
+import telemetry
+import templates
 
-# Crear el cliente de Bedrock
-bedrock = boto3.client(
-    service_name='bedrock-runtime',
-    region_name='us-west-2',  # Especifica tu región
-    aws_access_key_id= os.getenv('AWS_ACCESS_KEY_ID'),
-    aws_secret_access_key= os.getenv('AWS_SECRET_ACCESS_KEY')
-)
+TREE_PATH = "./data/output/user_profile/question_tree.json"
 
-def invoke_claude(prompt, max_retries=5, initial_delay=1):
-    for attempt in range(max_retries):
-        try:
-            body = json.dumps({
-                "prompt": f"\n\nHuman: {prompt}\n\nAssistant:",
-                "max_tokens_to_sample": 2000,
-                "temperature": 1,
-                "top_p": 1
-            })
-
-            response = bedrock.invoke_model(
-                modelId="anthropic.claude-v2",
-                body=body
+# Contexto inicial y compañías entre las que elige el turista
+CONTEXTO_INICIAL = "Soy un turista que viaja con ..."
+DICT_COMPANIA = {
+    "1": "familia",
+    "2": "amigos",
+    "3": "pareja",
+    "4": "solo"
+}
+ITERACIONES = 3
+
+PROMPT_TEMPLATE = "user_context/prompt_template.txt"
+
+_bedrock = None
+_bedrock_lock = threading.Lock()
+
+
+def get_bedrock():
+    """
+    Returns the Bedrock client, created (and boto3 imported) on first use.
+    """
+    global _bedrock
+    with _bedrock_lock:
+        if _bedrock is None:
+            import boto3
+            from botocore.config import Config
+            # Crear el cliente de Bedrock
+            _bedrock = boto3.client(
+                service_name='bedrock-runtime',
+                region_name='us-west-2',  # Especifica tu región
+                endpoint_url=os.getenv('BEDROCK_ENDPOINT_URL'),  # Permite apuntar a un Bedrock local (fake_bedrock.py)
+                aws_access_key_id= os.getenv('AWS_ACCESS_KEY_ID'),
+                aws_secret_access_key= os.getenv('AWS_SECRET_ACCESS_KEY'),
+                # service.py comparte este cliente entre todas las solicitudes concurrentes
+                config=Config(max_pool_connections=32)
             )
-            
-            response_body = json.loads(response['body'].read())
-            return response_body['completion']
-
-        except ClientError as e:
-            if e.response['Error']['Code'] == 'ThrottlingException':
-                if attempt < max_retries - 1:  # Don't sleep on the last attempt
-                    wait_time = initial_delay * (2 ** attempt)  # Exponential backoff
-                    print(f"Rate limited. Waiting {wait_time} seconds before retry...")
-                    time.sleep(wait_time)
-                    continue
-            raise  # Re-raise the exception if it's not a ThrottlingException or we're out of retries
+    return _bedrock
+
+
+MODEL_ID = "anthropic.claude-v2"
+SAMPLING_PARAMS = {
+    "max_tokens_to_sample": 2000,
+    "temperature": 1,
+    "top_p": 1
+}
+
+# Caché de completions compartido con pois_augmentation.py
+completion_cache = CompletionCache()
+
+def invoke_claude(prompt, max_retries=5, initial_delay=1):
+    with telemetry.span("invoke_claude", histogram="govibes.llm.duration", model=MODEL_ID) as span:
+        cache_key = completion_cache.make_key(MODEL_ID, SAMPLING_PARAMS, prompt)
+        cached = completion_cache.get(cache_key)
+        telemetry.count("govibes.cache.hits" if cached is not None else "govibes.cache.misses", cache="completion")
+        span.set_attribute("cache_hit", cached is not None)
+        if cached is not None:
+            return cached
+
+        for attempt in range(max_retries):
+            try:
+                body = json.dumps({
+                    "prompt": f"\n\nHuman: {prompt}\n\nAssistant:",
+                    **SAMPLING_PARAMS
+                })
+
+                with telemetry.span("bedrock.invoke_model", histogram="govibes.bedrock.duration", model=MODEL_ID):
+                    response = get_bedrock().invoke_model(
+                        modelId=MODEL_ID,
+                        body=body
+                    )
+
+                    response_body = json.loads(response['body'].read())
+                telemetry.count_bedrock_tokens(response, MODEL_ID)
+                completion_cache.put(cache_key, response_body['completion'])
+                return response_body['completion']
+
+            except ClientError as e:
+                if e.response['Error']['Code'] == 'ThrottlingException':
+                    telemetry.count("govibes.llm.throttles", model=MODEL_ID)
+                    if attempt < max_retries - 1:  # Don't sleep on the last attempt
+                        telemetry.count("govibes.llm.retries", model=MODEL_ID)
+                        wait_time = initial_delay * (2 ** attempt)  # Exponential backoff
+                        print(f"Rate limited. Waiting {wait_time} seconds before retry...")
+                        with telemetry.span("backoff", histogram="govibes.llm.backoff"):
+                            time.sleep(wait_time)
+                        continue
+                raise  # Re-raise the exception if it's not a ThrottlingException or we're out of retries
 
 def get_user_preference(options):
     while True:
@@ -133,29 +208,102 @@ def extract_options(response):
             options.append(line.split('. ')[1].strip())
     return options
 
-def main():
+def ask(contexto, tree=None):
+    """
+    Returns the question of a context: the precomputed one when it is in `tree`, and Claude's answer otherwise.
+    """
+    response = (tree or {}).get(contexto)
+    if response is None:
+        response = invoke_claude(build_prompt(contexto))
+    return response
+
+
+def build_prompt(contexto):
+    return templates.load(PROMPT_TEMPLATE).format(contexto=contexto)
+
+
+def template_fingerprint():
+    return hashlib.sha256(f"{MODEL_ID}\0{templates.load(PROMPT_TEMPLATE)}".encode("utf-8")).hexdigest()
+
+
+def build_question_tree(path=TREE_PATH, concurrency=4):
+    """
+    Expands every possible conversation offline and stores the question of every context.
+
+    The conversation space is small: 4 companions and 3 options per round for 3 rounds, so 4 + 12 + 36 = 52
+    questions. Every level is requested concurrently, repeated contexts are asked only once and every completion
+    goes through the completion cache, so rebuilding after an interruption only asks the missing questions.
+
+    Parameters:
+    -----------
+    path : str
+        JSON file where the tree is written.
+    concurrency : int
+        Questions requested to Bedrock at the same time.
+
+    Returns:
+    --------
+    dict
+        The tree: `{"fingerprint": ..., "nodes": {contexto: response}}`.
+    """
+    nodes = {}
+    level = [f"{CONTEXTO_INICIAL} {compania}" for compania in DICT_COMPANIA.values()]
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        for i in range(ITERACIONES):
+            level = [contexto for contexto in dict.fromkeys(level) if contexto not in nodes]
+            responses = executor.map(lambda contexto: invoke_claude(build_prompt(contexto)), level)
+            next_level = []
+            for contexto, response in zip(level, responses):
+                nodes[contexto] = response
+                next_level.extend(f"{contexto}. {option}" for option in extract_options(response))
+            print(f"Iteración {i+1}: {len(level)} preguntas")
+            level = next_level
+
+    tree = {"fingerprint": template_fingerprint(), "nodes": nodes}
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(tree, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return tree
+
+
+def load_question_tree(path=TREE_PATH):
+    """
+    Returns the precomputed questions by context, or an empty dict when there is no tree or it was built with
+    another template or model.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        tree = json.load(f)
+    if tree.get("fingerprint") != template_fingerprint():
+        print("El árbol de preguntas es de otra plantilla: se ignorará")
+        return {}
+    return tree["nodes"]
+
+
+def main(tree=None):
+    """
+    Runs the onboarding conversation.
+
+    `tree` maps every context to its precomputed question (see `build_question_tree`); the model is only called
+    for contexts that are not in it.
+    """
+    tree = tree or {}
+
     # Contexto inicial
-    contexto = "Soy un turista que viaja con ..."
+    contexto = CONTEXTO_INICIAL
     compania = input(f"{contexto[:-3]}\n 1. Familia\n 2. Amigos\n 3. Pareja\n 4. Solo\nSelecciona una opción (1, 2, 3 o 4): ")
 
-    dict_compania = {
-        "1": "familia",
-        "2": "amigos",
-        "3": "pareja",
-        "4": "solo"
-    }
-
-    contexto = f"{contexto} {dict_compania[compania]}"
+    contexto = f"{contexto} {DICT_COMPANIA[compania]}"
     
     # Realizar tres iteraciones
-    for i in range(3):
+    for i in range(ITERACIONES):
         print(f"\n=== Iteración {i+1} ===")
         
-        # Preparar el prompt con el contexto actual
-        prompt = prompt_template.format(contexto=contexto)
-        
-        # Obtener respuesta de Claude
-        response = invoke_claude(prompt)
+        # Pregunta precalculada o, si no está en el árbol, respuesta de Claude
+        response = ask(contexto, tree)
         print(response)
         
         # Extraer las opciones de la respuesta
@@ -167,7 +315,7 @@ def main():
         # Actualizar el contexto con la nueva información
         contexto = f"{contexto}. {selected_preference}"
         
-        if i < 2:  # No mostrar este mensaje en la última iteración
+        if i < ITERACIONES - 1:  # No mostrar este mensaje en la última iteración
             print("\nGenerando la siguiente pregunta...")
 
     print("\n=== Perfil final del turista ===")
@@ -177,4 +325,6 @@ def main():
         print("El perfil del turista se ha generado y guardado en el archivo 'profile.txt'")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Las opciones se definen en cli.py, el punto de entrada común
+    import cli
+    cli.main(["profile", *sys.argv[1:]])
@@ -0,0 +1,290 @@
+"""
+In-process vector index over the GoVibes POIs, stored as memory-mapped NumPy arrays.
+
+The whole corpus is only tens of thousands of vectors, so instead of sending every recommendation over HTTP to a
+Chroma server the embeddings can be kept in a local `.npy` file and scored with a matrix-vector product. The
+vectors are normalized float32 and sorted by `comuna`, so a `where={"comuna": ...}` filter is just a slice of the
+matrix; the top-k of each query is found with `np.argpartition`.
+
+`NumpyIndex.query` accepts the same arguments as `chromadb.Collection.query` (`query_embeddings`, `n_results`,
+`where` with equality or `$in` on `comuna`) and returns the same structure, so `query.py` can use either backend.
+The backend is chosen with the `VECTOR_BACKEND` environment variable (`chroma`, the default, or `numpy`).
+
+Files (inside `VECTOR_INDEX_PATH`, default `./data/output/vector_index`):
+-----------------------------------------------------------------------
+- `vectors.npy`: float32 matrix of normalized embeddings, one row per POI, grouped by comuna.
+- `pois/`: POI store (see `poi_store.py`) with the ids, documents and metadata of every row, plus the row range of
+  each comuna. Indexes built before the store existed keep them in `metadata.json`, which is still read.
+
+Example usage:
+--------------
+    build_index(iter_pois("./data/output/augmented/augmented_pois.json"))
+    index = NumpyIndex.load()
+    result = index.query(query_embeddings=[vector], n_results=10, where={"comuna": "Aranjuez"})
+
+    # Compare with the Chroma collection
+    python vector_index.py --check
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+from embeddings import Embedder
+from poi_store import METADATA_FIELDS, PoiStore, write_augmented_store
+
+
+DEFAULT_PATH = "./data/output/vector_index"
+
+
+def partition_bounds(metadatas):
+    """
+    Returns the `(start, end)` row range of every comuna in metadata sorted by comuna.
+    """
+    partitions = {}
+    for row, metadata in enumerate(metadatas):
+        comuna = str(metadata.get("comuna", ""))
+        start, _ = partitions.get(comuna, (row, row))
+        partitions[comuna] = (start, row + 1)
+    return partitions
+
+
+def build_index(pois, path=None, embedder=None):
+    """
+    Embeds the POIs and writes the index files.
+
+    Parameters:
+    -----------
+    pois : iterable of tuple
+        `(id, poi)` pairs, with augmented POIs with "description" and "data" fields as in `augmented_pois.json`
+        (see `ingest.iter_pois`).
+    path : str, optional
+        Directory where the index is written.
+    embedder : Embedder, optional
+        Embedder used for the descriptions.
+
+    Returns:
+    --------
+    int
+        Number of POIs in the index.
+    """
+    path = path or os.getenv("VECTOR_INDEX_PATH", DEFAULT_PATH)
+    embedder = embedder or Embedder()
+
+    unique = {}
+    for poi_id, poi in pois:
+        unique[poi_id] = poi
+    ids = sorted(unique, key=lambda poi: str(unique[poi]["data"].get("comuna", "")))
+
+    documents = [unique[poi]["description"] for poi in ids]
+    metadatas = [unique[poi]["data"] for poi in ids]
+    vectors = embedder.embed(documents).astype(np.float32)
+    if len(ids):
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+
+    partitions = partition_bounds(metadatas)
+
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, "vectors.npy"), vectors)
+    # pandas solo se importa al escribir el índice, así `import ingest` no lo carga (ver `poi_store.py`)
+    import pandas as pd
+    frame = pd.DataFrame.from_records(metadatas, columns=METADATA_FIELDS)
+    frame.insert(0, "id", ids)
+    frame.insert(1, "description", documents)
+    write_augmented_store(frame, os.path.join(path, "pois"), extra={"partitions": partitions})
+    if os.path.exists(os.path.join(path, "metadata.json")):
+        os.remove(os.path.join(path, "metadata.json"))
+    return len(ids)
+
+
+class NumpyIndex:
+    """
+    Memory-mapped, comuna-partitioned cosine index with a Chroma-compatible `query`.
+    """
+
+    def __init__(self, vectors, ids, documents, metadatas, partitions, store=None):
+        self.vectors = vectors
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self.partitions = {comuna: tuple(bounds) for comuna, bounds in partitions.items()}
+        self.store = store
+        self._row_of = None
+
+    @classmethod
+    def from_collection(cls, collection):
+        """
+        Builds an in-memory index with every vector of a Chroma collection.
+        """
+        data = collection.get(include=["embeddings", "documents", "metadatas"])
+        order = sorted(range(len(data["ids"])), key=lambda row: str(data["metadatas"][row].get("comuna", "")))
+        vectors = np.asarray([data["embeddings"][row] for row in order], dtype=np.float32)
+        if len(order):
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.where(norms == 0, 1, norms)
+
+        metadatas = [data["metadatas"][row] for row in order]
+        return cls(
+            vectors,
+            [data["ids"][row] for row in order],
+            [data["documents"][row] for row in order],
+            metadatas,
+            partition_bounds(metadatas),
+        )
+
+    @classmethod
+    def load(cls, path=None):
+        path = path or os.getenv("VECTOR_INDEX_PATH", DEFAULT_PATH)
+        vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        if not os.path.exists(os.path.join(path, "pois", "schema.json")):
+            with open(os.path.join(path, "metadata.json"), "r", encoding="utf-8") as file:
+                meta = json.load(file)
+            return cls(vectors, meta["ids"], meta["documents"], meta["metadatas"], meta["partitions"])
+
+        # Los documentos y metadatos se decodifican solo cuando se leen
+        store = PoiStore.load(os.path.join(path, "pois"))
+        return cls(
+            vectors,
+            store.column("id").to_list(),
+            store.column("description"),
+            store.records(METADATA_FIELDS),
+            store.extra["partitions"],
+            store=store,
+        )
+
+    def count(self):
+        return len(self.ids)
+
+    def metadata_frame(self, columns):
+        """
+        Returns the given metadata fields of every row as a DataFrame.
+        """
+        if self.store is not None:
+            return self.store.to_frame(columns).reset_index(drop=True)
+        import pandas as pd
+        return pd.DataFrame.from_records(self.metadatas, columns=columns)
+
+    def _rows(self, where):
+        """
+        Returns the row ranges matching a `where` filter on `comuna`, sorted by storage order and without repeats.
+
+        `query` scores a contiguous slice of the vectors when the rows allow it, which is only right if they are
+        sorted.
+        """
+        if not where:
+            return [(0, len(self.ids))]
+        if set(where) != {"comuna"}:
+            raise ValueError(f"NumpyIndex only supports filters on 'comuna', got {where}")
+        condition = where["comuna"]
+        if isinstance(condition, dict):
+            if set(condition) == {"$eq"}:
+                comunas = [condition["$eq"]]
+            elif set(condition) == {"$in"}:
+                comunas = condition["$in"]
+            else:
+                raise ValueError(f"Unsupported operator in {where}")
+        else:
+            comunas = [condition]
+        return sorted({tuple(self.partitions[comuna]) for comuna in comunas if comuna in self.partitions})
+
+    def rows_of(self, ids):
+        """
+        Returns the sorted row positions of `ids`, ignoring unknown ids.
+        """
+        if self._row_of is None:
+            self._row_of = {poi: row for row, poi in enumerate(self.ids)}
+        return np.array(sorted(self._row_of[poi] for poi in ids if poi in self._row_of), dtype=np.int64)
+
+    def query(self, query_embeddings, n_results=10, where=None, ids=None):
+        """
+        Returns the `n_results` nearest POIs of every query embedding, in the format of `chromadb.Collection.query`.
+
+        `ids` optionally restricts the search to those POIs (e.g. the ones near a point, see `spatial_index.py`).
+        """
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(-1, self.vectors.shape[1])
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
+
+        rows = np.concatenate(
+            [np.arange(start, end) for start, end in self._rows(where)] or [np.zeros(0, dtype=np.int64)]
+        )
+        if ids is not None:
+            rows = np.intersect1d(rows, self.rows_of(ids), assume_unique=True)
+        contiguous = len(rows) == 0 or rows[-1] - rows[0] + 1 == len(rows)
+        candidates = self.vectors[rows[0]:rows[-1] + 1] if contiguous and len(rows) else self.vectors[rows]
+
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        k = min(n_results, len(rows))
+        for query_vector in queries:
+            if k == 0:
+                top = np.zeros(0, dtype=np.int64)
+                distances = np.zeros(0, dtype=np.float32)
+            else:
+                distances = 1.0 - candidates @ query_vector
+                top = np.argpartition(distances, k - 1)[:k] if k < len(rows) else np.arange(len(rows))
+                top = top[np.argsort(distances[top], kind="stable")]
+                distances = distances[top]
+            selected = rows[top]
+            result["ids"].append([self.ids[row] for row in selected])
+            result["documents"].append([self.documents[row] for row in selected])
+            result["metadatas"].append([self.metadatas[row] for row in selected])
+            result["distances"].append([float(distance) for distance in distances])
+        return result
+
+
+def compare_with_chroma(index, collection, query_embeddings, comunas, n_results=10):
+    """
+    Runs the same filtered queries on the NumPy index and on Chroma and measures how much they agree.
+
+    Chroma's HNSW search is approximate, so small differences are expected; the recall of the exact NumPy result
+    against Chroma should be close to 1.
+
+    Returns:
+    --------
+    dict
+        Mean recall@k of Chroma against the exact result and maximum absolute difference of the distances of the
+        POIs returned by both.
+    """
+    recalls, max_diff = [], 0.0
+    for comuna in comunas:
+        where = {"comuna": comuna}
+        exact = index.query(query_embeddings=query_embeddings, n_results=n_results, where=where)
+        approx = collection.query(query_embeddings=query_embeddings, n_results=n_results, where=where)
+        for exact_ids, exact_dist, approx_ids, approx_dist in zip(
+            exact["ids"], exact["distances"], approx["ids"], approx["distances"]
+        ):
+            if not exact_ids:
+                continue
+            recalls.append(len(set(exact_ids) & set(approx_ids)) / len(exact_ids))
+            exact_by_id = dict(zip(exact_ids, exact_dist))
+            for poi, distance in zip(approx_ids, approx_dist):
+                if poi in exact_by_id:
+                    max_diff = max(max_diff, abs(exact_by_id[poi] - distance))
+    return {"recall": float(np.mean(recalls)) if recalls else 1.0, "max_distance_diff": max_diff}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Índice vectorial NumPy para GoVibes.")
+    parser.add_argument("--build", action="store_true", help="Construye el índice desde los POIs aumentados")
+    parser.add_argument("--check", action="store_true", help="Compara los resultados con la colección de Chroma")
+    args = parser.parse_args()
+
+    if args.build:
+        from ingest import default_data, iter_pois
+        count = build_index(iter_pois(default_data()))
+        print(f"Index built with {count} POIs")
+
+    if args.check:
+        import chromadb as db
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        index = NumpyIndex.load()
+        collection = db.HttpClient(host=os.getenv("DB_HOST"), port=os.getenv("DB_PORT")).get_collection("GoVibes")
+        with open("./data/output/user_profile/profile.txt", "r") as f:
+            profile = f.read()
+        embedding = Embedder().embed([profile]).tolist()
+        print(compare_with_chroma(index, collection, embedding, list(index.partitions)))